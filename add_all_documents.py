@@ -1,56 +1,208 @@
+import argparse
 import asyncio
-import hashlib
 import os
 
 from databases.chromaDB import ChromaDB
+from databases.collection_versions import CollectionVersions
 from utils.logger import Logger
+from utils.utility import chunk_id
 
 
-async def add_profile_data_croma(folder_path: str, collection_name: str):
-    try:
-        # Load all .txt or .md files from folder
-        documents = []
-        metadatas = []
-        ids = []
+EXTENSIONS = (".txt", ".md")
+
+
+class FolderIngester:
+    """
+    Keeps a collection in sync with a folder of .txt/.md files.
+
+    Files are read and chunked concurrently, every chunk id is checked with a
+    single get(ids=[...]) and only new or changed chunks are embedded and
+    upserted. Chunks of changed or removed files are deleted. watch() polls the
+    file mtimes afterwards, so each pass only costs O(changed files).
+    """
+    def __init__(self, folder_path: str, collection_name: str, chunk_size: int = 500, chunk_overlap: int = 50,
+                 concurrency: int = 16, batch_size: int = 256):
+        self.folder_path = folder_path
+        self.collection_name = collection_name
+        # active version of the collection, resolved again on every pass
+        self.target = collection_name
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        # source path -> (mtime_ns, size) and source path -> chunk ids, as of the last sync
+        self.signatures: dict[str, tuple[int, int]] = {}
+        self.file_ids: dict[str, list[str]] = {}
+        self._splitter = None
+
+    def contains(self, path: str) -> bool:
+        """
+        True when path is inside the folder; a plain prefix test would also
+        match siblings such as knowledge_base_old/ for knowledge_base
+        """
+        folder = os.path.abspath(self.folder_path)
+        return os.path.commonpath([folder, os.path.abspath(path)]) == folder
 
-        for root, _, files in os.walk(folder_path):
+    def scan(self) -> dict[str, tuple[int, int]]:
+        signatures = {}
+        for root, _, files in os.walk(self.folder_path):
             for file in files:
-                if file.endswith((".txt", ".md")):
+                if file.endswith(EXTENSIONS):
                     full_path = os.path.join(root, file)
-                    with open(full_path, "r", encoding="utf-8") as f:
-                        content = f.read().strip()
-
-                    if not content:
+                    try:
+                        stat = os.stat(full_path)
+                    except FileNotFoundError:
                         continue
+                    signatures[full_path] = (stat.st_mtime_ns, stat.st_size)
+        return signatures
+
+    def _chunk_file(self, full_path: str) -> list[tuple[str, str, dict]]:
+        if self._splitter is None:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+            self._splitter = RecursiveCharacterTextSplitter(chunk_size=self.chunk_size,
+                                                            chunk_overlap=self.chunk_overlap)
+        with open(full_path, "r", encoding="utf-8") as f:
+            content = f.read().strip()
+        if not content:
+            return []
+        return [(chunk_id(full_path, i, text), text, {"source": full_path, "chunk": i})
+                for i, text in enumerate(self._splitter.split_text(content))]
 
-                    # Create a deterministic ID using hash (file path + content)
-                    hash_id = hashlib.md5((file + content).encode('utf-8')).hexdigest()
+    async def load(self, paths: list[str]) -> dict[str, list[tuple[str, str, dict]]]:
+        """
+        Read and chunk files concurrently, returns source path -> [(id, text, metadata)]
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
 
-                    # Avoid inserting if already exists
-                    existing = await ChromaDB.get_all(collection_name, where_condition={"id": {"$eq": hash_id}})
-                    if existing and existing.get("documents"):
-                        continue  # Skip duplicate
+        async def load_one(full_path: str):
+            async with semaphore:
+                try:
+                    return full_path, await asyncio.to_thread(self._chunk_file, full_path)
+                except (OSError, UnicodeDecodeError) as e:
+                    await Logger.error_log(__name__, 'load', e)
+                    return full_path, None
 
-                    documents.append(content)
-                    metadatas.append({"source": full_path})
-                    ids.append(hash_id)
+        loaded = await asyncio.gather(*(load_one(path) for path in paths))
+        return {path: chunks for path, chunks in loaded if chunks is not None}
 
-        if documents:
-            await ChromaDB.add_documents(
-                collection_name=collection_name,
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids
+    async def _upsert(self, chunks: list[tuple[str, str, dict]]) -> None:
+        for start in range(0, len(chunks), self.batch_size):
+            batch = chunks[start:start + self.batch_size]
+            await ChromaDB.upsert_documents(
+                collection_name=self.target,
+                documents=[text for _, text, _ in batch],
+                metadatas=[metadata for _, _, metadata in batch],
+                ids=[id_ for id_, _, _ in batch]
             )
+
+    async def _delete(self, ids: list[str]) -> None:
+        for start in range(0, len(ids), self.batch_size):
+            await ChromaDB.delete_documents(self.target, ids[start:start + self.batch_size])
+
+    async def sync(self) -> dict:
+        """
+        Full pass: reconcile the collection with every file in the folder
+        """
+        self.target = await CollectionVersions.resolve(self.collection_name)
+        collection = await ChromaDB.get_collection(self.target)
+        signatures = self.scan()
+        loaded = await self.load(list(signatures))
+        all_chunks = [chunk for chunks in loaded.values() for chunk in chunks]
+
+        # one round trip for every id instead of one query per file
+        existing = set()
+        for start in range(0, len(all_chunks), self.batch_size * 20):
+            ids = [id_ for id_, _, _ in all_chunks[start:start + self.batch_size * 20]]
+            existing.update((await collection.get(ids=ids, include=[]))['ids'])
+        new_chunks = [chunk for chunk in all_chunks if chunk[0] not in existing]
+        await self._upsert(new_chunks)
+
+        # chunks left behind by edited files and everything from files that are gone, paged so a
+        # large collection is never pulled in one response; deleted after the scan so offsets hold
+        wanted = {id_ for id_, _, _ in all_chunks}
+        stale = []
+        page_size = self.batch_size * 20
+        for offset in range(0, await collection.count(), page_size):
+            page = await collection.get(limit=page_size, offset=offset, include=['metadatas'])
+            stale.extend(id_ for id_, metadata in zip(page['ids'], page['metadatas'])
+                         if metadata and metadata.get('source') and self.contains(metadata['source'])
+                         and id_ not in wanted)
+        await self._delete(stale)
+        await ChromaDB.tune_collection(self.target)
+
+        self.signatures = {path: signatures[path] for path in loaded}
+        self.file_ids = {path: [id_ for id_, _, _ in chunks] for path, chunks in loaded.items()}
+        stats = {'files': len(loaded), 'chunks': len(all_chunks), 'upserted': len(new_chunks), 'deleted': len(stale)}
+        await Logger.info_log('folder synced', collection=self.collection_name, **stats)
+        return stats
+
+    async def sync_changes(self) -> dict:
+        """
+        Incremental pass: only files whose mtime or size changed since the last
+        pass are read, chunked and written
+        """
+        self.target = await CollectionVersions.resolve(self.collection_name)
+        signatures = self.scan()
+        changed = [path for path, signature in signatures.items() if self.signatures.get(path) != signature]
+        removed = [path for path in self.signatures if path not in signatures]
+        loaded = await self.load(changed)
+
+        upserts, deletes = [], []
+        for path, chunks in loaded.items():
+            previous = set(self.file_ids.get(path, []))
+            current = {id_ for id_, _, _ in chunks}
+            upserts.extend(chunk for chunk in chunks if chunk[0] not in previous)
+            deletes.extend(previous - current)
+            self.signatures[path] = signatures[path]
+            self.file_ids[path] = [id_ for id_, _, _ in chunks]
+        for path in removed:
+            deletes.extend(self.file_ids.pop(path, []))
+            self.signatures.pop(path, None)
+
+        await self._upsert(upserts)
+        await self._delete(deletes)
+        stats = {'changed_files': len(loaded), 'removed_files': len(removed), 'upserted': len(upserts),
+                 'deleted': len(deletes)}
+        if loaded or removed:
+            await Logger.info_log('folder changes synced', collection=self.collection_name, **stats)
+        return stats
+
+    async def watch(self, interval: float = 5) -> None:
+        await self.sync()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync_changes()
+            except Exception as e:
+                await Logger.error_log(__name__, 'watch', e)
+
+
+async def add_profile_data_croma(folder_path: str, collection_name: str):
+    try:
+        return await FolderIngester(folder_path, collection_name).sync()
     except Exception as e:
         await Logger.error_log(__name__,'add_profile_data_croma',e)
 
 
-async def setup_chroma():
-    await ChromaDB.connect()
-    await ChromaDB.create_collection('profile')
-    await add_profile_data_croma('knowledge_base/', 'profile')
+async def setup_chroma(folder_path: str = 'knowledge_base/', collection_name: str = 'profile', watch: bool = False,
+                       interval: float = 5):
+    await Logger.start_logger()
+    try:
+        await ChromaDB.connect()
+        await ChromaDB.create_collection(collection_name)
+        if watch:
+            await FolderIngester(folder_path, collection_name).watch(interval)
+        else:
+            await add_profile_data_croma(folder_path, collection_name)
+    finally:
+        Logger.stop_logger()
 
 
 if __name__ == '__main__':
-    asyncio.run(setup_chroma())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Load a folder of .txt/.md files into a Chroma collection')
+    parser.add_argument('--folder', default='knowledge_base/')
+    parser.add_argument('--collection', default='profile')
+    parser.add_argument('--watch', action='store_true', help='keep running and sync changed files')
+    parser.add_argument('--interval', type=float, default=5, help='seconds between mtime polls in watch mode')
+    args = parser.parse_args()
+    asyncio.run(setup_chroma(args.folder, args.collection, args.watch, args.interval))
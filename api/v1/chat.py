@@ -1,12 +1,24 @@
+import json
 import os
 from fastapi import FastAPI, APIRouter, Request
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
-from icecream import ic
 
+from databases.chat_history import ChatHistoryWriter
 from databases.chromaDB import ChromaDB
+from databases.collection_versions import CollectionVersions
+from databases.tenants import TenantRegistry
 from schemas.schemas import QueryData
-from utils.langchain.retriver import gpt_response
+from utils.answer_cache import AnswerCache
+from utils.conversation_memory import ConversationMemory
+from utils.langchain.admission import LLMAdmission
+from utils.langchain.context_packer import ContextPacker
+from utils.langchain.retriver import gpt_response, gpt_response_stream
 from utils.logger import Logger
+from utils.single_flight import SingleFlight
+from utils.metrics import track_stage, track_in_flight, count_cache_event, tenant_label, CHUNKS_RETURNED, IN_FLIGHT, RATE_LIMITED
+from utils.rate_limit import RateLimiter, rate_limited
+from utils.small_talk import SmallTalk
 
 
 load_dotenv()
@@ -15,54 +27,99 @@ load_dotenv()
 chat_router = APIRouter()
 
 
+def sse_event(data: dict, event: str = None) -> str:
+    """
+    Format a payload as a Server-Sent Events message
+    """
+    message = f"event: {event}\n" if event else ''
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+async def answer_query(company_name: str, message: str, retrieval_query: str = None, history: str = '') -> dict:
+    """
+    Answer a query from the answer cache or through retrieval and the LLM.
+    Follow-up questions (with history) skip the answer cache, their answer depends on the conversation.
+    """
+    retrieval_query = retrieval_query or message
+    TenantRegistry.record_query(company_name)
+    # embed once, used for the answer cache and for retrieval
+    with track_stage('query_embedding', company_name):
+        query_embedding = (await ChromaDB.embed_texts([retrieval_query]))[0]
+    intent = SmallTalk.match_embedding(message, query_embedding) if not history else None
+    if intent:
+        count_cache_event(company_name, 'small_talk', 'embedding')
+        return {'response': SmallTalk.reply(company_name, intent), 'small_talk': True}
+
+    if not history:
+        cached_answer = AnswerCache.get(company_name, query_embedding)
+        count_cache_event(company_name, 'answer', 'miss' if cached_answer is None else 'hit')
+        if cached_answer is not None:
+            return {'response': cached_answer}
+
+    # retrieve the context by query
+    with track_stage('chroma_query', company_name):
+        # a cold tenant is restored from its snapshot on this first query
+        async with TenantRegistry.use(company_name):
+            chunks = await CollectionVersions.query_chunks(company_name, retrieval_query, query_embedding,
+                                                           n_results=int(os.getenv("RETRIEVE_N_DOCS", 4)))
+    CHUNKS_RETURNED.labels(tenant_label(company_name)).inc(len(chunks))
+
+    Logger.debug_log('retrieved_chunks', 'retrieved chunks', company_name=company_name, count=len(chunks),
+                     urls=sorted({(c.get('metadata') or {}).get('url') for c in chunks} - {None}))
+
+    response = await gpt_response(company_name=company_name,query=message,context=chunks,history=history)
+    if not history and response and response.get('response') and not response.get('degraded'):
+        AnswerCache.put(company_name, message, query_embedding, response.get('response'))
+    return response
+
+
 @chat_router.post('/qns-ans')
-async def chat_with_llm(query:QueryData):
+async def chat_with_llm(query:QueryData, request:Request):
+    retry_after = await RateLimiter.check('qns_ans', query.company_name, RateLimiter.client_ip(request))
+    if retry_after:
+        RATE_LIMITED.labels('qns_ans').inc()
+        return rate_limited(retry_after)
+    with track_in_flight('qns_ans'):
+        return await _chat_with_llm(query)
+
+
+async def _chat_with_llm(query:QueryData):
     try:
         data = query.model_dump()
         # user_info =await request.json()
 
         # convert into embeddings
         # user_id = user_info.get("userId")
-        message = data.get('query')
+        message = data.get('query').strip()
         company_name = data.get('company_name')
-        # retrieve the context by query
-        chunks = await ChromaDB.query_docs(collection_name=company_name,
-                                           query_texts=[message.strip()],
-                                           n_results=int(os.getenv("RETRIEVE_N_DOCS")),
-                                           threshold_score=1.5)
-
-        ic(chunks)
-
-
-        response = await gpt_response(company_name=company_name,query=message.strip(),context=chunks)
-
-        #
-        # chat_pair = {
-        #     "query": message.strip(),
-        #     "response": response.get("response"),
-        #     'timestamp' : datetime.now(tz=timezone.utc)
-        # }
-        #
-        # update_operation = {
-        #     "$setOnInsert": {
-        #         "company": company_name,
-        #         "created_at": datetime.utcnow()
-        #     },
-        #     "$set": {
-        #         "last_active": datetime.utcnow()
-        #     },
-        #     "$push": {
-        #         "messages": chat_pair
-        #     }
-        # }
-        #
-        # updated_doc = await MongoMotor.find_one_and_update_one(
-        #     collection_name="q_n_a",
-        #     find_filter={"company": company_name},
-        #     update_operation=update_operation,
-        #     return_doc=True,  # return updated doc if you need it
-        #     upsert=True
-        # )
+        session_id = data.get('session_id')
+
+        session = await ConversationMemory.get(session_id, company_name) if session_id else None
+        has_history = bool(session and (session['turns'] or session['summary']))
+        # greetings and thanks are answered from templates without retrieval or the LLM,
+        # within a conversation "ok" or "thanks, and the price?" is a follow-up for the model
+        intent = SmallTalk.match_pattern(message) if not has_history else None
+        if intent:
+            count_cache_event(company_name, 'small_talk', 'pattern')
+            response = {'response': SmallTalk.reply(company_name, intent), 'small_talk': True}
+        elif has_history:
+            history = ConversationMemory.history_text(session)
+            retrieval_query = await ConversationMemory.standalone_query(session, message)
+            response = await answer_query(company_name, message, retrieval_query, history)
+        else:
+            # identical questions arriving together share one retrieval + LLM call
+            key = SingleFlight.make_key(company_name, message)
+            if SingleFlight.is_in_flight(key):
+                count_cache_event(company_name, 'single_flight', 'coalesced')
+            response = await SingleFlight.do(key, answer_query, company_name, message)
+        SmallTalk.record(short_circuited=bool(response.get('small_talk')))
+
+        if session is not None:
+            ConversationMemory.add_turn(session, message, response.get('response'))
+
+        # persisted in batches by the write-behind buffer, off the request path
+        if ChatHistoryWriter.is_running():
+            ChatHistoryWriter.enqueue(company_name, message, response.get('response'))
 
         return {
             'response' : response.get('response')
@@ -74,4 +131,86 @@ async def chat_with_llm(query:QueryData):
         }
 
 
+@chat_router.get('/cache-stats')
+async def answer_cache_stats():
+    return {
+        **AnswerCache.stats(),
+        'rate_limits': RateLimiter.stats(),
+        'single_flight': SingleFlight.stats(),
+        'context_packer': ContextPacker.stats(),
+        'small_talk': SmallTalk.stats(),
+        'llm_admission': LLMAdmission.stats(),
+        'chat_history': ChatHistoryWriter.stats(),
+        'sessions': ConversationMemory.stats()
+    }
+
+
+@chat_router.post('/qns-ans/stream')
+async def chat_with_llm_stream(query:QueryData, request:Request):
+    """
+    Same as /qns-ans but pushes the answer to the client as Server-Sent Events
+    while the model is still generating it.
+    """
+    # shares the /qns-ans buckets, streaming is the same work
+    retry_after = await RateLimiter.check('qns_ans', query.company_name, RateLimiter.client_ip(request))
+    if retry_after:
+        RATE_LIMITED.labels('qns_ans').inc()
+        return rate_limited(retry_after)
+    data = query.model_dump()
+    message = data.get('query').strip()
+    company_name = data.get('company_name')
+    session_id = data.get('session_id')
+
+    async def event_stream():
+        IN_FLIGHT.labels('qns_ans_stream').inc()
+        try:
+            session = await ConversationMemory.get(session_id, company_name) if session_id else None
+            has_history = bool(session and (session['turns'] or session['summary']))
+            intent = SmallTalk.match_pattern(message) if not has_history else None
+            SmallTalk.record(short_circuited=bool(intent))
+            if intent:
+                count_cache_event(company_name, 'small_talk', 'pattern')
+                reply = SmallTalk.reply(company_name, intent)
+                if session is not None:
+                    ConversationMemory.add_turn(session, message, reply)
+                if ChatHistoryWriter.is_running():
+                    ChatHistoryWriter.enqueue(company_name, message, reply)
+                yield sse_event({'delta': reply})
+                yield sse_event({}, event='done')
+                return
+            history, retrieval_query = '', message
+            if has_history:
+                history = ConversationMemory.history_text(session)
+                retrieval_query = await ConversationMemory.standalone_query(session, message)
+
+            TenantRegistry.record_query(company_name)
+            with track_stage('query_embedding', company_name):
+                query_embedding = (await ChromaDB.embed_texts([retrieval_query]))[0]
+            with track_stage('chroma_query', company_name):
+                async with TenantRegistry.use(company_name):
+                    chunks = await CollectionVersions.query_chunks(company_name, retrieval_query, query_embedding,
+                                                                   n_results=int(os.getenv("RETRIEVE_N_DOCS", 4)))
+            CHUNKS_RETURNED.labels(tenant_label(company_name)).inc(len(chunks))
+            answer = []
+            async for delta in gpt_response_stream(company_name=company_name,query=message,context=chunks,
+                                                   history=history):
+                answer.append(delta)
+                yield sse_event({'delta': delta})
+            if session is not None:
+                ConversationMemory.add_turn(session, message, ''.join(answer))
+            # the whole answer, once the stream is complete
+            if ChatHistoryWriter.is_running():
+                ChatHistoryWriter.enqueue(company_name, message, ''.join(answer))
+        except Exception as e:
+            await Logger.error_log(__name__,'chat_with_llm_stream',str(e))
+            yield sse_event({'delta': 'Sorry, bot is under maintenance'})
+        finally:
+            IN_FLIGHT.labels('qns_ans_stream').dec()
+        yield sse_event({}, event='done')
+
+    return StreamingResponse(event_stream(),
+                             media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+
+from utils.profiler import RequestProfiler
+
+profile_router = APIRouter()
+
+
+def _forbidden(request: Request) -> JSONResponse | None:
+    if RequestProfiler.authorized(request.headers.get('x-profile-token')):
+        return None
+    return JSONResponse(status_code=403, content={'status': False})
+
+
+@profile_router.get('/profiles')
+async def list_profiles(request: Request, limit: int = 20):
+    """
+    The slowest stored request profiles with their request metadata
+    """
+    forbidden = _forbidden(request)
+    if forbidden:
+        return forbidden
+    return {
+        'data' : {
+            **RequestProfiler.stats(),
+            'profiles' : RequestProfiler.slowest(limit)
+        },
+        'status' : True
+    }
+
+
+@profile_router.get('/profiles/{profile_id}')
+async def download_profile(profile_id: str, request: Request, format: str = 'raw'):
+    """
+    Download a profile: a cProfile .prof file (pstats, snakeviz) or folded
+    stacks (flamegraph.pl, speedscope). format=text returns the top functions
+    of a cProfile profile by cumulative time.
+    """
+    forbidden = _forbidden(request)
+    if forbidden:
+        return forbidden
+    path = RequestProfiler.path(profile_id)
+    if path is None:
+        return JSONResponse(status_code=404, content={'status': False})
+    if format == 'text':
+        summary = RequestProfiler.summary(profile_id)
+        return PlainTextResponse(summary) if summary else JSONResponse(status_code=400, content={'status': False})
+    return FileResponse(path, filename=path.rsplit('/', 1)[-1])
@@ -1,47 +1,42 @@
-from icecream import ic
-import uuid
 from dotenv import load_dotenv
 from fastapi import APIRouter,Request
 
 
-from databases.chromaDB import ChromaDB
-from schemas.schemas import WebsiteRequest
+from databases.collection_versions import CollectionVersions
+from databases.tenants import TenantRegistry, website_domain
+from schemas.schemas import WebsiteRequest, ReindexRequest
 
+from utils.ingestion import ingest_pages
 from utils.logger import Logger
-from utils.utility import scrape_webpage, get_collection_name, docs_splitting
+from utils.metrics import track_in_flight, RATE_LIMITED
+from utils.rate_limit import RateLimiter, rate_limited
+from utils.utility import scrape_webpage, get_collection_name
 
 scrape_router = APIRouter()
 
 load_dotenv()
 
 @scrape_router.post('/scrape')
-async def get_all_data(request:WebsiteRequest):
+async def get_all_data(request:WebsiteRequest, http_request:Request):
+    # a scrape fetches a whole site and embeds it, the tenant bucket is per website
+    retry_after = await RateLimiter.check('scrape', website_domain(request.website),
+                                          RateLimiter.client_ip(http_request))
+    if retry_after:
+        RATE_LIMITED.labels('scrape').inc()
+        return rate_limited(retry_after)
+    with track_in_flight('scrape'):
+        return await _get_all_data(request)
+
+
+async def _get_all_data(request:WebsiteRequest):
     try:
         website = request.website
-        # get website links
-        text,external_links = await scrape_webpage(website)
-        ic(website)
         # load the text into vector_db
         collection_name= await get_collection_name(website)
-        ic(collection_name)
-        #1. convert text into docs using langchain
-        all_chunks = await docs_splitting(text,external_links)
-        if not all_chunks:
-            await Logger.info_log('Error in creating the docs')
-            raise ValueError
-        #2. create collection into the cromadb
-        await ChromaDB.create_collection(collection_name)
-
-        # separate the docs, metadata and uuid
-        documents = [chunk.page_content for chunk in all_chunks]
-        metadatas = [chunk.metadata for chunk in all_chunks]
-
-        ids = [str(uuid.uuid4()) for _ in all_chunks]  # Or your own ID strategy
-
-        await ChromaDB.add_documents(collection_name=collection_name,
-                                     ids=ids,
-                                     documents=documents,
-                                     metadatas=metadatas)
+        # get website links
+        text,external_links = await scrape_webpage(website, collection_name)
+        await Logger.info_log('website scraped', website=website, collection_name=collection_name, pages=len(text))
+        await ingest_pages(collection_name, text, external_links)
         data = {
             'collection_name' : collection_name
         }
@@ -57,7 +52,47 @@ async def get_all_data(request:WebsiteRequest):
         }
 
 
+@scrape_router.post('/reindex')
+async def reindex_collection(request:ReindexRequest, http_request:Request):
+    """
+    Build the next version of a company collection in the background and
+    switch to it once complete, queries keep using the current one meanwhile
+    """
+    retry_after = await RateLimiter.check('reindex', request.company_name, RateLimiter.client_ip(http_request))
+    if retry_after:
+        RATE_LIMITED.labels('reindex').inc()
+        return rate_limited(retry_after)
+    try:
+        await TenantRegistry.ensure_loaded(request.company_name)
+        progress = CollectionVersions.start_reindex(request.company_name, request.source, request.embedding_model)
+        return {
+            'data' : progress,
+            'status' : True
+        }
+    except Exception as e:
+        await Logger.error_log(__name__,'reindex_collection',e)
+        return {
+            'status' : False
+        }
 
 
-
-
+@scrape_router.get('/reindex/{company_name}')
+async def reindex_status(company_name:str):
+    return {
+        'data' : {
+            'collection_name' : await CollectionVersions.resolve(company_name),
+            'reindex' : CollectionVersions.status(company_name)
+        },
+        'status' : True
+    }
+
+
+@scrape_router.get('/tenants')
+async def tenant_stats():
+    """
+    Registered tenants with their tier (hot in Chroma, cold on disk) and usage counters
+    """
+    return {
+        'data' : TenantRegistry.stats(),
+        'status' : True
+    }
@@ -0,0 +1,118 @@
+"""
+Memory saved versus recall lost by compact vectors (databases/compact_vectors.py).
+
+For every reduced dimension it fits the PCA projection the way a compact
+collection does, then compares with exact search over the full vectors:
+  - recall@k of searching the reduced vectors alone
+  - recall@k after re-scoring the top k * factor candidates from the side store
+and reports the bytes per vector Chroma keeps in its index plus the side store
+size. Search is brute force in numpy, so the numbers isolate the effect of the
+projection (see benchmarks/hnsw_sweep.py for the HNSW side).
+
+    python -m benchmarks.compact_vectors --snapshot snapshots/acme
+    python -m benchmarks.compact_vectors --vectors 20000 --dims 64,128,256 --side-dtype float16
+
+Prefer --snapshot: the synthetic vectors only imitate the low intrinsic
+dimension of real sentence embeddings.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from databases.compact_vectors import SideStore
+
+
+def _ints(value: str) -> list[int]:
+    return [int(item) for item in value.split(',') if item]
+
+
+def synthetic_vectors(count: int, dim: int, rank: int = 96, seed: int = 7) -> np.ndarray:
+    """
+    Unit vectors with most of their variance in a few directions
+    """
+    rng = np.random.default_rng(seed)
+    latent = rng.normal(size=(count, rank)) * np.linspace(3, 0.3, rank)
+    vectors = latent @ rng.normal(size=(rank, dim)) + rng.normal(scale=0.5, size=(count, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    return vectors / (np.linalg.norm(vectors, axis=-1, keepdims=True) + 1e-12)
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    return round(float(np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(found.tolist(), truth.tolist())])), 4)
+
+
+def evaluate(vectors: np.ndarray, queries: np.ndarray, dims: list[int], k: int, factor: int,
+             side_dtype: str, directory: str) -> dict:
+    truth = _top(_normalise(queries) @ _normalise(vectors).T, k)
+    side = vectors.astype(side_dtype).astype(np.float32)
+    full_bytes = vectors.shape[1] * 4
+    rows = []
+    for dim in dims:
+        store = SideStore(os.path.join(directory, f"dim{dim}"), side_dtype)
+        store.fit(vectors, dim)
+        reduced = _normalise(store.project(vectors))
+        reduced_scores = _normalise(store.project(queries)) @ reduced.T
+        candidates = _top(reduced_scores, k * factor)
+        # exact cosine over the candidates only, like CompactVectors.rescore
+        exact = np.einsum('qd,qcd->qc', _normalise(queries), _normalise(side[candidates]))
+        rescored = np.take_along_axis(candidates, _top(exact, k), axis=1)
+        rows.append({
+            'dimension': dim,
+            'explained_variance': round(float(
+                np.var(store.project(vectors), axis=0).sum() / np.var(vectors, axis=0).sum()), 4),
+            'index_bytes_per_vector': dim * 4,
+            'index_saving': f"{(1 - dim * 4 / full_bytes) * 100:.1f}%",
+            'side_store_bytes_per_vector': vectors.shape[1] * np.dtype(side_dtype).itemsize,
+            'recall_reduced_only': _recall(_top(reduced_scores, k), truth),
+            'recall_rescored': _recall(rescored, truth),
+        })
+    return {'full_bytes_per_vector': full_bytes, 'results': rows}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--snapshot', help='collection snapshot directory to take the vectors from')
+    parser.add_argument('--vectors', type=int, default=20000, help='number of synthetic vectors')
+    parser.add_argument('--dim', type=int, default=768)
+    parser.add_argument('--dims', type=_ints, default=[64, 128, 256])
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--query-noise', type=float, default=0.01)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--factor', type=int, default=4, help='candidates re-scored per wanted result')
+    parser.add_argument('--side-dtype', default='float32', choices=['float32', 'float16'])
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    args = parser.parse_args()
+
+    if args.snapshot:
+        vectors = np.asarray(np.load(os.path.join(args.snapshot, 'embeddings.npy'), mmap_mode='r'), dtype=np.float32)
+    else:
+        vectors = synthetic_vectors(args.vectors, args.dim, seed=args.seed)
+    rng = np.random.default_rng(args.seed)
+    picks = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    queries = vectors[picks] + rng.normal(scale=args.query_noise, size=(len(picks), vectors.shape[1])).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as directory:
+        report = {'vectors': len(vectors), 'queries': len(queries), 'k': args.k, 'factor': args.factor,
+                  'side_dtype': args.side_dtype,
+                  **evaluate(vectors, queries, args.dims, args.k, args.factor, args.side_dtype, directory)}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
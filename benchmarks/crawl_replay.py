@@ -0,0 +1,101 @@
+"""
+Crawl archive size and replay speed (knowledge_base/crawl_archive.py).
+
+Writes a crawl of generated pages (the micro_ingestion corpus, or saved .html
+pages with --corpus) to a temporary archive and reports:
+  - raw versus archived bytes and the write throughput
+  - random access latency of reading one page through the offset index
+  - replay throughput (pages/sec) of parsing the whole archive with
+    replay_archive, for each --workers value
+
+Replay has no network or politeness delay, so pages/sec here is the parse
+bound that re-processing a tenant runs at.
+
+    python -m benchmarks.crawl_replay --pages 500 --workers 1,4
+    python -m benchmarks.crawl_replay --corpus saved_pages/ --codec gzip
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.micro_ingestion import load_corpus
+from knowledge_base.crawl_archive import CrawlArchive, CrawlArchiveWriter
+from knowledge_base.scrapper import replay_archive
+
+
+def _ints(value: str) -> list[int]:
+    return [int(item) for item in value.split(',') if item]
+
+
+def write_archive(path: str, pages: list[str], codec: str = None) -> dict:
+    urls = [f"https://www.example.com/page/{i}" for i in range(len(pages))]
+    started = time.perf_counter()
+    writer = CrawlArchiveWriter(path, codec=codec)
+    for url, html in zip(urls, pages):
+        writer.write(url, html)
+    manifest = writer.close(urls, [])
+    seconds = time.perf_counter() - started
+    return {
+        'codec': manifest['codec'],
+        'pages': manifest['pages'],
+        'raw_bytes': manifest['raw_bytes'],
+        'archive_bytes': manifest['archive_bytes'],
+        'compression_ratio': round(manifest['raw_bytes'] / max(1, manifest['archive_bytes']), 2),
+        'write_mb_per_sec': round(manifest['raw_bytes'] / seconds / 1e6, 1),
+    }
+
+
+def random_reads(path: str, reads: int, seed: int) -> dict:
+    archive = CrawlArchive(path)
+    rng = random.Random(seed)
+    urls = archive.urls
+    latencies = []
+    for _ in range(reads):
+        started = time.perf_counter()
+        archive.read(rng.choice(urls))
+        latencies.append(time.perf_counter() - started)
+    archive.close()
+    latencies.sort()
+    return {'p50_ms': round(statistics.median(latencies) * 1000, 3),
+            'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 3)}
+
+
+def replay(path: str, workers: int) -> dict:
+    started = time.perf_counter()
+    crawl = replay_archive(path, return_structured=True, workers=workers)
+    seconds = time.perf_counter() - started
+    return {'workers': workers, 'seconds': round(seconds, 2),
+            'pages_per_sec': round(len(crawl['pages']) / seconds, 1),
+            'failed': sum(1 for page in crawl['pages'] if not page.get('success'))}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help='directory of saved .html pages')
+    parser.add_argument('--pages', type=int, default=300, help='pages in the archived crawl')
+    parser.add_argument('--codec', choices=['zstd', 'gzip'], help='default: zstd when installed')
+    parser.add_argument('--workers', type=_ints, default=[1, os.cpu_count() or 1])
+    parser.add_argument('--reads', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    args = parser.parse_args()
+
+    corpus = [page for pages in load_corpus(args.corpus, args.seed).values() for page in pages]
+    pages = [corpus[i % len(corpus)] for i in range(args.pages)]
+    with tempfile.TemporaryDirectory() as directory:
+        report = {'archive': write_archive(directory, pages, args.codec),
+                  'random_read': random_reads(directory, args.reads, args.seed),
+                  'replay': [replay(directory, workers) for workers in args.workers]}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
@@ -0,0 +1,368 @@
+"""
+End-to-end load test of the FastAPI app with local stand-ins.
+
+Starts a local Chroma server (`chroma run`), the fake OpenAI server, a generated
+fixture website and the app itself (uvicorn main:app), seeds a collection through
+/api/v1/scrape, then replays a JSONL workload against /api/v1/qns-ans at a target
+RPS (open loop). Latency percentiles, throughput, errors and the app's CPU and
+RSS are written as JSON so runs can be compared.
+
+    python -m benchmarks.e2e_load --rps 20 --duration 30 --output bench.json
+    python -m benchmarks.e2e_load --compare bench.json --output bench-new.json
+
+Workload lines are {"query": ..., "company_name": ...} (sent to /qns-ans, the
+company defaults to the collection /scrape returned) or {"path": ..., "body":
+{...}} for any other POST route. A /qns-ans reply with the maintenance message
+or an empty answer counts as an error even though it is an HTTP 200.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fixture_site import build_site, serve
+
+# what /qns-ans answers with HTTP 200 when it failed
+MAINTENANCE_REPLY = 'Sorry, bot is under maintenance'
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {'p50': None, 'p95': None, 'p99': None, 'max': None, 'mean': None}
+    values = sorted(values)
+
+    def pick(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 2)
+
+    return {'p50': pick(0.5), 'p95': pick(0.95), 'p99': pick(0.99), 'max': round(values[-1] * 1000, 2),
+            'mean': round(sum(values) / len(values) * 1000, 2)}
+
+
+class ProcessSampler:
+    """
+    Samples CPU time and RSS of a process from /proc (psutil when installed)
+    """
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.rss = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._cpu_start = None
+        self._cpu_end = None
+        self._wall_start = None
+        self._wall_end = None
+        try:
+            import psutil
+            self._process = psutil.Process(pid)
+        except ImportError:
+            self._process = None
+
+    def _cpu_seconds(self) -> float:
+        if self._process is not None:
+            times = self._process.cpu_times()
+            return times.user + times.system
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+    def _rss_bytes(self) -> int:
+        if self._process is not None:
+            return self._process.memory_info().rss
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.rss.append(self._rss_bytes())
+            except (OSError, ValueError):
+                break
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._cpu_start, self._wall_start = self._cpu_seconds(), time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._cpu_end, self._wall_end = self._cpu_seconds(), time.perf_counter()
+        self._stop.set()
+        self._thread.join()
+
+    def report(self) -> dict:
+        wall = (self._wall_end or time.perf_counter()) - self._wall_start
+        return {
+            'cpu_seconds': round(self._cpu_end - self._cpu_start, 3),
+            'cpu_percent': round((self._cpu_end - self._cpu_start) / wall * 100, 1) if wall else None,
+            'rss_mb_max': round(max(self.rss) / 2 ** 20, 1) if self.rss else None,
+            'rss_mb_mean': round(sum(self.rss) / len(self.rss) / 2 ** 20, 1) if self.rss else None,
+        }
+
+
+def start_process(args: list[str], env: dict, log_path: str) -> subprocess.Popen:
+    log = open(log_path, 'w')
+    return subprocess.Popen(args, env=env, cwd=ROOT, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+
+
+def stop_process(process: subprocess.Popen) -> None:
+    if process.poll() is None:
+        os.killpg(process.pid, signal.SIGINT)
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+
+
+async def wait_until_up(url: str, timeout: float = 120) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get(url, timeout=2)
+                if response.status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def load_workload(path: str, company_name: str) -> list[tuple[str, dict]]:
+    requests = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if 'path' in item:
+                requests.append((item['path'], item.get('body', {})))
+            elif 'query' in item:
+                requests.append(('/api/v1/qns-ans', {'query': item['query'],
+                                                     'company_name': item.get('company_name') or company_name}))
+    if not requests:
+        raise ValueError(f"no replayable requests in {path}")
+    return requests
+
+
+def failure(path: str, response: httpx.Response) -> str | None:
+    """
+    Why a response counts as an error, None for a success
+    """
+    if response.status_code >= 400:
+        return f"http_{response.status_code}"
+    try:
+        body = response.json()
+    except ValueError:
+        return 'invalid_json'
+    if body.get('status') is False:
+        return 'status_false'
+    if path == '/api/v1/qns-ans':
+        answer = body.get('response')
+        if answer == MAINTENANCE_REPLY:
+            return 'maintenance'
+        if not isinstance(answer, str) or not answer.strip():
+            return 'empty_answer'
+    return None
+
+
+async def replay(base_url: str, requests: list[tuple[str, dict]], rps: float, duration: float,
+                 timeout: float) -> dict:
+    latencies, errors, statuses, failures = [], 0, {}, {}
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=200)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+
+        async def one(path, body):
+            nonlocal errors
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                reason = failure(path, response)
+                if reason:
+                    errors += 1
+                    failures[reason] = failures.get(reason, 0) + 1
+            except httpx.HTTPError:
+                errors += 1
+                statuses['exception'] = statuses.get('exception', 0) + 1
+            latencies.append(time.perf_counter() - started)
+
+        tasks, index = [], 0
+        started = time.perf_counter()
+        next_at = started
+        while time.perf_counter() - started < duration:
+            path, body = requests[index % len(requests)]
+            index += 1
+            tasks.append(asyncio.create_task(one(path, body)))
+            # poisson arrivals, scheduled against the clock so slow sends do not lower the rate
+            next_at += random.expovariate(rps)
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        sent_for = time.perf_counter() - started
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    return {
+        'target_rps': rps,
+        'sent': len(tasks),
+        'offered_rps': round(len(tasks) / sent_for, 2),
+        'throughput_rps': round((len(tasks) - errors) / elapsed, 2),
+        'errors': errors,
+        'statuses': {str(k): v for k, v in statuses.items()},
+        'failures': failures,
+        'latency_ms': percentiles(latencies),
+    }
+
+
+async def run_scrape(base_url: str, website: str, runs: int, timeout: float) -> dict:
+    latencies, failures, collection_name = [], 0, None
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+        for _ in range(runs):
+            started = time.perf_counter()
+            response = await client.post('/api/v1/scrape', json={'website': website})
+            latencies.append(time.perf_counter() - started)
+            if failure('/api/v1/scrape', response):
+                failures += 1
+            else:
+                collection_name = response.json()['data']['collection_name']
+    return {'runs': runs, 'failures': failures, 'collection_name': collection_name,
+            'latency_ms': percentiles(latencies)}
+
+
+def compare(previous: dict, current: dict) -> dict:
+    """
+    Relative change of the headline numbers against a previous report
+    """
+    changes = {}
+    for section in ('qns_ans', 'scrape'):
+        old, new = previous.get(section) or {}, current.get(section) or {}
+        for key in ('p50', 'p95', 'p99'):
+            before, after = (old.get('latency_ms') or {}).get(key), (new.get('latency_ms') or {}).get(key)
+            if before and after:
+                changes[f"{section}.{key}"] = f"{(after - before) / before * 100:+.1f}%"
+        if old.get('throughput_rps') and new.get('throughput_rps'):
+            changes[f"{section}.throughput"] = \
+                f"{(new['throughput_rps'] - old['throughput_rps']) / old['throughput_rps'] * 100:+.1f}%"
+    return changes
+
+
+async def main(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix='hipster-bench-')
+    site_root = os.path.join(workdir, 'site')
+    os.makedirs(site_root)
+    build_site(site_root, args.pages)
+    site = serve(site_root, port=args.site_port)
+
+    env = {
+        **os.environ,
+        'CHROMA_URI': '127.0.0.1',
+        'CHROMA_PORT': str(args.chroma_port),
+        'OPENAI_API_KEY': 'sk-fake',
+        'OPENAI_BASE_URL': f"http://127.0.0.1:{args.llm_port}/v1",
+        'RETRIEVE_N_DOCS': os.getenv('RETRIEVE_N_DOCS', '5'),
+        'ANONYMIZED_TELEMETRY': 'False',
+        # the load comes from one client address
+        'RATE_LIMIT_ENABLED': os.getenv('RATE_LIMIT_ENABLED', 'false'),
+        # the app runs in the repo, all its state goes to the work dir so the real snapshots,
+        # tenants.json, crawl archives and compact vectors are never read or overwritten
+        'SNAPSHOT_DIR': os.path.join(workdir, 'snapshots'),
+        'CRAWL_ARCHIVE_DIR': os.path.join(workdir, 'crawl_archive'),
+        'COMPACT_DIR': os.path.join(workdir, 'vector_store'),
+        'PROFILE_DIR': os.path.join(workdir, 'profiles'),
+    }
+    env.pop('MONGO_DB_URI', None)
+    processes = []
+    try:
+        processes.append(start_process(['chroma', 'run', '--path', os.path.join(workdir, 'chroma'),
+                                        '--port', str(args.chroma_port)], env, os.path.join(workdir, 'chroma.log')))
+        processes.append(start_process([sys.executable, '-m', 'benchmarks.fake_openai', '--port', str(args.llm_port),
+                                        '--latency', str(args.llm_latency),
+                                        '--tokens-per-second', str(args.llm_tokens_per_second)],
+                                       env, os.path.join(workdir, 'fake_openai.log')))
+        await wait_until_up(f"http://127.0.0.1:{args.chroma_port}/api/v2/heartbeat")
+        await wait_until_up(f"http://127.0.0.1:{args.llm_port}/stats")
+
+        app = start_process([sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(args.app_port),
+                             '--workers', str(args.workers), '--log-level', 'warning'],
+                            env, os.path.join(workdir, 'app.log'))
+        processes.append(app)
+        base_url = f"http://127.0.0.1:{args.app_port}"
+        await wait_until_up(f"{base_url}/health")
+
+        report = {'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'config': vars(args).copy(), 'workdir': workdir}
+        website = f"http://127.0.0.1:{args.site_port}/"
+        with ProcessSampler(app.pid) as sampler:
+            report['scrape'] = await run_scrape(base_url, website, args.scrape_runs, args.timeout)
+        report['scrape']['resources'] = sampler.report()
+
+        if args.scenario in ('qns', 'both'):
+            # the app names the collection after the fixture site's host, the questions go to that tenant
+            if not report['scrape']['collection_name']:
+                raise RuntimeError("/api/v1/scrape failed, run with --keep-workdir to read app.log")
+            random.seed(args.seed)
+            workload = load_workload(args.workload, report['scrape']['collection_name'])
+            # warm up the model and connections before measuring
+            await replay(base_url, workload, rps=min(args.rps, 5), duration=args.warmup, timeout=args.timeout)
+            with ProcessSampler(app.pid) as sampler:
+                report['qns_ans'] = await replay(base_url, workload, args.rps, args.duration, args.timeout)
+            report['qns_ans']['resources'] = sampler.report()
+
+        async with httpx.AsyncClient() as client:
+            report['fake_llm'] = (await client.get(f"http://127.0.0.1:{args.llm_port}/stats")).json()
+        return report
+    finally:
+        for process in reversed(processes):
+            stop_process(process)
+        site.shutdown()
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', choices=['qns', 'scrape', 'both'], default='both')
+    parser.add_argument('--workload', default=os.path.join(ROOT, 'benchmarks', 'workloads', 'qns_ans.jsonl'))
+    parser.add_argument('--rps', type=float, default=20)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--scrape-runs', type=int, default=1)
+    parser.add_argument('--pages', type=int, default=20, help='pages in the fixture site')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn workers of the app')
+    parser.add_argument('--llm-latency', type=float, default=0.3)
+    parser.add_argument('--llm-tokens-per-second', type=float, default=120)
+    parser.add_argument('--app-port', type=int, default=9000)
+    parser.add_argument('--chroma-port', type=int, default=9300)
+    parser.add_argument('--llm-port', type=int, default=9100)
+    parser.add_argument('--site-port', type=int, default=9200)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--compare', help='previous JSON report to compare against')
+    parser.add_argument('--keep-workdir', action='store_true', help='keep logs and data of the run')
+    arguments = parser.parse_args()
+
+    result = asyncio.run(main(arguments))
+    if arguments.compare:
+        with open(arguments.compare, encoding='utf-8') as f:
+            result['compared_to'] = {'report': arguments.compare, 'changes': compare(json.load(f), result)}
+    output = json.dumps(result, indent=2)
+    if arguments.output:
+        with open(arguments.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
@@ -0,0 +1,94 @@
+"""
+Fake OpenAI compatible chat completions server for load tests.
+
+Answers every /v1/chat/completions call with a canned JSON answer in the format
+the chatbot prompt asks for, after FIRST_TOKEN_LATENCY seconds plus one token
+every 1/TOKENS_PER_SECOND seconds. Streaming (stream=true) is supported.
+
+    python -m benchmarks.fake_openai --port 9100 --latency 0.3 --tokens-per-second 120
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+
+ANSWER = ("We offer web development, mobile apps and cloud consulting.\n\n"
+          "- Web development: custom sites and web apps\n"
+          "- Mobile apps: iOS and Android\n"
+          "- Cloud consulting: migrations and cost reviews\n\n"
+          "You can find more details on our services page.")
+
+settings = {'latency': 0.3, 'tokens_per_second': 120.0}
+stats = {'requests': 0, 'streamed': 0}
+
+app = FastAPI()
+
+
+def completion_tokens() -> list[str]:
+    content = json.dumps({'response': ANSWER})
+    # ~4 characters per token, close enough for pacing
+    return [content[i:i + 4] for i in range(0, len(content), 4)]
+
+
+@app.post('/v1/chat/completions')
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats['requests'] += 1
+    tokens = completion_tokens()
+    prompt_tokens = sum(len(str(m.get('content', ''))) for m in body.get('messages', [])) // 4
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get('model', 'gpt-4.1-nano')
+    delay = 1 / settings['tokens_per_second'] if settings['tokens_per_second'] > 0 else 0
+
+    if body.get('stream'):
+        stats['streamed'] += 1
+
+        async def events():
+            await asyncio.sleep(settings['latency'])
+            for token in tokens:
+                chunk = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                         'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(delay)
+            done = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                    'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}
+            yield f"data: {json.dumps(done)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type='text/event-stream')
+
+    await asyncio.sleep(settings['latency'] + delay * len(tokens))
+    return {
+        'id': completion_id,
+        'object': 'chat.completion',
+        'created': created,
+        'model': model,
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': ''.join(tokens)},
+                     'finish_reason': 'stop'}],
+        'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(tokens),
+                  'total_tokens': prompt_tokens + len(tokens)}
+    }
+
+
+@app.get('/stats')
+async def get_stats():
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--latency', type=float, default=0.3, help='seconds before the first token')
+    parser.add_argument('--tokens-per-second', type=float, default=120)
+    args = parser.parse_args()
+    settings['latency'] = args.latency
+    settings['tokens_per_second'] = args.tokens_per_second
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
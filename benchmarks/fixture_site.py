@@ -0,0 +1,75 @@
+"""
+Generates a small company website and serves it locally, so /scrape can be
+benchmarked without touching the network.
+
+    python -m benchmarks.fixture_site --port 9200 --pages 20
+"""
+import argparse
+import functools
+import os
+import random
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+
+SECTIONS = ['Services', 'Pricing', 'About us', 'Careers', 'Case studies', 'Support', 'Security', 'Partners']
+WORDS = ("cloud platform migration consulting secure scalable team customers delivery agile mobile web "
+         "analytics data pipeline design support pricing plan enterprise startup integration api").split()
+
+
+def _paragraph(rng: random.Random, sentences: int = 5) -> str:
+    return ' '.join(' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 18))).capitalize() + '.'
+                    for _ in range(sentences))
+
+
+def build_site(root: str, pages: int = 20, seed: int = 7) -> list[str]:
+    """
+    Write index.html plus `pages` linked pages into root, returns the page paths
+    """
+    rng = random.Random(seed)
+    names = [f"page-{i}.html" for i in range(pages)]
+    nav = ''.join(f'<li><a href="/{name}">{SECTIONS[i % len(SECTIONS)]} {i}</a></li>' for i, name in enumerate(names))
+    external = '<a href="https://github.com/example">GitHub</a> <a href="https://www.linkedin.com/company/example">LinkedIn</a>'
+
+    for i, name in enumerate(['index.html'] + names):
+        title = 'Example Co' if i == 0 else f"{SECTIONS[(i - 1) % len(SECTIONS)]} {i - 1} | Example Co"
+        sections = ''.join(
+            f"<h2>{rng.choice(SECTIONS)} overview</h2><p>{_paragraph(rng)}</p>"
+            f"<h3>Details</h3><p>{_paragraph(rng, 8)}</p><ul><li>{_paragraph(rng, 1)}</li></ul>"
+            for _ in range(rng.randint(2, 6))
+        )
+        html = (f"<!doctype html><html><head><title>{title}</title>"
+                f'<meta name="description" content="{_paragraph(rng, 1)}">'
+                f"<style>body{{font-family:sans-serif}}</style><script>var x = 1;</script></head>"
+                f"<body><header><nav><ul>{nav}</ul></nav></header>"
+                f"<main><h1>{title}</h1>{sections}</main>"
+                f"<footer>{external}</footer></body></html>")
+        with open(os.path.join(root, name), 'w', encoding='utf-8') as f:
+            f.write(html)
+    return names
+
+
+def serve(root: str, host: str = '127.0.0.1', port: int = 9200) -> ThreadingHTTPServer:
+    """
+    Serve root in a daemon thread, returns the server (call shutdown() to stop)
+    """
+    class QuietHandler(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), functools.partial(QuietHandler, directory=root))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=9200)
+    parser.add_argument('--pages', type=int, default=20)
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp(prefix='fixture-site-')
+    build_site(directory, args.pages)
+    print(f"serving {args.pages + 1} pages from {directory} on http://127.0.0.1:{args.port}/")
+    serve(directory, port=args.port)
+    threading.Event().wait()
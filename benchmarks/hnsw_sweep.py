@@ -0,0 +1,153 @@
+"""
+Recall/latency sweep of Chroma HNSW settings.
+
+Builds an in-process Chroma collection for every (M, ef_construction, ef_search)
+combination and measures recall@k against exact brute-force search (numpy) and
+the query latency. Every combination gets its own build because an index that
+is already loaded keeps the ef_search it was loaded with. The vectors come from a collection snapshot
+(SNAPSHOT_DIR/<name>, see databases/snapshots.py) or are generated as clustered
+unit vectors the size of the mpnet embeddings.
+
+    python -m benchmarks.hnsw_sweep --vectors 20000 --output sweep.json
+    python -m benchmarks.hnsw_sweep --snapshot snapshots/acme --m 16,32 --ef-search 32,64,128
+
+The report lists, per setting, recall@k, p50/p95 query latency and build time,
+plus the fastest setting that reaches --target-recall. Latencies exclude the
+HTTP hop to a Chroma server, so compare settings with each other rather than
+with production numbers.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from databases.chromaDB import hnsw_configuration
+
+
+def _ints(value: str) -> list[int]:
+    return [int(item) for item in value.split(',') if item]
+
+
+def synthetic_vectors(count: int, dim: int, clusters: int = 50, seed: int = 7) -> np.ndarray:
+    """
+    Unit vectors around a few topic centres, closer to real page embeddings
+    than uniform noise
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim))
+    vectors = centres[rng.integers(0, clusters, count)] + rng.normal(scale=0.6, size=(count, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def load_vectors(args) -> np.ndarray:
+    if args.snapshot:
+        return np.asarray(np.load(os.path.join(args.snapshot, 'embeddings.npy'), mmap_mode='r'), dtype=np.float32)
+    return synthetic_vectors(args.vectors, args.dim, seed=args.seed)
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    if space == 'l2':
+        scores = -((queries ** 2).sum(1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(1)[None, :])
+    elif space == 'cosine':
+        normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        scores = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ normed.T
+    else:
+        scores = queries @ vectors.T
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+
+def build(client, vectors: np.ndarray, hnsw: dict, batch_size: int = 5000):
+    name = f"sweep_{hnsw['max_neighbors']}_{hnsw['ef_construction']}_{hnsw['ef_search']}"
+    try:
+        client.delete_collection(name)
+    except Exception:
+        pass
+    collection = client.create_collection(name, configuration={'hnsw': hnsw}, embedding_function=None)
+    started = time.perf_counter()
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start:start + batch_size]
+        collection.add(ids=[str(i) for i in range(start, start + len(batch))], embeddings=batch)
+    return collection, time.perf_counter() - started
+
+
+def measure(collection, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        result = collection.query(query_embeddings=[query], n_results=k, include=[])
+        latencies.append(time.perf_counter() - started)
+        hits += len({int(i) for i in result['ids'][0]} & set(expected.tolist()))
+    latencies.sort()
+    return {
+        'recall_at_k': round(hits / (len(queries) * k), 4),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 3),
+    }
+
+
+def sweep(args) -> dict:
+    import chromadb
+
+    vectors = load_vectors(args)
+    rng = np.random.default_rng(args.seed)
+    # queries are perturbed copies of stored vectors, like a question close to a chunk
+    picks = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    queries = vectors[picks] + rng.normal(scale=args.query_noise, size=(len(picks), vectors.shape[1])).astype(np.float32)
+    truth = exact_neighbours(vectors, queries, args.k, args.space)
+
+    client = chromadb.EphemeralClient(settings=chromadb.config.Settings(anonymized_telemetry=False))
+    results = []
+    for max_neighbors in args.m:
+        for ef_construction in args.ef_construction:
+            for ef_search in args.ef_search:
+                hnsw = {'space': args.space, 'max_neighbors': max_neighbors, 'ef_construction': ef_construction,
+                        'ef_search': ef_search}
+                collection, build_seconds = build(client, vectors, hnsw)
+                results.append({**hnsw, 'build_seconds': round(build_seconds, 2),
+                                **measure(collection, queries, truth, args.k)})
+                client.delete_collection(collection.name)
+
+    reaching = [row for row in results if row['recall_at_k'] >= args.target_recall]
+    return {
+        'vectors': len(vectors),
+        'dimension': int(vectors.shape[1]),
+        'queries': len(queries),
+        'k': args.k,
+        'space': args.space,
+        'current_tier': hnsw_configuration(len(vectors), args.space),
+        'target_recall': args.target_recall,
+        'recommended': min(reaching, key=lambda row: row['p95_ms']) if reaching else None,
+        'results': results,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--snapshot', help='collection snapshot directory to take the vectors from')
+    parser.add_argument('--vectors', type=int, default=20000, help='number of synthetic vectors')
+    parser.add_argument('--dim', type=int, default=768)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--query-noise', type=float, default=0.01)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--space', default='cosine', choices=['cosine', 'l2', 'ip'])
+    parser.add_argument('--m', type=_ints, default=[16, 32, 48])
+    parser.add_argument('--ef-construction', type=_ints, default=[100, 200, 400])
+    parser.add_argument('--ef-search', type=_ints, default=[16, 32, 64, 128, 256])
+    parser.add_argument('--target-recall', type=float, default=0.95)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    args = parser.parse_args()
+
+    output = json.dumps(sweep(args), indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
@@ -0,0 +1,115 @@
+"""
+Import-time profile and cold start gate for the API.
+
+Imports the app module in fresh interpreters with `python -X importtime`,
+reports the packages and modules the import time goes to and the wall time of
+the import, and fails (exit status 1) when the median import time is above
+--max-seconds or when one of the heavy packages that should only load on first
+use (scraping, LLM client, vector store, embedding model) was imported.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --max-seconds 1.0 --top 30 --output import_time.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# top level packages that must not be imported by `import main`
+LAZY_PACKAGES = ['bs4', 'chromadb', 'sentence_transformers', 'torch', 'langchain_openai',
+                 'langchain_community', 'langchain_text_splitters', 'icecream', 'tiktoken']
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed, 'modules': sorted({{name.split('.')[0] for name in sys.modules}})}}))
+"""
+
+
+def parse_importtime(stderr: str) -> list[dict]:
+    """
+    Parse the `import time: self [us] | cumulative | imported package` lines
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        rows.append({'module': name.strip(), 'self_ms': int(self_us) / 1000,
+                     'cumulative_ms': int(cumulative_us) / 1000})
+    return rows
+
+
+def import_once(module: str, importtime: bool = False) -> tuple[dict, list[dict]]:
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', _PROBE.format(module=module)]
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+
+def profile(module: str, runs: int, top: int) -> dict:
+    # first run warms the filesystem and bytecode caches, it is not counted
+    import_once(module)
+    timings = [import_once(module)[0]['seconds'] for _ in range(runs)]
+    probe, rows = import_once(module, importtime=True)
+
+    # self time summed per top level package shows which dependency the time goes to
+    packages = {}
+    for row in rows:
+        package = row['module'].split('.')[0]
+        packages[package] = packages.get(package, 0) + row['self_ms']
+    return {
+        'module': module,
+        'runs': runs,
+        'median_seconds': round(statistics.median(timings), 3),
+        'max_seconds': round(max(timings), 3),
+        'lazy_packages_imported': [name for name in LAZY_PACKAGES if name in probe['modules']],
+        'top_packages_ms': {name: round(ms, 1) for name, ms in
+                            sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]},
+        'top_self_ms': {row['module']: round(row['self_ms'], 1) for row in
+                        sorted(rows, key=lambda row: row['self_ms'], reverse=True)[:top]},
+    }
+
+
+def check(report: dict, max_seconds: float) -> list[str]:
+    """
+    Why the profiled import misses the cold start target, empty when it does not
+    """
+    failures = []
+    if report['median_seconds'] > max_seconds:
+        failures.append(f"median import time {report['median_seconds']}s is above {max_seconds}s")
+    if report['lazy_packages_imported']:
+        failures.append(f"imported at startup: {', '.join(report['lazy_packages_imported'])}")
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='main')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--max-seconds', type=float, default=float(os.getenv('COLD_START_MAX_SECONDS', 1.5)))
+    parser.add_argument('--output', help='write the JSON report to this file')
+    args = parser.parse_args()
+
+    report = profile(args.module, args.runs, args.top)
+    failures = check(report, args.max_seconds)
+    report['target_seconds'] = args.max_seconds
+    report['failures'] = failures
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,151 @@
+"""
+Load test for the LLM admission controller against a local fake LLM.
+
+The fake provider enforces a requests-per-second quota (a token bucket that, like
+real providers, is also drained by rejected calls) and a concurrency cap; calls
+over either get a 429 after a short delay. The same open
+loop workload is replayed once with bare calls (retried like max_retries=2) and
+once through LLMAdmission, and goodput and latency percentiles are printed as JSON.
+
+    python -m benchmarks.llm_admission_load --rps 120 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.langchain.admission import LLMAdmission, LLMOverloaded
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+
+class FakeLLM:
+    def __init__(self, capacity: int, quota_rps: float, latency: float, reject_latency: float = 0.05):
+        self.capacity = capacity
+        self.quota_rps = quota_rps
+        self.latency = latency
+        self.reject_latency = reject_latency
+        self.tokens = quota_rps
+        self.refilled_at = time.perf_counter()
+        self.active = 0
+        self.calls = 0
+        self.rejected = 0
+
+    def _take_token(self) -> bool:
+        now = time.perf_counter()
+        self.tokens = min(self.quota_rps, self.tokens + (now - self.refilled_at) * self.quota_rps)
+        self.refilled_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        # rejected requests still count against the quota
+        self.tokens = 0
+        return False
+
+    async def ainvoke(self):
+        self.calls += 1
+        if not self._take_token() or self.active >= self.capacity:
+            self.rejected += 1
+            await asyncio.sleep(self.reject_latency)
+            raise FakeRateLimitError('429 Too Many Requests')
+        self.active += 1
+        try:
+            await asyncio.sleep(random.lognormvariate(0, 0.25) * self.latency)
+            return '{"response": "ok"}'
+        finally:
+            self.active -= 1
+
+
+async def call_with_retries(llm: FakeLLM, retries: int):
+    for attempt in range(retries + 1):
+        try:
+            return await llm.ainvoke()
+        except FakeRateLimitError:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(0.2 * 2 ** attempt)
+
+
+async def unlimited_request(llm: FakeLLM):
+    return await call_with_retries(llm, retries=2)
+
+
+async def admitted_request(llm: FakeLLM):
+    async with LLMAdmission.slot():
+        return await call_with_retries(llm, retries=1)
+
+
+async def run(mode: str, rps: float, duration: float, capacity: int, quota_rps: float, latency: float,
+              seed: int) -> dict:
+    random.seed(seed)
+    llm = FakeLLM(capacity=capacity, quota_rps=quota_rps, latency=latency)
+    LLMAdmission.configure(limit=float(os.getenv('LLM_CONCURRENCY_INITIAL', 8)), _avg_latency=latency)
+    handler = admitted_request if mode == 'admission' else unlimited_request
+    results = []
+
+    async def one():
+        started = time.perf_counter()
+        try:
+            await handler(llm)
+            outcome = 'ok'
+        except LLMOverloaded:
+            outcome = 'shed'
+        except FakeRateLimitError:
+            outcome = 'rate_limited'
+        results.append((outcome, time.perf_counter() - started))
+
+    tasks = []
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        tasks.append(asyncio.create_task(one()))
+        await asyncio.sleep(random.expovariate(rps))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    ok = sorted(latency for outcome, latency in results if outcome == 'ok')
+    everything = sorted(latency for _, latency in results)
+
+    def pct(values, q):
+        return round(values[min(len(values) - 1, int(q * len(values)))], 4) if values else None
+
+    return {
+        'mode': mode,
+        'requests': len(results),
+        'ok': len(ok),
+        'shed': sum(1 for outcome, _ in results if outcome == 'shed'),
+        'rate_limited': sum(1 for outcome, _ in results if outcome == 'rate_limited'),
+        'goodput_rps': round(len(ok) / elapsed, 2),
+        'provider_calls': llm.calls,
+        'provider_429s': llm.rejected,
+        'ok_latency': {'p50': pct(ok, 0.5), 'p95': pct(ok, 0.95), 'p99': pct(ok, 0.99),
+                       'mean': round(statistics.mean(ok), 4) if ok else None},
+        'all_latency': {'p50': pct(everything, 0.5), 'p95': pct(everything, 0.95), 'p99': pct(everything, 0.99)},
+        'admission': LLMAdmission.stats() if mode == 'admission' else None,
+    }
+
+
+async def main(args):
+    report = []
+    for mode in ('unlimited', 'admission'):
+        report.append(await run(mode, args.rps, args.duration, args.capacity, args.quota_rps, args.latency,
+                                 args.seed))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rps', type=float, default=120)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--capacity', type=int, default=64, help='concurrent calls the fake provider accepts')
+    parser.add_argument('--quota-rps', type=float, default=60, help='requests per second the fake provider allows')
+    parser.add_argument('--latency', type=float, default=0.4, help='median fake completion latency in seconds')
+    parser.add_argument('--seed', type=int, default=7)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,193 @@
+"""
+Micro-benchmarks for the CPU heavy ingestion functions:
+
+- WebScraper.extract_text_from_html
+- WebScraper.extract_structured_data
+- URLExtractor.extract_urls_from_html
+- URLExtractor._apply_filters
+- utils.utility.docs_splitting, over plain text (character splitter) and over
+  structured pages (heading sections, token sized)
+
+Each benchmark runs over a corpus of small, medium and large pages and reports
+time per call (min/median over rounds), pages/sec or chunks/sec and the peak and
+total allocations of one call (tracemalloc). By default a deterministic corpus
+with real-world page structure (nav/header/footer, inline scripts and styles,
+nested layout divs, long link lists) is generated; --corpus points it at a
+directory of saved .html pages instead.
+
+    python -m benchmarks.micro_ingestion --output micro.json
+    python -m benchmarks.micro_ingestion --compare micro.json
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from knowledge_base.scrapper import WebScraper, URLExtractor
+from utils.utility import docs_splitting
+
+
+BASE_URL = 'https://www.example.com/'
+SIZES = {'small': (2, 20), 'medium': (12, 120), 'large': (60, 600)}
+WORDS = ("our team delivers secure cloud native platforms for customers across retail finance and health "
+         "we design build and operate data pipelines mobile apps and web products with measurable outcomes "
+         "pricing depends on scope support is available around the clock").split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def generate_page(rng: random.Random, sections: int, links: int) -> str:
+    nav = ''.join(f'<li class="nav-item"><a class="nav-link" href="/section-{i}">Section {i}</a></li>'
+                  for i in range(min(links, 30)))
+    body_links = []
+    for i in range(links):
+        kind = i % 7
+        if kind == 0:
+            body_links.append(f'<a href="https://partner{i}.example.org/page">Partner {i}</a>')
+        elif kind == 1:
+            body_links.append(f'<a href="/files/brochure-{i}.pdf">Brochure {i}</a>')
+        elif kind == 2:
+            body_links.append(f'<a href="mailto:team{i}@example.com">Mail</a>')
+        elif kind == 3:
+            body_links.append(f'<a href="#anchor-{i}">Jump</a>')
+        else:
+            body_links.append(f'<a href="/blog/post-{i}?ref=home" title="Post {i}">Read post {i}</a>')
+    content = []
+    for i in range(sections):
+        content.append(
+            f'<section id="s{i}"><div class="container"><div class="row"><div class="col-md-8">'
+            f'<h2>{_text(rng, 4)}</h2><p>{_text(rng, rng.randint(40, 120))}</p>'
+            f'<h3>{_text(rng, 3)}</h3><p>{_text(rng, rng.randint(20, 80))}</p>'
+            f'<ul>{"".join(f"<li>{_text(rng, 8)}</li>" for _ in range(4))}</ul>'
+            f'<img src="/img/{i}.png" alt="illustration {i}"></div>'
+            f'<aside class="col-md-4"><p>{_text(rng, 15)}</p></aside></div></div></section>'
+        )
+        if i % 3 == 0:
+            content.append('<script>window.dataLayer=window.dataLayer||[];dataLayer.push({event:"view"});</script>')
+    return (f'<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>{_text(rng, 5)}</title>'
+            f'<meta name="description" content="{_text(rng, 20)}">'
+            f'<style>{".c{margin:0 auto;padding:1rem}" * 20}</style>'
+            f'<script src="/static/app.js"></script></head><body>'
+            f'<header><nav><ul class="navbar">{nav}</ul></nav></header><main>{"".join(content)}'
+            f'<div class="links">{" ".join(body_links)}</div></main>'
+            f'<footer><p>{_text(rng, 30)}</p></footer></body></html>')
+
+
+def load_corpus(directory: str = None, seed: int = 7) -> dict[str, list[str]]:
+    if directory:
+        pages = [open(path, encoding='utf-8', errors='ignore').read()
+                 for path in sorted(glob.glob(os.path.join(directory, '**', '*.html'), recursive=True))]
+        pages.sort(key=len)
+        third = max(1, len(pages) // 3)
+        return {'small': pages[:third], 'medium': pages[third:2 * third], 'large': pages[2 * third:]}
+    rng = random.Random(seed)
+    return {size: [generate_page(rng, sections, links) for _ in range(5)]
+            for size, (sections, links) in SIZES.items()}
+
+
+def measure(func, rounds: int) -> dict:
+    """
+    Time func over several rounds and trace the allocations of one extra call
+    """
+    func()  # warm up
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    func()
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size for stat in snapshot.statistics('filename'))
+    return {
+        'min_ms': round(min(timings) * 1000, 3),
+        'median_ms': round(statistics.median(timings) * 1000, 3),
+        'peak_alloc_kb': round(peak / 1024, 1),
+        'retained_kb': round(allocated / 1024, 1),
+    }
+
+
+def run(corpus: dict[str, list[str]], rounds: int) -> dict:
+    scraper, extractor = WebScraper(), URLExtractor()
+    filters = {'internal_only': True, 'exclude_common_files': True}
+    report = {}
+    for size, pages in corpus.items():
+        if not pages:
+            continue
+        texts = [scraper.extract_text_from_html(page) for page in pages]
+        urls = [extractor.extract_urls_from_html(page, BASE_URL) for page in pages]
+        web_data = [{'text': text, 'url': f"{BASE_URL}page-{i}"} for i, text in enumerate(texts)]
+        structured = [{'data': scraper.extract_structured_data(page), 'url': f"{BASE_URL}page-{i}"}
+                      for i, page in enumerate(pages)]
+        chunk_count = len(asyncio.run(docs_splitting(list(web_data), [])))
+        section_chunk_count = len(asyncio.run(docs_splitting(list(structured), [])))
+
+        results = {
+            'extract_text_from_html': measure(lambda: [scraper.extract_text_from_html(p) for p in pages], rounds),
+            'extract_structured_data': measure(lambda: [scraper.extract_structured_data(p) for p in pages], rounds),
+            'extract_urls_from_html': measure(lambda: [extractor.extract_urls_from_html(p, BASE_URL) for p in pages],
+                                              rounds),
+            '_apply_filters': measure(lambda: [extractor._apply_filters(u, filters) for u in urls], rounds),
+            # docs_splitting appends the external links entry to its input, so pass a fresh list
+            'docs_splitting': measure(lambda: asyncio.run(docs_splitting(list(web_data), [])), rounds),
+            'docs_splitting_sections': measure(lambda: asyncio.run(docs_splitting(list(structured), [])), rounds),
+        }
+        for name in ('extract_text_from_html', 'extract_structured_data', 'extract_urls_from_html', '_apply_filters'):
+            results[name]['pages_per_sec'] = round(len(pages) / (results[name]['median_ms'] / 1000), 1)
+        results['docs_splitting']['chunks'] = chunk_count
+        results['docs_splitting']['chunks_per_sec'] = round(chunk_count / (results['docs_splitting']['median_ms'] / 1000), 1)
+        results['docs_splitting_sections']['chunks'] = section_chunk_count
+        results['docs_splitting_sections']['chunks_per_sec'] = round(
+            section_chunk_count / (results['docs_splitting_sections']['median_ms'] / 1000), 1)
+
+        report[size] = {
+            'pages': len(pages),
+            'avg_html_kb': round(sum(len(p) for p in pages) / len(pages) / 1024, 1),
+            'avg_links': round(sum(len(u) for u in urls) / len(urls), 1),
+            'results': results,
+        }
+    return report
+
+
+def compare(previous: dict, current: dict) -> dict:
+    changes = {}
+    for size, data in current.items():
+        for name, result in data['results'].items():
+            before = previous.get(size, {}).get('results', {}).get(name, {}).get('median_ms')
+            if before:
+                changes[f"{size}.{name}"] = f"{(result['median_ms'] - before) / before * 100:+.1f}%"
+    return changes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help='directory of saved .html pages instead of the generated corpus')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--compare', help='previous JSON report, median time changes are added to the output')
+    args = parser.parse_args()
+
+    result = {'benchmarks': run(load_corpus(args.corpus, args.seed), args.rounds)}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            result['compared_to'] = {'report': args.compare,
+                                     'median_change': compare(json.load(f)['benchmarks'], result['benchmarks'])}
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
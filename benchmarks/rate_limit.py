@@ -0,0 +1,83 @@
+"""
+Overhead of the token-bucket rate limiter (utils/rate_limit.py).
+
+Times RateLimiter.check, the call every /qns-ans, /scrape and /reindex makes
+before any other work, and reports nanoseconds per check for:
+  - allowed: requests spread over --clients addresses and --tenants companies
+  - limited: one client far over its limit, answered with a Retry-After
+  - disabled: RATE_LIMIT_ENABLED=false
+
+and whether a burst against one bucket is cut off at its configured burst.
+
+    python -m benchmarks.rate_limit --checks 200000 --clients 1000 --tenants 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.rate_limit import Limit, MemoryBackend, RateLimiter
+
+
+def _reset(limits: dict = None) -> None:
+    RateLimiter.enabled = True
+    RateLimiter._backend = MemoryBackend()
+    RateLimiter._limits = {}
+    RateLimiter._usage = {}
+    if limits:
+        RateLimiter._limits['bench'] = limits
+
+
+async def time_checks(checks: int, clients: list[str], tenants: list[str]) -> dict:
+    started = time.perf_counter()
+    limited = 0
+    for i in range(checks):
+        if await RateLimiter.check('bench', tenants[i % len(tenants)], clients[i % len(clients)]):
+            limited += 1
+    seconds = time.perf_counter() - started
+    return {'checks': checks, 'ns_per_check': round(seconds / checks * 1e9), 'limited': limited}
+
+
+async def main(args) -> dict:
+    clients = [f"10.0.{i // 256}.{i % 256}" for i in range(args.clients)]
+    tenants = [f"tenant-{i}" for i in range(args.tenants)]
+    report = {}
+
+    # limits high enough that nothing is refused, the common path
+    _reset({'client': Limit(1e9, 1e9), 'tenant': Limit(1e9, 1e9)})
+    report['allowed'] = await time_checks(args.checks, clients, tenants)
+
+    # every check after the burst is refused and refunded
+    _reset({'client': Limit(1.0, 20), 'tenant': Limit(1e9, 1e9)})
+    report['limited'] = await time_checks(args.checks, clients[:1], tenants[:1])
+
+    _reset()
+    RateLimiter.enabled = False
+    report['disabled'] = await time_checks(args.checks, clients, tenants)
+
+    # a burst of requests inside a millisecond gets exactly the bucket's burst through
+    _reset({'client': Limit(0.001, 20), 'tenant': Limit(1e9, 1e9)})
+    allowed = sum([not await RateLimiter.check('bench', 'acme', '10.0.0.1') for _ in range(100)])
+    report['burst'] = {'requests': 100, 'allowed': allowed, 'expected': 20,
+                       'retry_after': round(await RateLimiter.check('bench', 'acme', '10.0.0.1'), 1)}
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--checks', type=int, default=200_000)
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--tenants', type=int, default=50)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    args = parser.parse_args()
+
+    output = json.dumps(asyncio.run(main(args)), indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
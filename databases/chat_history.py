@@ -0,0 +1,159 @@
+import asyncio
+import os
+from collections import deque
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from databases.mongoDB import MongoMotor
+from utils.logger import Logger
+
+
+load_dotenv()
+
+
+class ChatHistoryWriter:
+    """
+    Write-behind buffer for chat history.
+
+    Chat pairs are collected in memory and flushed to MongoDB with a single
+    bulk_write, one upsert per company, when CHAT_HISTORY_BATCH_SIZE pairs are
+    buffered or every CHAT_HISTORY_FLUSH_INTERVAL seconds. The per document
+    messages array is capped at CHAT_HISTORY_MAX_MESSAGES with $slice.
+
+    _store only needs an async bulk_write(collection_name, operations), so an
+    in-memory stand-in can replace MongoMotor. It returns None when nothing was
+    written, the whole batch is retried then, or a BulkWriteError when only
+    some companies failed, only those are retried.
+    """
+    collection_name = os.getenv('CHAT_HISTORY_COLLECTION', 'q_n_a')
+    batch_size = int(os.getenv('CHAT_HISTORY_BATCH_SIZE', 100))
+    flush_interval = float(os.getenv('CHAT_HISTORY_FLUSH_INTERVAL', 2))
+    max_messages = int(os.getenv('CHAT_HISTORY_MAX_MESSAGES', 500))
+    max_buffered = int(os.getenv('CHAT_HISTORY_MAX_BUFFERED', 10000))
+
+    _store = MongoMotor
+    _buffer: deque = deque()
+    _flush_event: asyncio.Event | None = None
+    _task: asyncio.Task | None = None
+    _stats = {'enqueued': 0, 'written': 0, 'flushes': 0, 'failed_flushes': 0, 'dropped': 0}
+
+    @classmethod
+    def is_running(cls) -> bool:
+        return cls._task is not None and not cls._task.done()
+
+    @classmethod
+    async def start(cls, store=None) -> None:
+        if store is not None:
+            cls._store = store
+        if cls.is_running():
+            return
+        cls._flush_event = asyncio.Event()
+        cls._task = asyncio.create_task(cls._run())
+
+    @classmethod
+    async def stop(cls) -> None:
+        """
+        Stop the background flusher and drain whatever is still buffered
+        """
+        if cls._task is not None:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
+        while cls._buffer:
+            if not await cls.flush():
+                break
+
+    @classmethod
+    def enqueue(cls, company_name: str, query: str, response: str) -> None:
+        """
+        Buffer one chat pair, never waits on the database
+        """
+        if len(cls._buffer) >= cls.max_buffered:
+            cls._buffer.popleft()
+            cls._stats['dropped'] += 1
+        cls._buffer.append((company_name, {
+            'query': query,
+            'response': response,
+            'timestamp': datetime.now(tz=timezone.utc)
+        }))
+        cls._stats['enqueued'] += 1
+        if len(cls._buffer) >= cls.batch_size and cls._flush_event is not None:
+            cls._flush_event.set()
+
+    @classmethod
+    async def _run(cls) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(cls._flush_event.wait(), timeout=cls.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            cls._flush_event.clear()
+            try:
+                while cls._buffer:
+                    if not await cls.flush() or len(cls._buffer) < cls.batch_size:
+                        break
+            except Exception as e:
+                await Logger.error_log(__name__, '_run', e)
+
+    @classmethod
+    def build_operations(cls, pairs: list[tuple]) -> list:
+        now = datetime.now(tz=timezone.utc)
+        by_company = {}
+        for company_name, chat_pair in pairs:
+            by_company.setdefault(company_name, []).append(chat_pair)
+
+        return [
+            UpdateOne(
+                {'company': company_name},
+                {
+                    '$setOnInsert': {'company': company_name, 'created_at': now},
+                    '$set': {'last_active': now, 'updated_at': now},
+                    '$push': {'messages': {'$each': messages, '$slice': -cls.max_messages}}
+                },
+                upsert=True
+            )
+            for company_name, messages in by_company.items()
+        ]
+
+    @classmethod
+    async def flush(cls) -> bool:
+        """
+        Write up to batch_size buffered pairs, returns False if the write failed
+        """
+        if not cls._buffer:
+            return True
+        pairs = [cls._buffer.popleft() for _ in range(min(cls.batch_size, len(cls._buffer)))]
+        result = await cls._store.bulk_write(cls.collection_name, cls.build_operations(pairs))
+        if isinstance(result, BulkWriteError):
+            # unordered and one operation per company: the companies without a write error are
+            # stored, retrying them would push their messages twice
+            companies = list(dict.fromkeys(company_name for company_name, _ in pairs))
+            failed = {companies[error['index']] for error in result.details.get('writeErrors', [])}
+            written = [pair for pair in pairs if pair[0] not in failed]
+            cls._stats['written'] += len(written)
+            pairs = [pair for pair in pairs if pair[0] in failed]
+            if not pairs:
+                cls._stats['flushes'] += 1
+                return True
+            result = None
+        if result is None:
+            # put the failed pairs back in front so they are retried on the next flush
+            cls._buffer.extendleft(reversed(pairs))
+            while len(cls._buffer) > cls.max_buffered:
+                cls._buffer.pop()
+                cls._stats['dropped'] += 1
+            cls._stats['failed_flushes'] += 1
+            return False
+        cls._stats['flushes'] += 1
+        cls._stats['written'] += len(pairs)
+        return True
+
+    @classmethod
+    def stats(cls) -> dict:
+        return {**cls._stats, 'buffered': len(cls._buffer), 'running': cls.is_running()}
@@ -1,22 +1,100 @@
+import asyncio
 import os
-from chromadb import AsyncHttpClient
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
 from dotenv import load_dotenv
 
+from databases.compact_vectors import CompactVectors
 from utils.logger import Logger
 
 load_dotenv()
 
+# collections created before the model was recorded in their metadata use this one
+LEGACY_EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
+# model of new collections and of query embeddings, see databases/collection_versions.py to migrate
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", LEGACY_EMBEDDING_MODEL)
+
+# mpnet embeddings are trained for cosine similarity
+DISTANCE_SPACE = os.getenv("CHROMA_SPACE", "cosine")
+# chunks less similar than this to the query are dropped, the same cut for every space
+RETRIEVE_MIN_SIMILARITY = float(os.getenv("RETRIEVE_MIN_SIMILARITY", 0.25))
+
+# (max collection size, M, ef_construction, ef_search): larger collections need a
+# denser graph and a wider search to keep recall, small ones stay cheap
+HNSW_TIERS = [
+    (10_000, 16, 100, 64),
+    (100_000, 32, 200, 128),
+    (None, 48, 400, 256),
+]
+
+
+def hnsw_configuration(size: int = 0, space: str = None) -> dict:
+    """
+    HNSW settings for a collection of about size records. HNSW_M,
+    HNSW_EF_CONSTRUCTION and HNSW_EF_SEARCH override the tier values.
+    """
+    for limit, max_neighbors, ef_construction, ef_search in HNSW_TIERS:
+        if limit is None or size <= limit:
+            break
+    return {
+        'space': space or DISTANCE_SPACE,
+        'max_neighbors': int(os.getenv("HNSW_M", max_neighbors)),
+        'ef_construction': int(os.getenv("HNSW_EF_CONSTRUCTION", ef_construction)),
+        'ef_search': int(os.getenv("HNSW_EF_SEARCH", ef_search)),
+    }
+
+
+def collection_space(collection) -> str:
+    hnsw = (collection.configuration_json or {}).get('hnsw') or {}
+    # collections created before the space was configured carry it in the metadata, or use chroma's l2 default
+    return hnsw.get('space') or (collection.metadata or {}).get('hnsw:space') or 'l2'
+
+
+def collection_model(collection) -> str:
+    return (collection.metadata or {}).get('embedding_model') or LEGACY_EMBEDDING_MODEL
+
+
+def max_distance(space: str, min_similarity: float) -> float:
+    """
+    Distance matching a cosine similarity in the given space. The embeddings are
+    unit length, so chroma's squared l2 distance is 2 - 2 * cosine and the ip
+    distance is 1 - cosine like the cosine distance.
+    """
+    if space == 'l2':
+        return 2 - 2 * min_similarity
+    return 1 - min_similarity
+
+
 class ChromaDB:
     _client = None
-    _embedding_function = SentenceTransformerEmbeddingFunction(
-        model_name="sentence-transformers/all-mpnet-base-v2"
-    )
+    # model name -> embedding function
+    _embedding_functions = {}
+
+    @classmethod
+    def get_embedding_function(cls, model_name: str = None):
+        """
+        Embedding function of a model (EMBEDDING_MODEL by default), created on
+        first use. With EMBEDDING_SERVICE_SOCKET set, EMBEDDING_MODEL embeddings
+        come from the shared embedding service instead of a model loaded in this
+        process. Other models (collections that are being migrated) always load
+        in process.
+        """
+        model_name = model_name or EMBEDDING_MODEL
+        if model_name not in cls._embedding_functions:
+            socket_path = os.getenv("EMBEDDING_SERVICE_SOCKET")
+            if socket_path and model_name == EMBEDDING_MODEL:
+                from utils.embedding_service import RemoteEmbeddingFunction
+                cls._embedding_functions[model_name] = RemoteEmbeddingFunction(socket_path, model_name=model_name)
+            else:
+                # pulls in sentence-transformers and torch, so only on first use
+                from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+                cls._embedding_functions[model_name] = SentenceTransformerEmbeddingFunction(model_name=model_name)
+        return cls._embedding_functions[model_name]
 
     @classmethod
     async def connect(cls):
         if cls._client is None:
-            cls._client = await AsyncHttpClient(host=os.getenv("CHROMA_URI"))
+            from chromadb import AsyncHttpClient
+
+            cls._client = await AsyncHttpClient(host=os.getenv("CHROMA_URI"), port=int(os.getenv("CHROMA_PORT", 8000)))
             await Logger.info_log('Connection established')
 
     @classmethod
@@ -27,31 +105,107 @@ class ChromaDB:
         return None
 
     @classmethod
-    async def create_collection(cls, collection_name: str):
-
+    async def create_collection(cls, collection_name: str, metadata: dict = None, expected_size: int = 0,
+                                hnsw: dict = None):
+        """
+        Get or create a collection. A new collection gets the HNSW settings of
+        its expected size (or the given hnsw settings), an existing one keeps
+        the settings it was built with. The embedding model is recorded in the
+        metadata ('embedding_model', EMBEDDING_MODEL unless given).
+        """
+        metadata = {'embedding_model': EMBEDDING_MODEL, **(metadata or {})}
         collection = await cls._client.get_or_create_collection(
             name=collection_name,
-            embedding_function=cls._embedding_function
+            metadata=metadata,
+            configuration={'hnsw': hnsw or hnsw_configuration(expected_size)},
+            embedding_function=cls.get_embedding_function(metadata['embedding_model'])
         )
         await Logger.info_log(f"created collection - {collection_name}")
         return collection
 
+    @classmethod
+    async def embed_texts(cls, texts: list[str], model_name: str = None) -> list:
+        """
+        Embed texts with the embedding function of a model off the event loop
+        """
+        return await asyncio.to_thread(cls.get_embedding_function(model_name), texts)
+
     @staticmethod
-    async def add_documents(collection_name: str, documents: list[str], ids: list[str], metadatas: list[dict] = None):
+    async def add_documents(collection_name: str, documents: list[str], ids: list[str], metadatas: list[dict] = None,
+                            embeddings: list = None):
         collection = await ChromaDB._client.get_collection(name=collection_name)
+        if embeddings is None:
+            # embed here rather than letting chroma rebuild the embedding function from the collection config
+            embeddings = await ChromaDB.embed_texts(documents, collection_model(collection))
+        if CompactVectors.is_compact(collection):
+            embeddings = CompactVectors.compact(collection, ids, embeddings)
         await collection.add(
             documents=documents,
             ids=ids,
-            metadatas=metadatas
+            metadatas=metadatas,
+            embeddings=embeddings
         )
 
     @staticmethod
-    async def query_docs(collection_name: str, query_texts: list[str], n_results: int = 5,threshold_score:float=1.3) -> list:
+    async def upsert_documents(collection_name: str, documents: list[str], ids: list[str], metadatas: list[dict] = None,
+                               embeddings: list = None):
         collection = await ChromaDB._client.get_collection(name=collection_name)
+        if embeddings is None:
+            embeddings = await ChromaDB.embed_texts(documents, collection_model(collection))
+        if CompactVectors.is_compact(collection):
+            embeddings = CompactVectors.compact(collection, ids, embeddings)
+        await collection.upsert(
+            documents=documents,
+            ids=ids,
+            metadatas=metadatas,
+            embeddings=embeddings
+        )
+
+    @classmethod
+    async def tune_collection(cls, collection_name: str) -> int:
+        """
+        Widen or narrow ef_search to the tier of the current collection size.
+        The setting is persisted right away but an index Chroma already has
+        loaded keeps its old ef_search until it is loaded again. M and
+        ef_construction are fixed once the index is built.
+        """
+        collection = await cls._client.get_collection(name=collection_name)
+        ef_search = hnsw_configuration(await collection.count())['ef_search']
+        current = ((collection.configuration_json or {}).get('hnsw') or {}).get('ef_search')
+        if current != ef_search:
+            await collection.modify(configuration={'hnsw': {'ef_search': ef_search}})
+        return ef_search
+
+    @staticmethod
+    async def query_docs(collection_name: str, query_texts: list[str] = None, n_results: int = 5,
+                         threshold_score: float = None, query_embeddings: list = None,
+                         min_similarity: float = None, where: dict = None) -> list:
+        """
+        Chunks closer to the query than min_similarity (cosine, RETRIEVE_MIN_SIMILARITY
+        by default), whatever the distance space of the collection. threshold_score
+        still takes a raw distance instead.
+        """
+        collection = await ChromaDB._client.get_collection(name=collection_name)
+        min_similarity = RETRIEVE_MIN_SIMILARITY if min_similarity is None else min_similarity
+        if threshold_score is None:
+            threshold_score = max_distance(collection_space(collection), min_similarity)
+        # reuse an already computed query embedding instead of embedding the text again
+        if query_embeddings is None:
+            query_embeddings = await ChromaDB.embed_texts(query_texts, collection_model(collection))
+        if CompactVectors.is_compact(collection):
+            # search the reduced vectors wider, then rank the candidates on the full ones
+            results = await collection.query(
+                query_embeddings=CompactVectors.project_query(collection, query_embeddings),
+                n_results=n_results * CompactVectors.rescore_factor,
+                where=where,
+            )
+            if not results.get('ids')[0]:
+                return []
+            return CompactVectors.rescore(collection_name, query_embeddings[0], results, n_results, min_similarity)
         results = await collection.query(
-            query_texts=query_texts,
+            query_embeddings=query_embeddings,
             n_results=n_results,
-
+            where=where,
         )
         chunks = []
         if results.get('ids')[0]:
@@ -71,14 +225,22 @@ class ChromaDB:
         collection = await ChromaDB._client.get_collection(name=collection_name)
         return await collection.get(where= where_condition)
 
+    @staticmethod
+    async def get_collection(collection_name: str):
+        return await ChromaDB._client.get_collection(name=collection_name)
+
     @staticmethod
     async def delete_documents(collection_name: str, ids: list[str]):
         collection = await ChromaDB._client.get_collection(name=collection_name)
         await collection.delete(ids=ids)
+        if CompactVectors.is_compact(collection):
+            CompactVectors.remove(collection_name, ids)
 
     @staticmethod
-    async def delete_collection(collection_name: str):
+    async def delete_collection(collection_name: str, keep_side_store: bool = False):
         await ChromaDB._client.delete_collection(name=collection_name)
+        if not keep_side_store:
+            CompactVectors.drop(collection_name)
         await Logger.info_log(f"Collection {collection_name} deleted successfully")
 
     @staticmethod
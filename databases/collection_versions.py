@@ -0,0 +1,290 @@
+import asyncio
+import os
+import re
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+from databases.chromaDB import ChromaDB, EMBEDDING_MODEL, collection_model
+from databases.compact_vectors import CompactVectors
+from databases.page_index import PageIndex
+from databases.snapshots import CollectionSnapshots
+from utils.answer_cache import AnswerCache
+from utils.logger import Logger
+
+
+load_dotenv()
+
+VERSION_PATTERN = re.compile(r'^(.+)__v(\d+)$')
+
+
+class CollectionVersions:
+    """
+    Blue/green versions of the tenant collections. A company name is an alias
+    of its active collection '<company>__v<N>'; a reindex builds the next
+    version next to it while queries keep using the active one, then switches
+    the alias in a single upsert.
+
+    Aliases are records of the 'collection-aliases' collection (id = company
+    name, metadata = collection, version, embedding model), so every worker
+    sees a switch within ALIAS_CACHE_SECONDS. Collections from before
+    versioning have no alias and are used under their own name.
+    """
+    registry_name = 'collection-aliases'
+    cache_ttl = float(os.getenv('ALIAS_CACHE_SECONDS', 5))
+    # versions kept after a switch for a rollback, older ones are dropped
+    keep_previous = int(os.getenv('REINDEX_KEEP_PREVIOUS', 1))
+    # chunks embedded per second by a reindex, leaves the model to live queries (0: no limit)
+    embed_rate = float(os.getenv('REINDEX_EMBED_RATE', 50))
+    batch_size = int(os.getenv('REINDEX_BATCH_SIZE', 32))
+
+    _registry = None
+    # alias -> (alias record or None, checked at)
+    _aliases: dict[str, tuple[dict | None, float]] = {}
+    _tasks: dict[str, asyncio.Task] = {}
+    _progress: dict[str, dict] = {}
+
+    @staticmethod
+    def versioned_name(alias: str, version: int) -> str:
+        return f"{alias}__v{version}"
+
+    @staticmethod
+    def parse(collection_name: str) -> tuple[str, int] | None:
+        match = VERSION_PATTERN.match(collection_name)
+        return (match.group(1), int(match.group(2))) if match else None
+
+    @classmethod
+    async def registry(cls):
+        if cls._registry is None:
+            # the records only carry metadata, the one dimensional vector is a placeholder
+            cls._registry = await ChromaDB._client.get_or_create_collection(
+                name=cls.registry_name, metadata={'registry': 'aliases'}, embedding_function=None)
+        return cls._registry
+
+    @classmethod
+    async def get_alias(cls, alias: str) -> dict | None:
+        cached = cls._aliases.get(alias)
+        if cached is None or time.monotonic() - cached[1] > cls.cache_ttl:
+            stored = await (await cls.registry()).get(ids=[alias], include=['metadatas'])
+            cached = (stored['metadatas'][0] if stored['ids'] else None, time.monotonic())
+            cls._aliases[alias] = cached
+        return cached[0]
+
+    @classmethod
+    async def resolve(cls, alias: str) -> str:
+        """
+        Collection currently serving a company name
+        """
+        record = await cls.get_alias(alias)
+        return record['collection'] if record else alias
+
+    @classmethod
+    async def switch(cls, alias: str, collection_name: str) -> dict:
+        collection = await ChromaDB.get_collection(collection_name)
+        record = {'collection': collection_name, 'version': (cls.parse(collection_name) or (alias, 0))[1],
+                  'embedding_model': collection_model(collection), 'switched_at': time.time()}
+        await (await cls.registry()).upsert(ids=[alias], embeddings=[[1.0]], documents=[collection_name],
+                                            metadatas=[record])
+        cls._aliases[alias] = (record, time.monotonic())
+        # answers cached from the old version may differ from the new one
+        AnswerCache.invalidate(alias)
+        await Logger.info_log('collection alias switched', alias=alias, collection=collection_name)
+        return record
+
+    @classmethod
+    async def versions(cls, alias: str) -> list[str]:
+        """
+        Collections of an alias, oldest first. A pre-versioning collection
+        under the alias name counts as version 0.
+        """
+        found = []
+        for collection in await ChromaDB.list_collections():
+            parsed = cls.parse(collection.name)
+            if collection.name == alias:
+                found.append((0, collection.name))
+            elif parsed and parsed[0] == alias:
+                found.append((parsed[1], collection.name))
+        return [name for _, name in sorted(found)]
+
+    @classmethod
+    async def collection_for_writes(cls, alias: str, expected_size: int = 0, metadata: dict = None) -> str:
+        """
+        Collection new chunks of a company go to: the active version, or a new
+        v1 for a company without any collection yet
+        """
+        active = await cls.resolve(alias)
+        if active != alias or alias in await cls.versions(alias):
+            return active
+        collection_name = cls.versioned_name(alias, 1)
+        await ChromaDB.create_collection(collection_name, expected_size=expected_size, metadata=metadata)
+        await cls.switch(alias, collection_name)
+        return collection_name
+
+    @classmethod
+    async def query_chunks(cls, alias: str, query_text: str, query_embedding: list, n_results: int) -> list:
+        """
+        Two-stage retrieval on the active version. The query embedding is made
+        with EMBEDDING_MODEL, a version built with another model gets the
+        query embedded again with its own.
+        """
+        record = await cls.get_alias(alias)
+        collection_name = record['collection'] if record else alias
+        model_name = record.get('embedding_model') if record else None
+        if record is None:
+            model_name = collection_model(await ChromaDB.get_collection(alias))
+        if model_name != EMBEDDING_MODEL:
+            query_embedding = (await ChromaDB.embed_texts([query_text], model_name))[0]
+        return await PageIndex.query_chunks(collection_name, [query_embedding], n_results=n_results)
+
+    @classmethod
+    async def _stored_chunks(cls, collection_name: str) -> tuple[list, list, list]:
+        collection = await ChromaDB.get_collection(collection_name)
+        ids, documents, metadatas = [], [], []
+        count = await collection.count()
+        for offset in range(0, count, 1000):
+            page = await collection.get(limit=1000, offset=offset, include=['documents', 'metadatas'])
+            ids.extend(page['ids'])
+            documents.extend(page['documents'])
+            metadatas.extend(page['metadatas'])
+        return ids, documents, metadatas
+
+    @classmethod
+    async def _archived_chunks(cls, alias: str, workers: int = 1) -> tuple[list, list, list, list]:
+        from knowledge_base.crawl_archive import CrawlArchives
+        from knowledge_base.scrapper import replay_archive
+        from utils.utility import chunk_ids, docs_splitting
+
+        path = CrawlArchives.latest(alias)
+        if path is None:
+            raise FileNotFoundError(f"no crawl archive for {alias}")
+        crawl = await asyncio.to_thread(replay_archive, path, True, workers)
+        pages = list(crawl['pages'])
+        chunks = await docs_splitting(crawl['pages'], crawl['external_urls'])
+        documents, metadatas = [chunk.page_content for chunk in chunks], [chunk.metadata for chunk in chunks]
+        # ids of the ingesters, so their upserts and deletes still hit the reindexed chunks
+        return chunk_ids(documents, metadatas), documents, metadatas, pages
+
+    @classmethod
+    async def reindex(cls, alias: str, source: str = 'stored', model_name: str = None, workers: int = 1) -> dict:
+        """
+        Build the next version of an alias and switch to it once complete.
+
+        source 'stored' embeds the chunks of the active version again (a model
+        change), 'archive' parses (in workers processes), splits and embeds the
+        latest crawl archive (a parsing or chunking change). Embedding runs in
+        REINDEX_BATCH_SIZE batches at no more than REINDEX_EMBED_RATE chunks
+        per second.
+        """
+        started = time.perf_counter()
+        model_name = model_name or EMBEDDING_MODEL
+        active = await cls.resolve(alias)
+        pages = None
+        if source == 'archive':
+            ids, documents, metadatas, pages = await cls._archived_chunks(alias, workers)
+        else:
+            # the chunk ids stay the same, so id based writers (add_all_documents.py) keep working
+            ids, documents, metadatas = await cls._stored_chunks(active)
+        if not documents:
+            raise ValueError(f"nothing to reindex for {alias}")
+
+        versions = await cls.versions(alias)
+        version = max([(cls.parse(name) or (alias, 0))[1] for name in versions] or [0]) + 1
+        target = cls.versioned_name(alias, version)
+        progress = cls._progress[alias] = {'alias': alias, 'target': target, 'source': source,
+                                           'embedding_model': model_name, 'total': len(documents), 'done': 0,
+                                           'state': 'building'}
+        compact = CompactVectors.collection_metadata(len(documents))
+        # a compact target needs its projection before the first add, fitted on a whole sample and not one batch
+        fit_size = min(len(documents), CompactVectors.fit_samples) if compact else 0
+        try:
+            await ChromaDB.create_collection(target, expected_size=len(documents),
+                                             metadata={'embedding_model': model_name, **(compact or {})})
+            held = []
+            for start in range(0, len(documents), cls.batch_size):
+                batch_started = time.perf_counter()
+                batch = documents[start:start + cls.batch_size]
+                embeddings = await ChromaDB.embed_texts(batch, model_name)
+                held.append((start, np.asarray(embeddings, dtype=np.float32) if compact else embeddings))
+                if start + len(batch) >= fit_size:
+                    if compact and not CompactVectors.store(target).fitted:
+                        CompactVectors.fit(target, np.concatenate([vectors for _, vectors in held]),
+                                           compact['compact_dim'])
+                    for held_start, vectors in held:
+                        end = held_start + cls.batch_size
+                        await ChromaDB.add_documents(collection_name=target, documents=documents[held_start:end],
+                                                     ids=ids[held_start:end], metadatas=metadatas[held_start:end],
+                                                     embeddings=vectors)
+                    held = []
+                progress['done'] += len(batch)
+                if cls.embed_rate > 0:
+                    # pace the batches instead of queueing every chunk in front of the live query embeddings
+                    await asyncio.sleep(max(0.0, len(batch) / cls.embed_rate - (time.perf_counter() - batch_started)))
+            await ChromaDB.tune_collection(target)
+            if pages is not None:
+                await PageIndex.build(target, pages)
+            else:
+                await PageIndex.copy(active, target)
+        except BaseException:
+            # the active version was never touched, only the half built one goes
+            await cls.drop(target)
+            raise
+
+        await cls.switch(alias, target)
+        progress['state'] = 'switched'
+        await Logger.info_log('collection reindexed', alias=alias, collection=target, chunks=len(documents),
+                              seconds=round(time.perf_counter() - started, 2))
+        # other workers may still use the old version until their alias cache expires
+        await asyncio.sleep(cls.cache_ttl)
+        for name in (versions + [target])[:-(cls.keep_previous + 1)]:
+            await cls.drop(name)
+        progress['state'] = 'done'
+        return progress
+
+    @classmethod
+    async def drop(cls, collection_name: str) -> None:
+        """
+        Delete an inactive version with its page index and snapshot
+        """
+        existing = {collection.name for collection in await ChromaDB.list_collections()}
+        for name in (collection_name, PageIndex.name(collection_name)):
+            if name in existing:
+                await ChromaDB.delete_collection(name)
+            CollectionSnapshots.delete(name)
+
+    @classmethod
+    def start_reindex(cls, alias: str, source: str = 'stored', model_name: str = None) -> dict:
+        """
+        Run a reindex in the background, one per alias at a time
+        """
+        if not cls.is_reindexing(alias):
+            cls._progress[alias] = {'alias': alias, 'source': source, 'state': 'starting'}
+            cls._tasks[alias] = asyncio.create_task(cls._run(alias, source, model_name))
+        return cls._progress[alias]
+
+    @classmethod
+    async def _run(cls, alias: str, source: str, model_name: str) -> None:
+        from databases.tenants import TenantRegistry
+
+        try:
+            # the lease keeps every worker from evicting the tenant while it is rebuilt
+            async with TenantRegistry.use(alias):
+                await cls.reindex(alias, source, model_name)
+        except Exception as e:
+            cls._progress[alias] = {**cls._progress.get(alias, {}), 'state': 'failed', 'error': str(e)}
+            await Logger.error_log(__name__, 'reindex', e)
+
+    @classmethod
+    def is_reindexing(cls, alias: str) -> bool:
+        task = cls._tasks.get(alias)
+        return task is not None and not task.done()
+
+    @classmethod
+    async def wait_for_reindex(cls, alias: str) -> None:
+        # chunks written to the old version during a reindex would be lost at the switch
+        if cls.is_reindexing(alias):
+            await asyncio.shield(cls._tasks[alias])
+
+    @classmethod
+    def status(cls, alias: str) -> dict | None:
+        return cls._progress.get(alias)
@@ -0,0 +1,215 @@
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+
+class SideStore:
+    """
+    Full-precision vectors of one compact collection, plus its PCA projection.
+
+    Files in COMPACT_DIR/<collection>/:
+      - pca.npz: mean and components (dim x original dim) of the projection
+      - vectors.bin: append-only matrix of the original vectors, memory-mapped
+      - ids.json: chunk id -> row of vectors.bin
+
+    Upserts append a new row and repoint the id, deletes only drop the id, so
+    rows are never rewritten while the collection is live.
+    """
+    def __init__(self, path: str, dtype: str = 'float32'):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.mean = None
+        self.components = None
+        self.rows: dict[str, int] = {}
+        self.width = None
+        self._matrix = None
+        self._lock = threading.Lock()
+        if os.path.exists(os.path.join(path, 'pca.npz')):
+            with np.load(os.path.join(path, 'pca.npz')) as pca:
+                self.mean, self.components = pca['mean'], pca['components']
+                self.dtype = np.dtype(str(pca['dtype']))
+            self.width = self.components.shape[1]
+            with open(os.path.join(path, 'ids.json'), encoding='utf-8') as f:
+                self.rows = json.load(f)
+
+    @property
+    def fitted(self) -> bool:
+        return self.components is not None
+
+    def fit(self, vectors: np.ndarray, dimension: int, max_samples: int = 20000) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        # the svd of n vectors has at most n components, fewer would silently shrink the collection's dimension
+        if len(vectors) < dimension:
+            raise ValueError(f"{len(vectors)} vectors can not fit a {dimension} dimensional projection")
+        if len(vectors) > max_samples:
+            vectors = vectors[np.random.default_rng(0).choice(len(vectors), max_samples, replace=False)]
+        self.mean = vectors.mean(axis=0)
+        # rows of vt are the principal directions, strongest first
+        _, _, vt = np.linalg.svd(vectors - self.mean, full_matrices=False)
+        self.components = vt[:dimension].astype(np.float32)
+        self.width = vectors.shape[1]
+        os.makedirs(self.path, exist_ok=True)
+        np.savez(os.path.join(self.path, 'pca.npz'), mean=self.mean, components=self.components,
+                 dtype=np.array(self.dtype.name))
+
+    def project(self, vectors) -> np.ndarray:
+        return (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components.T
+
+    def matrix(self) -> np.ndarray:
+        count = (os.path.getsize(os.path.join(self.path, 'vectors.bin')) // (self.width * self.dtype.itemsize)
+                 if os.path.exists(os.path.join(self.path, 'vectors.bin')) else 0)
+        if self._matrix is None or len(self._matrix) != count:
+            self._matrix = (np.memmap(os.path.join(self.path, 'vectors.bin'), dtype=self.dtype, mode='r',
+                                      shape=(count, self.width)) if count else np.empty((0, self.width), self.dtype))
+        return self._matrix
+
+    def _save_ids(self) -> None:
+        temporary = os.path.join(self.path, 'ids.json.tmp')
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(self.rows, f)
+        os.replace(temporary, os.path.join(self.path, 'ids.json'))
+
+    def append(self, ids: list[str], vectors) -> None:
+        vectors = np.asarray(vectors, dtype=self.dtype)
+        with self._lock:
+            start = len(self.matrix())
+            with open(os.path.join(self.path, 'vectors.bin'), 'ab') as f:
+                f.write(np.ascontiguousarray(vectors).tobytes())
+            for offset, id_ in enumerate(ids):
+                self.rows[id_] = start + offset
+            self._save_ids()
+
+    def remove(self, ids: list[str]) -> None:
+        with self._lock:
+            for id_ in ids:
+                self.rows.pop(id_, None)
+            self._save_ids()
+
+    def similarities(self, query, ids: list[str]) -> list:
+        """
+        Exact cosine similarity of the query to each id, None for ids without a
+        stored vector
+        """
+        rows = [self.rows.get(id_) for id_ in ids]
+        known = [row for row in rows if row is not None]
+        if not known:
+            return [None] * len(ids)
+        vectors = np.asarray(self.matrix()[known], dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32)
+        scores = iter(vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query) + 1e-12))
+        return [None if row is None else float(next(scores)) for row in rows]
+
+
+class CompactVectors:
+    """
+    Optional compact storage for large collections: Chroma keeps
+    PCA-reduced vectors (COMPACT_DIM, 128 by default instead of 768) and the
+    original vectors go to a memory-mapped side store. Queries search the
+    reduced vectors for COMPACT_RESCORE_FACTOR times the wanted results and
+    re-score those candidates exactly from the side store.
+
+    Only collections created with at least COMPACT_MIN_CHUNKS chunks are
+    compacted. The projection is fitted on their first batch, which has to
+    hold at least COMPACT_DIM vectors; a writer adding in small batches fits
+    it up front with fit() on up to COMPACT_FIT_SAMPLES vectors. Compact
+    collections carry 'compact_dim' in their metadata.
+    """
+    enabled = _env_flag('COMPACT_VECTORS', 'false')
+    dimension = int(os.getenv('COMPACT_DIM', 128))
+    min_chunks = int(os.getenv('COMPACT_MIN_CHUNKS', 1000))
+    rescore_factor = int(os.getenv('COMPACT_RESCORE_FACTOR', 4))
+    fit_samples = int(os.getenv('COMPACT_FIT_SAMPLES', 10000))
+    # space of new collections (CHROMA_SPACE); projected vectors are not unit length, so only a
+    # cosine distance still converts to a similarity
+    space = os.getenv('CHROMA_SPACE', 'cosine')
+    directory = os.getenv('COMPACT_DIR', 'vector_store')
+    # float16 halves the side store, the re-scoring error stays far below the ranking gaps
+    side_dtype = os.getenv('COMPACT_SIDE_DTYPE', 'float32')
+
+    _stores: dict[str, SideStore] = {}
+
+    @staticmethod
+    def is_compact(collection) -> bool:
+        return bool((collection.metadata or {}).get('compact_dim'))
+
+    @classmethod
+    def collection_metadata(cls, expected_size: int) -> dict | None:
+        """
+        Metadata that marks a new collection as compact, None when it should
+        keep full vectors. Collections outside the cosine space are never
+        compacted, rescore can only read their reduced-space distances as
+        similarities in cosine.
+        """
+        if cls.enabled and cls.space == 'cosine' and expected_size >= max(cls.min_chunks, cls.dimension):
+            return {'compact_dim': cls.dimension}
+        return None
+
+    @classmethod
+    def store(cls, collection_name: str) -> SideStore:
+        if collection_name not in cls._stores:
+            cls._stores[collection_name] = SideStore(os.path.join(cls.directory, collection_name), cls.side_dtype)
+        return cls._stores[collection_name]
+
+    @classmethod
+    def compact(cls, collection, ids: list[str], embeddings) -> list:
+        """
+        Keep the full vectors in the side store and return the reduced ones
+        for Chroma
+        """
+        store = cls.store(collection.name)
+        if not store.fitted:
+            store.fit(embeddings, int(collection.metadata['compact_dim']), cls.fit_samples)
+        store.append(ids, embeddings)
+        return store.project(embeddings)
+
+    @classmethod
+    def fit(cls, collection_name: str, embeddings, dimension: int = None) -> None:
+        """
+        Fit the projection of a new compact collection before its first add
+        """
+        cls.store(collection_name).fit(embeddings, dimension or cls.dimension, cls.fit_samples)
+
+    @classmethod
+    def project_query(cls, collection, query_embeddings) -> np.ndarray:
+        return cls.store(collection.name).project(query_embeddings)
+
+    @classmethod
+    def rescore(cls, collection_name: str, query_embedding, results: dict, n_results: int,
+                min_similarity: float) -> list[dict]:
+        """
+        Re-rank the reduced-space candidates by exact cosine similarity.
+        Candidates missing from the side store keep their reduced-space score,
+        the cosine similarity 1 - distance (compact collections are cosine).
+        """
+        ids = results['ids'][0]
+        exact = cls.store(collection_name).similarities(query_embedding, ids)
+        scored = []
+        for i, similarity in enumerate(exact):
+            if similarity is None:
+                similarity = 1 - results['distances'][0][i]
+            if similarity >= min_similarity:
+                scored.append((similarity, i))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [{'context': results['documents'][0][i], 'metadata': results['metadatas'][0][i]}
+                for _, i in scored[:n_results]]
+
+    @classmethod
+    def remove(cls, collection_name: str, ids: list[str]) -> None:
+        if os.path.isdir(os.path.join(cls.directory, collection_name)):
+            cls.store(collection_name).remove(ids)
+
+    @classmethod
+    def drop(cls, collection_name: str) -> None:
+        cls._stores.pop(collection_name, None)
+        shutil.rmtree(os.path.join(cls.directory, collection_name), ignore_errors=True)
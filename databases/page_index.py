@@ -0,0 +1,128 @@
+import hashlib
+import os
+import time
+
+from dotenv import load_dotenv
+
+from databases.chromaDB import ChromaDB, collection_model
+from utils.logger import Logger
+
+
+load_dotenv()
+
+
+class PageIndex:
+    """
+    Page-level index next to a chunk collection: one vector per URL, embedded
+    from the page title, meta description and headings. Retrieval first picks
+    the RETRIEVE_N_PAGES closest pages and then searches only their chunks, so
+    large sites are not crowded by chunks of unrelated pages.
+
+    Only sites with at least PAGE_INDEX_MIN_PAGES pages get one. The chunk
+    collection points to its page index through the 'page_index' metadata key.
+    """
+    min_pages = int(os.getenv('PAGE_INDEX_MIN_PAGES', 20))
+    n_pages = int(os.getenv('RETRIEVE_N_PAGES', 5))
+    max_headings = 30
+    # collection name -> (page index name or None, checked at), saves a lookup per query
+    _links: dict[str, tuple[str | None, float]] = {}
+    link_ttl = 60
+
+    @staticmethod
+    def name(collection_name: str) -> str:
+        return f"{collection_name}__pages"
+
+    @classmethod
+    def summary(cls, page: dict) -> str:
+        data = page.get('data') or {}
+        headings = []
+        for heading in data.get('headings') or []:
+            text = heading.get('text', '').strip()
+            if text and text not in headings:
+                headings.append(text)
+        parts = [data.get('title', '').strip(), data.get('meta_description', '').strip(),
+                 '; '.join(headings[:cls.max_headings])]
+        return '\n'.join(part for part in parts if part)
+
+    @classmethod
+    async def build(cls, collection_name: str, pages: list[dict]) -> int:
+        """
+        Upsert one summary vector per scraped page and link the index to the
+        chunk collection. Returns the number of indexed pages.
+        """
+        pages = [page for page in pages if page.get('data') and page.get('url') and cls.summary(page)]
+        if len(pages) < cls.min_pages:
+            return 0
+        return await cls._write(collection_name, [page['url'] for page in pages],
+                                [page['data'].get('title') or '' for page in pages],
+                                [cls.summary(page) for page in pages])
+
+    @classmethod
+    async def copy(cls, source_name: str, collection_name: str) -> int:
+        """
+        Page index for a rebuilt copy of a collection, from the page summaries
+        of the source collection (embedded again with the model of the copy)
+        """
+        source_index = await cls.linked_index(source_name)
+        if not source_index:
+            return 0
+        stored = await (await ChromaDB.get_collection(source_index)).get(include=['documents', 'metadatas'])
+        return await cls._write(collection_name, [metadata['url'] for metadata in stored['metadatas']],
+                                [metadata.get('title') or '' for metadata in stored['metadatas']],
+                                stored['documents'])
+
+    @classmethod
+    async def _write(cls, collection_name: str, urls: list[str], titles: list[str], summaries: list[str]) -> int:
+        collection = await ChromaDB.get_collection(collection_name)
+        index_name = cls.name(collection_name)
+        # the query embedding is made for the chunk collection, so the index has to share its model
+        await ChromaDB.create_collection(index_name, metadata={'embedding_model': collection_model(collection)},
+                                         expected_size=len(urls))
+        await ChromaDB.upsert_documents(
+            collection_name=index_name,
+            documents=summaries,
+            ids=[hashlib.md5(url.encode('utf-8')).hexdigest() for url in urls],
+            metadatas=[{'url': url, 'title': title} for url, title in zip(urls, titles)]
+        )
+
+        if (collection.metadata or {}).get('page_index') != index_name:
+            # hnsw:* keys can not be modified, everything else has to be sent again
+            metadata = {key: value for key, value in (collection.metadata or {}).items() if not key.startswith('hnsw:')}
+            await collection.modify(metadata={**metadata, 'page_index': index_name})
+        cls._links[collection_name] = (index_name, time.monotonic())
+        await Logger.info_log('page index built', collection=collection_name, pages=len(urls))
+        return len(urls)
+
+    @classmethod
+    async def top_urls(cls, index_name: str, query_embeddings: list, n_pages: int = None) -> list[str]:
+        index = await ChromaDB.get_collection(index_name)
+        results = await index.query(query_embeddings=query_embeddings, n_results=n_pages or cls.n_pages,
+                                    include=['metadatas'])
+        return [metadata['url'] for metadata in results['metadatas'][0] if metadata and metadata.get('url')]
+
+    @classmethod
+    async def linked_index(cls, collection_name: str) -> str | None:
+        link = cls._links.get(collection_name)
+        if link is None or time.monotonic() - link[1] > cls.link_ttl:
+            collection = await ChromaDB.get_collection(collection_name)
+            link = ((collection.metadata or {}).get('page_index'), time.monotonic())
+            cls._links[collection_name] = link
+        return link[0]
+
+    @classmethod
+    async def query_chunks(cls, collection_name: str, query_embeddings: list, n_results: int) -> list:
+        """
+        Two-stage retrieval: top pages from the page index, then the best
+        chunks of those pages only. Collections without a page index, or
+        queries the chosen pages have no chunk for, use the flat search.
+        """
+        index_name = await cls.linked_index(collection_name)
+        if index_name:
+            urls = await cls.top_urls(index_name, query_embeddings)
+            if urls:
+                chunks = await ChromaDB.query_docs(collection_name=collection_name, query_embeddings=query_embeddings,
+                                                   n_results=n_results, where={'url': {'$in': urls}})
+                if chunks:
+                    return chunks
+        return await ChromaDB.query_docs(collection_name=collection_name, query_embeddings=query_embeddings,
+                                         n_results=n_results)
@@ -0,0 +1,272 @@
+import gzip
+import json
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+from dotenv import load_dotenv
+
+from databases.chromaDB import ChromaDB, LEGACY_EMBEDDING_MODEL, hnsw_configuration
+from utils.file_lock import FileLock
+from utils.logger import Logger
+
+
+load_dotenv()
+
+FORMAT_VERSION = 1
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+
+class CollectionSnapshots:
+    """
+    On-disk snapshots of the Chroma collections, so a restart does not force
+    every tenant to scrape and embed its website again.
+
+    Each collection is written to SNAPSHOT_DIR/<name>/ as
+      - manifest.json: collection name, metadata and HNSW settings, record count, vector size
+      - records.jsonl.gz: one {id, document, metadata} line per record
+      - embeddings.npy: float32 (count, dim) matrix, loaded memory-mapped
+
+    The vectors stay uncompressed so they can be memory-mapped on restore, the
+    text and metadata (most of the size) are gzipped. A snapshot is written to
+    a temporary directory of its process under SNAPSHOT_DIR/.tmp first and
+    swapped in, so a crash mid-write keeps the previous one.
+
+    Every worker saves at shutdown and restores at startup. A lock file per
+    collection in SNAPSHOT_DIR/.locks serializes them, and only one worker
+    at a time runs the shutdown snapshot.
+    """
+    directory = os.getenv('SNAPSHOT_DIR', 'snapshots')
+    batch_size = int(os.getenv('SNAPSHOT_BATCH_SIZE', 1000))
+    snapshot_on_shutdown = _env_flag('SNAPSHOT_ON_SHUTDOWN', 'true')
+    restore_on_startup = _env_flag('SNAPSHOT_RESTORE_ON_STARTUP', 'true')
+    # the old behaviour: drop every collection when the app stops
+    wipe_on_shutdown = _env_flag('WIPE_COLLECTIONS_ON_SHUTDOWN', 'false')
+
+    @classmethod
+    def path(cls, collection_name: str) -> str:
+        return os.path.join(cls.directory, collection_name)
+
+    @classmethod
+    def lock(cls, collection_name: str) -> FileLock:
+        return FileLock(os.path.join(cls.directory, '.locks', f"{collection_name}.lock"))
+
+    @classmethod
+    def _scratch(cls, collection_name: str, kind: str) -> str:
+        # unique per process and call, workers never share a half-written directory
+        return os.path.join(cls.directory, '.tmp', f"{collection_name}.{kind}-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+
+    @classmethod
+    def list_snapshots(cls) -> list[str]:
+        if not os.path.isdir(cls.directory):
+            return []
+        return sorted(name for name in os.listdir(cls.directory)
+                      if os.path.isfile(os.path.join(cls.directory, name, 'manifest.json')))
+
+    @classmethod
+    def read_manifest(cls, collection_name: str) -> dict:
+        with open(os.path.join(cls.path(collection_name), 'manifest.json'), encoding='utf-8') as f:
+            return json.load(f)
+
+    @classmethod
+    async def save(cls, collection_name: str) -> dict:
+        """
+        Export ids, documents, metadatas and embeddings of one collection
+        """
+        lock = cls.lock(collection_name)
+        await lock.wait()
+        temporary = cls._scratch(collection_name, 'tmp')
+        try:
+            return await cls._save(collection_name, temporary)
+        finally:
+            shutil.rmtree(temporary, ignore_errors=True)
+            lock.release()
+
+    @classmethod
+    async def _save(cls, collection_name: str, temporary: str) -> dict:
+        started = time.perf_counter()
+        collection = await ChromaDB.get_collection(collection_name)
+        count = await collection.count()
+        target = cls.path(collection_name)
+        os.makedirs(temporary)
+
+        vectors = None
+        written = 0
+        with gzip.open(os.path.join(temporary, 'records.jsonl.gz'), 'wt', encoding='utf-8', compresslevel=6) as records:
+            for offset in range(0, count, cls.batch_size):
+                page = await collection.get(limit=cls.batch_size, offset=offset,
+                                            include=['documents', 'metadatas', 'embeddings'])
+                if not len(page['ids']):
+                    break
+                embeddings = np.asarray(page['embeddings'], dtype=np.float32)
+                if vectors is None:
+                    vectors = np.lib.format.open_memmap(os.path.join(temporary, 'embeddings.npy'), mode='w+',
+                                                        dtype=np.float32, shape=(count, embeddings.shape[1]))
+                # rows added while exporting are left for the next snapshot
+                rows = min(len(page['ids']), count - written)
+                vectors[written:written + rows] = embeddings[:rows]
+                for i in range(rows):
+                    records.write(json.dumps({'id': page['ids'][i], 'document': page['documents'][i],
+                                              'metadata': page['metadatas'][i]}) + '\n')
+                written += rows
+                if written >= count:
+                    break
+        if vectors is not None:
+            vectors.flush()
+            del vectors
+
+        manifest = {
+            'version': FORMAT_VERSION,
+            'name': collection_name,
+            'metadata': collection.metadata,
+            'hnsw': {key: value for key, value in ((collection.configuration_json or {}).get('hnsw') or {}).items()
+                     if key in ('space', 'max_neighbors', 'ef_construction', 'ef_search')},
+            'count': written,
+            'dimension': None,
+            'created_at': time.time(),
+        }
+        if written:
+            # the matrix was sized for count rows, trim it if the collection shrank meanwhile
+            matrix = np.load(os.path.join(temporary, 'embeddings.npy'), mmap_mode='r')
+            manifest['dimension'] = int(matrix.shape[1])
+            if matrix.shape[0] != written:
+                trimmed = np.array(matrix[:written])
+                del matrix
+                np.save(os.path.join(temporary, 'embeddings.npy'), trimmed)
+            else:
+                del matrix
+        with open(os.path.join(temporary, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+
+        previous = cls._scratch(collection_name, 'old')
+        if os.path.exists(target):
+            os.replace(target, previous)
+        os.replace(temporary, target)
+        shutil.rmtree(previous, ignore_errors=True)
+
+        await Logger.info_log('collection snapshot saved', collection=collection_name, records=written,
+                              seconds=round(time.perf_counter() - started, 3))
+        return manifest
+
+    @classmethod
+    async def restore(cls, collection_name: str, overwrite: bool = False) -> int:
+        """
+        Bulk load a snapshot with its stored embeddings, nothing is embedded
+        again. An existing non-empty collection is left alone unless overwrite
+        is set. Returns the number of restored records.
+        """
+        lock = cls.lock(collection_name)
+        # waits for a save of another worker to swap in, or for its restore of the same collection
+        await lock.wait()
+        try:
+            return await cls._restore(collection_name, overwrite)
+        finally:
+            lock.release()
+
+    @classmethod
+    async def _restore(cls, collection_name: str, overwrite: bool) -> int:
+        started = time.perf_counter()
+        manifest = cls.read_manifest(collection_name)
+        existing = {collection.name for collection in await ChromaDB.list_collections()}
+        if collection_name in existing:
+            collection = await ChromaDB.get_collection(collection_name)
+            if await collection.count() and not overwrite:
+                return 0
+        # legacy hnsw:* metadata keys would clash with the explicit HNSW settings
+        metadata = {key: value for key, value in (manifest.get('metadata') or {}).items()
+                    if not key.startswith('hnsw:')}
+        # snapshots from before the model was recorded hold embeddings of the legacy model
+        metadata.setdefault('embedding_model', LEGACY_EMBEDDING_MODEL)
+        collection = await ChromaDB.create_collection(collection_name, metadata=metadata,
+                                                      hnsw=manifest.get('hnsw') or hnsw_configuration(manifest['count']))
+        if not manifest['count']:
+            return 0
+
+        vectors = np.load(os.path.join(cls.path(collection_name), 'embeddings.npy'), mmap_mode='r')
+        restored = 0
+        ids, documents, metadatas = [], [], []
+
+        async def flush():
+            nonlocal restored
+            # the stored vectors go in as they are, compact collections already hold reduced ones
+            await collection.upsert(documents=documents, ids=ids, metadatas=metadatas,
+                                    embeddings=np.array(vectors[restored:restored + len(ids)]))
+            restored += len(ids)
+            ids.clear(), documents.clear(), metadatas.clear()
+
+        with gzip.open(os.path.join(cls.path(collection_name), 'records.jsonl.gz'), 'rt', encoding='utf-8') as records:
+            for line in records:
+                record = json.loads(line)
+                ids.append(record['id'])
+                documents.append(record['document'])
+                metadatas.append(record['metadata'])
+                if len(ids) >= cls.batch_size:
+                    await flush()
+            if ids:
+                await flush()
+
+        await Logger.info_log('collection snapshot restored', collection=collection_name, records=restored,
+                              seconds=round(time.perf_counter() - started, 3))
+        return restored
+
+    @classmethod
+    def delete(cls, collection_name: str) -> None:
+        """
+        Forget the snapshot of a dropped collection, so it is not restored again
+        """
+        previous = cls._scratch(collection_name, 'old')
+        if os.path.exists(cls.path(collection_name)):
+            # moved out of the listing first, a concurrent restore_all must not see half of it
+            os.makedirs(os.path.dirname(previous), exist_ok=True)
+            os.replace(cls.path(collection_name), previous)
+        shutil.rmtree(previous, ignore_errors=True)
+
+    @classmethod
+    async def save_all(cls) -> dict:
+        saved = {}
+        for collection in await ChromaDB.list_collections():
+            try:
+                saved[collection.name] = (await cls.save(collection.name))['count']
+            except Exception as e:
+                await Logger.error_log(__name__, 'save_all', e)
+        return saved
+
+    @classmethod
+    async def restore_all(cls, skip: set = None) -> dict:
+        restored = {}
+        for name in cls.list_snapshots():
+            if skip and name in skip:
+                continue
+            try:
+                restored[name] = await cls.restore(name)
+            except Exception as e:
+                await Logger.error_log(__name__, 'restore_all', e)
+        return restored
+
+    @classmethod
+    async def on_startup(cls, skip: set = None) -> None:
+        """
+        Restore every snapshot except skip, the collections of cold tenants
+        that stay on disk until they are queried
+        """
+        if cls.restore_on_startup:
+            await cls.restore_all(skip)
+
+    @classmethod
+    async def on_shutdown(cls) -> None:
+        if cls.snapshot_on_shutdown:
+            # the workers stop together and would all export the same collections, one is enough
+            leader = FileLock(os.path.join(cls.directory, '.locks', 'shutdown.lock'))
+            if leader.acquire():
+                try:
+                    await cls.save_all()
+                finally:
+                    leader.release()
+        if cls.wipe_on_shutdown:
+            for collection in await ChromaDB.list_collections():
+                await ChromaDB.delete_collection(collection.name)
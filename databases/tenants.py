@@ -0,0 +1,442 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+
+from databases.chromaDB import ChromaDB
+from databases.collection_versions import CollectionVersions
+from databases.page_index import PageIndex
+from databases.snapshots import CollectionSnapshots
+from utils.file_lock import FileLock
+from utils.logger import Logger
+
+
+load_dotenv()
+
+COUNTERS = ('queries', 'scrapes', 'chunks', 'loads', 'evictions')
+# names that can become lease files, company names come from clients
+LEASE_NAME = re.compile(r'^[a-zA-Z0-9][a-zA-Z0-9._-]{2,62}$')
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+
+def website_domain(website: str) -> str:
+    """
+    Lower-case host of a website without 'www.', e.g. 'acme.co.uk'
+    """
+    website = website.strip()
+    host = urlparse(website if '://' in website else f"http://{website}").hostname or ''
+    host = host.rstrip('.')
+    return host[4:] if host.startswith('www.') else host
+
+
+def base_collection_name(domain: str) -> str:
+    """
+    Collection name of a domain before collisions are checked: '<name>.com'
+    keeps the bare name tenants were created with so far, every other domain
+    spells out its full host ('acme.co.uk' -> 'acme-co-uk'). Only [a-z0-9-]
+    is used, so a tenant name never looks like a version or page index name.
+    """
+    name = domain[:-4] if domain.endswith('.com') and domain.count('.') == 1 else domain
+    name = re.sub(r'[^a-z0-9]+', '-', name).strip('-')
+    # chroma names are 3 to 63 characters, leave room for '__v<N>__pages'
+    if len(name) < 3 or len(name) > 48:
+        name = f"{name[:39].strip('-') or 'site'}-{hashlib.md5(domain.encode('utf-8')).hexdigest()[:8]}"
+    return name
+
+
+class TenantRegistry:
+    """
+    One entry per company collection: its domain, usage counters and tier.
+
+    Hot tenants are live in Chroma. Cold ones were snapshotted to SNAPSHOT_DIR
+    and deleted from Chroma, so their HNSW indexes take no memory. They are
+    restored on their first query. A sweep every TENANT_SWEEP_SECONDS evicts
+    the least recently used tenants beyond TENANT_MAX_HOT, and any tenant idle
+    for TENANT_IDLE_SECONDS. A tenant used within TENANT_MIN_IDLE_SECONDS is
+    never evicted.
+
+    Chroma is shared by every worker, so the tier lives in SNAPSHOT_DIR/.leases:
+      - <name>.lock: a worker using a tenant holds a shared flock on it, an
+        eviction or a restore needs it exclusively, so a tenant is never
+        deleted under a request of another worker
+      - <name>.cold: present while the tenant is cold, lists its collections
+      - _sweeper.lock: held by the one worker that runs the sweeps
+
+    The registry with the usage counters is kept in SNAPSHOT_DIR/tenants.json.
+    Workers merge their counters and last use into it on every save.
+    """
+    enabled = _env_flag('TENANT_TIERING', 'true')
+    max_hot = int(os.getenv('TENANT_MAX_HOT', 50))
+    idle_seconds = float(os.getenv('TENANT_IDLE_SECONDS', 6 * 3600))
+    min_idle_seconds = float(os.getenv('TENANT_MIN_IDLE_SECONDS', 300))
+    sweep_seconds = float(os.getenv('TENANT_SWEEP_SECONDS', 60))
+
+    # name -> {domain, state, last_used, created_at, state_changed_at, collections, counters...}
+    _tenants: dict[str, dict] = {}
+    # name -> counter increments not saved yet
+    _pending: dict[str, dict] = {}
+    _in_flight: dict[str, int] = {}
+    # name -> shared lease held while _in_flight is above 0
+    _leases: dict[str, FileLock] = {}
+    _locks: dict[str, asyncio.Lock] = {}
+    _sweeper: FileLock | None = None
+    _task: asyncio.Task | None = None
+
+    @classmethod
+    def path(cls) -> str:
+        return os.path.join(CollectionSnapshots.directory, 'tenants.json')
+
+    @classmethod
+    def lease_path(cls, name: str, suffix: str = 'lock') -> str:
+        return os.path.join(CollectionSnapshots.directory, '.leases', f"{name}.{suffix}")
+
+    @classmethod
+    def cold_marker(cls, name: str) -> list[str] | None:
+        """
+        Collections of a cold tenant, None when it is hot
+        """
+        try:
+            with open(cls.lease_path(name, 'cold'), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def refresh(cls) -> None:
+        """
+        Take the tier of every tenant from the cold markers, another worker may
+        have evicted or loaded it
+        """
+        for name, entry in cls._tenants.items():
+            state = 'cold' if os.path.exists(cls.lease_path(name, 'cold')) else 'hot'
+            if entry['state'] != state:
+                entry.update(state=state, state_changed_at=time.time())
+
+    @classmethod
+    def _entry(cls, name: str, domain: str = '') -> dict:
+        if name not in cls._tenants:
+            now = time.time()
+            cls._tenants[name] = {'domain': domain, 'state': 'hot', 'created_at': now, 'last_used': now,
+                                  'state_changed_at': now, 'collections': [], **{key: 0 for key in COUNTERS}}
+        return cls._tenants[name]
+
+    @classmethod
+    def _count(cls, name: str, key: str, value: int = 1) -> None:
+        cls._entry(name)[key] += value
+        pending = cls._pending.setdefault(name, {})
+        pending[key] = pending.get(key, 0) + value
+
+    @classmethod
+    def load(cls) -> None:
+        if os.path.exists(cls.path()):
+            with open(cls.path(), encoding='utf-8') as f:
+                cls._tenants = json.load(f)
+        cls.refresh()
+
+    @classmethod
+    async def save(cls) -> None:
+        """
+        Merge this worker's view into tenants.json: counters are added, the
+        newest last_used and tier change win. The read-merge-replace holds
+        tenants.json.lock, so workers saving at once never drop each other's
+        counts.
+        """
+        lock = FileLock(f"{cls.path()}.lock")
+        await lock.wait()
+        try:
+            cls._merge()
+        finally:
+            lock.release()
+
+    @classmethod
+    def _merge(cls) -> None:
+        stored = {}
+        if os.path.exists(cls.path()):
+            with open(cls.path(), encoding='utf-8') as f:
+                stored = json.load(f)
+        for name, entry in cls._tenants.items():
+            other = stored.get(name)
+            if other is None:
+                stored[name] = entry
+                continue
+            for key, value in cls._pending.get(name, {}).items():
+                other[key] = other.get(key, 0) + value
+            other['last_used'] = max(other.get('last_used', 0), entry['last_used'])
+            other['domain'] = other.get('domain') or entry['domain']
+            if entry['state_changed_at'] >= other.get('state_changed_at', 0):
+                for key in ('state', 'state_changed_at', 'collections'):
+                    other[key] = entry[key]
+        os.makedirs(CollectionSnapshots.directory, exist_ok=True)
+        temporary = f"{cls.path()}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(stored, f)
+        os.replace(temporary, cls.path())
+        # only once written, a failed save keeps the increments for the next one
+        cls._pending.clear()
+        # in place, callers waiting on a restore or an eviction hold on to the entries
+        for name, other in stored.items():
+            if name in cls._tenants:
+                cls._tenants[name].update(other)
+            else:
+                cls._tenants[name] = other
+
+    @classmethod
+    def collection_name(cls, website: str) -> str:
+        """
+        Collision-free collection name of a website, registered on first use
+        """
+        domain = website_domain(website)
+        if not domain:
+            raise ValueError(f"no domain in {website!r}")
+        for name, entry in cls._tenants.items():
+            if entry.get('domain') == domain:
+                return name
+        name = base_collection_name(domain)
+        if name in cls._tenants and cls._tenants[name].get('domain') not in ('', domain):
+            name = f"{name[:39]}-{hashlib.md5(domain.encode('utf-8')).hexdigest()[:8]}"
+        entry = cls._entry(name, domain)
+        # a tenant found in chroma before its domain was known
+        entry['domain'] = entry['domain'] or domain
+        return name
+
+    @classmethod
+    def cold_collections(cls) -> set[str]:
+        directory = os.path.dirname(cls.lease_path('-'))
+        if not os.path.isdir(directory):
+            return set()
+        return {collection for file in os.listdir(directory) if file.endswith('.cold')
+                for collection in cls.cold_marker(file[:-len('.cold')]) or []}
+
+    @classmethod
+    async def discover(cls) -> None:
+        """
+        Register the tenants already in Chroma. Versions count as their alias,
+        page indexes and registry collections are not tenants.
+        """
+        for collection in await ChromaDB.list_collections():
+            name = collection.name
+            if (collection.metadata or {}).get('registry') or name.endswith('__pages'):
+                continue
+            parsed = CollectionVersions.parse(name)
+            cls._entry(parsed[0] if parsed else name)
+        cls.refresh()
+
+    @classmethod
+    async def collections_of(cls, name: str) -> list[str]:
+        existing = {collection.name for collection in await ChromaDB.list_collections()}
+        versions = await CollectionVersions.versions(name)
+        return [collection for version in versions for collection in (version, PageIndex.name(version))
+                if collection in existing]
+
+    @classmethod
+    def _lock(cls, name: str) -> asyncio.Lock:
+        if name not in cls._locks:
+            cls._locks[name] = asyncio.Lock()
+        return cls._locks[name]
+
+    @classmethod
+    async def _load(cls, name: str) -> None:
+        # called with the exclusive lease, no worker reads the collections meanwhile
+        collections = cls.cold_marker(name)
+        if collections is None:
+            return
+        started = time.perf_counter()
+        for collection in collections:
+            await CollectionSnapshots.restore(collection, overwrite=True)
+        os.remove(cls.lease_path(name, 'cold'))
+        cls._entry(name).update(state='hot', state_changed_at=time.time(), collections=[])
+        cls._count(name, 'loads')
+        await Logger.info_log('tenant loaded', tenant=name, seconds=round(time.perf_counter() - started, 3))
+
+    @classmethod
+    async def _lease(cls, name: str) -> None:
+        """
+        Take the shared lease of a hot tenant for this worker, restoring the
+        tenant first when it is cold. Concurrent callers of every worker wait
+        for the same restore.
+        """
+        async with cls._lock(name):
+            if name in cls._leases:
+                return
+            lease = FileLock(cls.lease_path(name))
+            while True:
+                if os.path.exists(cls.lease_path(name, 'cold')):
+                    if lease.acquire():
+                        try:
+                            await cls._load(name)
+                        finally:
+                            lease.release()
+                        continue
+                elif lease.acquire(shared=True):
+                    # evictions write the marker under the exclusive lease, holding it shared the tier is settled
+                    if not os.path.exists(cls.lease_path(name, 'cold')):
+                        cls._leases[name] = lease
+                        return
+                    lease.release()
+                    continue
+                # another worker is evicting or loading the tenant
+                await asyncio.sleep(0.05)
+
+    @classmethod
+    async def ensure_loaded(cls, name: str) -> None:
+        """
+        Restore a cold tenant from its snapshots
+        """
+        async with cls.use(name):
+            pass
+
+    @classmethod
+    @asynccontextmanager
+    async def use(cls, name: str):
+        """
+        Mark a tenant busy while its collections are read or written, loading
+        it first when it is cold. Busy tenants are never evicted by any worker.
+        """
+        entry = cls._tenants.get(name)
+        if entry is None:
+            if not LEASE_NAME.match(name) or not os.path.exists(cls.lease_path(name)):
+                # never leased by any worker, so never evicted either
+                yield
+                return
+            # registered by another worker since the last save
+            entry = cls._entry(name)
+        if not cls._in_flight.get(name):
+            await cls._lease(name)
+        entry['last_used'] = time.time()
+        # no await between the lease and the increment, the lease is only dropped at zero
+        cls._in_flight[name] = cls._in_flight.get(name, 0) + 1
+        try:
+            yield
+        finally:
+            cls._in_flight[name] -= 1
+            if not cls._in_flight[name]:
+                cls._leases.pop(name).release()
+
+    @classmethod
+    def record_query(cls, name: str) -> None:
+        if name in cls._tenants:
+            cls._tenants[name]['last_used'] = time.time()
+            cls._count(name, 'queries')
+
+    @classmethod
+    def record_scrape(cls, name: str, chunks: int) -> None:
+        entry = cls._entry(name)
+        entry['last_used'] = time.time()
+        cls._count(name, 'scrapes')
+        cls._count(name, 'chunks', chunks)
+
+    @classmethod
+    async def evict(cls, name: str) -> bool:
+        """
+        Snapshot every collection of a tenant and delete them from Chroma
+        """
+        entry = cls._tenants.get(name)
+        if entry is None or cls._in_flight.get(name) or not LEASE_NAME.match(name):
+            return False
+        lease = FileLock(cls.lease_path(name))
+        # fails while any worker holds the tenant, a reindex included
+        if not lease.acquire():
+            return False
+        try:
+            if os.path.exists(cls.lease_path(name, 'cold')):
+                return False
+            collections = await cls.collections_of(name)
+            for collection in collections:
+                await CollectionSnapshots.save(collection)
+            # the marker goes first: should a delete fail, the next use restores over what is left
+            marker = cls.lease_path(name, 'cold')
+            with open(f"{marker}.tmp", 'w', encoding='utf-8') as f:
+                json.dump(collections, f)
+            os.replace(f"{marker}.tmp", marker)
+            entry.update(state='cold', state_changed_at=time.time(), collections=collections)
+            for collection in collections:
+                # the side store of a compact collection has to survive for the restore
+                await ChromaDB.delete_collection(collection, keep_side_store=True)
+        finally:
+            lease.release()
+        cls._count(name, 'evictions')
+        await Logger.info_log('tenant evicted', tenant=name, collections=len(collections))
+        return True
+
+    @classmethod
+    async def sweep(cls) -> list[str]:
+        """
+        Evict idle tenants and the least recently used ones beyond TENANT_MAX_HOT
+        """
+        cls.refresh()
+        now = time.time()
+        hot = sorted((entry['last_used'], name) for name, entry in cls._tenants.items() if entry['state'] == 'hot')
+        excess = max(0, len(hot) - cls.max_hot)
+        evicted = []
+        for i, (last_used, name) in enumerate(hot):
+            idle = now - last_used
+            if idle < cls.min_idle_seconds or (i >= excess and idle < cls.idle_seconds):
+                continue
+            try:
+                if await cls.evict(name):
+                    evicted.append(name)
+            except Exception as e:
+                await Logger.error_log(__name__, 'sweep', e)
+        return evicted
+
+    @classmethod
+    async def _run(cls) -> None:
+        while True:
+            await asyncio.sleep(cls.sweep_seconds)
+            try:
+                # merge first, the sweep ranks tenants by their last use in any worker
+                await cls.save()
+                if cls.enabled and cls.elected():
+                    await cls.sweep()
+                else:
+                    cls.refresh()
+            except Exception as e:
+                await Logger.error_log(__name__, '_run', e)
+
+    @classmethod
+    def elected(cls) -> bool:
+        """
+        Whether this worker runs the sweeps, the first to take _sweeper.lock
+        keeps it until it stops
+        """
+        if cls._sweeper is None:
+            cls._sweeper = FileLock(cls.lease_path('_sweeper'))
+        return cls._sweeper.held or cls._sweeper.acquire()
+
+    @classmethod
+    async def start(cls) -> None:
+        cls.load()
+        if cls._task is None or cls._task.done():
+            cls._task = asyncio.create_task(cls._run())
+
+    @classmethod
+    async def stop(cls) -> None:
+        if cls._task is not None:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
+        if cls._sweeper is not None:
+            cls._sweeper.release()
+        await cls.save()
+
+    @classmethod
+    def stats(cls) -> dict:
+        cls.refresh()
+        return {
+            'hot': sum(1 for entry in cls._tenants.values() if entry['state'] == 'hot'),
+            'cold': sum(1 for entry in cls._tenants.values() if entry['state'] == 'cold'),
+            'tenants': {name: {key: value for key, value in entry.items() if key != 'collections'}
+                        for name, entry in sorted(cls._tenants.items())},
+        }
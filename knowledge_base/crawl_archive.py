@@ -0,0 +1,196 @@
+import gzip
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+FORMAT_VERSION = 1
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+
+def _codec(name: str, level: int = 3):
+    """
+    (compress, decompress) for a codec name. Every record is compressed on its
+    own, so any record can be read from its offset without the ones before it.
+    """
+    if name == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=level).compress, zstandard.ZstdDecompressor().decompress
+    if name == 'gzip':
+        return (lambda data: gzip.compress(data, compresslevel=6)), gzip.decompress
+    raise ValueError(f"unknown crawl archive codec: {name}")
+
+
+def _default_codec() -> str:
+    try:
+        import zstandard  # noqa: F401
+        return 'zstd'
+    except ImportError:
+        # still usable without the optional dependency, just larger and slower
+        return 'gzip'
+
+
+RECORD_FILES = {'zstd': 'records.warc.zst', 'gzip': 'records.warc.gz'}
+
+
+class CrawlArchiveWriter:
+    """
+    Writes one crawl to CRAWL_ARCHIVE_DIR/<collection>/<UTC time>/:
+      - records.warc.zst: WARC-style response records, one zstd frame each
+      - index.jsonl: {url, offset, length, status, date} per record
+      - manifest.json: codec, page count and the internal/external URLs of
+        the crawl, written by close() once the crawl is complete
+
+    Records and index lines are appended as pages arrive, so an interrupted
+    crawl keeps what it fetched but has no manifest and is never replayed.
+    """
+    def __init__(self, path: str, codec: str = None, level: int = None):
+        self.path = path
+        self.codec = codec or _default_codec()
+        self._compress, _ = _codec(self.codec, level or int(os.getenv('CRAWL_ARCHIVE_LEVEL', 3)))
+        os.makedirs(path, exist_ok=True)
+        self._records = open(os.path.join(path, RECORD_FILES[self.codec]), 'ab')
+        self._index = open(os.path.join(path, 'index.jsonl'), 'a', encoding='utf-8')
+        self.pages = 0
+        self.raw_bytes = 0
+
+    def write(self, url: str, html: str, status: int = 200, content_type: str = 'text/html; charset=utf-8') -> Dict:
+        body = html.encode('utf-8')
+        date = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        header = (f"WARC/1.1\r\nWARC-Type: response\r\nWARC-Target-URI: {url}\r\nWARC-Date: {date}\r\n"
+                  f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n").encode('utf-8')
+        frame = self._compress(header + body + b'\r\n\r\n')
+        entry = {'url': url, 'offset': self._records.tell(), 'length': len(frame), 'status': status, 'date': date}
+        self._records.write(frame)
+        self._index.write(json.dumps(entry) + '\n')
+        self.pages += 1
+        self.raw_bytes += len(body)
+        return entry
+
+    def close(self, internal_urls: List[str] = None, external_urls: List[str] = None) -> Dict:
+        self._records.close()
+        self._index.close()
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'codec': self.codec,
+            'created_at': time.time(),
+            'pages': self.pages,
+            'raw_bytes': self.raw_bytes,
+            'archive_bytes': os.path.getsize(os.path.join(self.path, RECORD_FILES[self.codec])),
+            'internal_urls': internal_urls or [],
+            'external_urls': external_urls or [],
+        }
+        temporary = os.path.join(self.path, 'manifest.json.tmp')
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(temporary, os.path.join(self.path, 'manifest.json'))
+        return manifest
+
+
+class CrawlArchive:
+    """
+    Read side of an archived crawl: random access to the HTML of any URL
+    through the offset index, without decompressing the rest of the file.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        _, self._decompress = _codec(self.manifest['codec'])
+        self.entries: Dict[str, Dict] = {}
+        with open(os.path.join(path, 'index.jsonl'), encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    # a URL fetched twice keeps its last response
+                    self.entries[entry['url']] = entry
+        self._records = None
+
+    @property
+    def urls(self) -> List[str]:
+        return list(self.entries)
+
+    def read(self, url: str) -> Optional[str]:
+        entry = self.entries.get(url)
+        if entry is None:
+            return None
+        if self._records is None:
+            self._records = open(os.path.join(self.path, RECORD_FILES[self.manifest['codec']]), 'rb')
+        self._records.seek(entry['offset'])
+        record = self._decompress(self._records.read(entry['length']))
+        _, body = record.split(b'\r\n\r\n', 1)
+        return body[:-4].decode('utf-8')
+
+    def __iter__(self) -> Iterator[tuple]:
+        # offset order reads the file front to back
+        for entry in sorted(self.entries.values(), key=lambda entry: entry['offset']):
+            yield entry['url'], self.read(entry['url'])
+
+    def close(self) -> None:
+        if self._records is not None:
+            self._records.close()
+            self._records = None
+
+
+class CrawlArchives:
+    """
+    Crawl archives of every collection. Crawls are kept under
+    CRAWL_ARCHIVE_DIR/<collection>/, the newest CRAWL_ARCHIVE_KEEP complete
+    ones survive each new crawl. CRAWL_ARCHIVE=false stops writing them.
+    """
+    enabled = _env_flag('CRAWL_ARCHIVE', 'true')
+    directory = os.getenv('CRAWL_ARCHIVE_DIR', 'crawl_archive')
+    keep = max(1, int(os.getenv('CRAWL_ARCHIVE_KEEP', 3)))
+
+    @classmethod
+    def writer(cls, collection_name: str) -> Optional[CrawlArchiveWriter]:
+        if not cls.enabled:
+            return None
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+        return CrawlArchiveWriter(os.path.join(cls.directory, collection_name, stamp))
+
+    @classmethod
+    def list_collections(cls) -> List[str]:
+        if not os.path.isdir(cls.directory):
+            return []
+        return sorted(name for name in os.listdir(cls.directory) if cls.list_crawls(name))
+
+    @classmethod
+    def list_crawls(cls, collection_name: str) -> List[str]:
+        """
+        Complete crawls of a collection, oldest first
+        """
+        root = os.path.join(cls.directory, collection_name)
+        if not os.path.isdir(root):
+            return []
+        return [os.path.join(root, name) for name in sorted(os.listdir(root))
+                if os.path.isfile(os.path.join(root, name, 'manifest.json'))]
+
+    @classmethod
+    def latest(cls, collection_name: str) -> Optional[str]:
+        crawls = cls.list_crawls(collection_name)
+        return crawls[-1] if crawls else None
+
+    @classmethod
+    def prune(cls, collection_name: str) -> None:
+        root = os.path.join(cls.directory, collection_name)
+        if not os.path.isdir(root):
+            return
+        complete = cls.list_crawls(collection_name)
+        for name in sorted(os.listdir(root)):
+            path = os.path.join(root, name)
+            # unfinished crawls older than the newest complete one are leftovers of a crash
+            stale = path in complete[:-cls.keep]
+            unfinished = path not in complete and complete and path < complete[-1]
+            if stale or unfinished:
+                shutil.rmtree(path, ignore_errors=True)
@@ -1,5 +1,5 @@
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Comment, Declaration, Doctype, ProcessingInstruction
 from urllib.parse import urljoin, urlparse
 import re
 import time
@@ -7,15 +7,19 @@ from typing import List, Dict, Optional
 import warnings
 warnings.filterwarnings('ignore')
 
+HEADING_TAGS = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+
 class WebScraper:
-    def __init__(self, delay: float = 1.0):
+    def __init__(self, delay: float = 1.0, archive=None):
         """
         Initialize the web scraper
 
         Args:
             delay: Delay between requests in seconds (be respectful to servers)
+            archive: Optional CrawlArchiveWriter that keeps the HTML of every fetched page
         """
         self.delay = delay
+        self.archive = archive
         self.session = requests.Session()
         # Set a user agent to avoid being blocked
         self.session.headers.update({
@@ -35,6 +39,9 @@ class WebScraper:
         try:
             response = self.session.get(url, timeout=10)
             response.raise_for_status()
+            if self.archive is not None:
+                self.archive.write(url, response.text, response.status_code,
+                                   response.headers.get('Content-Type', 'text/html; charset=utf-8'))
             return response.text
         except requests.exceptions.RequestException as e:
             print(f"Error fetching {url}: {e}")
@@ -91,7 +98,8 @@ class WebScraper:
             'paragraphs': [],
             'links': [],
             'images': [],
-            'meta_description': ''
+            'meta_description': '',
+            'sections': []
         }
 
         # Extract title
@@ -105,7 +113,7 @@ class WebScraper:
             data['meta_description'] = meta_desc.get('content', '').strip()
 
         # Extract headings
-        for heading in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
+        for heading in soup.find_all(HEADING_TAGS):
             data['headings'].append({
                 'level': heading.name,
                 'text': heading.get_text().strip()
@@ -131,8 +139,51 @@ class WebScraper:
                 'src': img['src']
             })
 
+        data['sections'] = self.extract_sections(soup)
+
         return data
 
+    def extract_sections(self, soup: BeautifulSoup) -> List[Dict]:
+        """
+        Split the page text at its headings, in document order
+
+        Args:
+            soup: Parsed page with the unwanted elements already removed
+
+        Returns:
+            List of {'headings': heading path from h1 down, 'text': section text}
+        """
+        sections = []
+        path = []  # (level, text) of the enclosing headings
+        parts = []
+        heading_strings = set()
+
+        def close_section():
+            text = re.sub(r'\s+', ' ', ' '.join(parts)).strip()
+            if text:
+                sections.append({'headings': [heading for _, heading in path], 'text': text})
+            parts.clear()
+
+        # one pass over the tree, a heading tag is always visited before its own strings
+        for node in soup.descendants:
+            name = getattr(node, 'name', None)
+            if name in HEADING_TAGS:
+                # a new heading closes the running section and replaces every heading at its level or below
+                close_section()
+                level = int(name[1])
+                while path and path[-1][0] >= level:
+                    path.pop()
+                path.append((level, node.get_text(' ', strip=True)))
+                heading_strings.update(id(string) for string in node.find_all(string=True))
+                continue
+            if name is not None or isinstance(node, (Comment, Declaration, Doctype, ProcessingInstruction)):
+                continue
+            if id(node) in heading_strings or node.parent.name == 'title' or not node.strip():
+                continue
+            parts.append(node)
+        close_section()
+        return sections
+
     def scrape_url(self, url: str, return_structured: bool = False) -> Dict:
         """
         Scrape a single URL and return text content
@@ -142,21 +193,29 @@ class WebScraper:
             return_structured: Whether to return structured data or just text
 
         Returns:
-            Dictionary with scraped data
+            Dictionary with scraped data, including fetch and parse timings in seconds
         """
 
+        started = time.perf_counter()
         html = self.get_page_content(url)
+        fetch_seconds = time.perf_counter() - started
         if not html:
-            return {'url': url, 'success': False, 'error': 'Failed to fetch content'}
+            return {'url': url, 'success': False, 'error': 'Failed to fetch content', 'fetch_seconds': fetch_seconds}
 
         try:
+            started = time.perf_counter()
             if return_structured:
                 structured_data = self.extract_structured_data(html)
+                # built from the sections instead of parsing the page a second time
+                raw_text = ' '.join(' '.join(section['headings'][-1:] + [section['text']])
+                                    for section in structured_data['sections'])
                 return {
                     'url': url,
                     'success': True,
                     'data': structured_data,
-                    'raw_text': self.extract_text_from_html(html)
+                    'raw_text': raw_text,
+                    'fetch_seconds': fetch_seconds,
+                    'parse_seconds': time.perf_counter() - started
                 }
             else:
                 text = self.extract_text_from_html(html)
@@ -164,7 +223,9 @@ class WebScraper:
                     'url': url,
                     'success': True,
                     'text': text,
-                    'text_length': len(text)
+                    'text_length': len(text),
+                    'fetch_seconds': fetch_seconds,
+                    'parse_seconds': time.perf_counter() - started
                 }
         except Exception as e:
             return {'url': url, 'success': False, 'error': str(e)}
@@ -193,6 +254,66 @@ class WebScraper:
         return results
 
 
+class ArchiveReplayScraper(WebScraper):
+    def __init__(self, archive):
+        """
+        Scraper that reads pages from a crawl archive instead of the network
+
+        Args:
+            archive: CrawlArchive to read the HTML from
+        """
+        super().__init__(delay=0)
+        self.replay_archive = archive
+
+    def get_page_content(self, url: str) -> Optional[str]:
+        return self.replay_archive.read(url)
+
+
+def _replay_urls(path: str, urls: List[str], return_structured: bool) -> List[Dict]:
+    from knowledge_base.crawl_archive import CrawlArchive
+
+    archive = CrawlArchive(path)
+    try:
+        return ArchiveReplayScraper(archive).scrape_multiple_urls(urls, return_structured)
+    finally:
+        archive.close()
+
+
+def replay_archive(path: str, return_structured: bool = True, workers: int = 1) -> Dict:
+    """
+    Parse every page of an archived crawl again, without touching the network
+
+    Args:
+        path: Crawl directory written by CrawlArchiveWriter
+        return_structured: Whether to return structured data or just text
+        workers: Processes to parse in, parsing is CPU bound
+
+    Returns:
+        Dictionary with the scraped pages in crawl order and the internal/external URLs of the crawl
+    """
+    from knowledge_base.crawl_archive import CrawlArchive
+
+    archive = CrawlArchive(path)
+    archive.close()
+    # the crawl order, so chunks come out the way the live scrape produced them
+    urls = [url for url in archive.manifest['internal_urls'] if url in archive.entries] or archive.urls
+    if workers > 1 and len(urls) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        size = -(-len(urls) // workers)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = pool.map(_replay_urls, [path] * workers, [urls[i:i + size] for i in range(0, len(urls), size)],
+                             [return_structured] * workers)
+            pages = [page for part in parts for page in part]
+    else:
+        pages = _replay_urls(path, urls, return_structured)
+    return {
+        'pages': pages,
+        'internal_urls': archive.manifest['internal_urls'],
+        'external_urls': archive.manifest['external_urls']
+    }
+
+
 # URL Extractor Script for Jupyter Notebook
 # This script extracts all URLs from a web page
 
@@ -436,7 +557,7 @@ def get_external_urls(url: str, exclude_files: bool = True) -> List[str]:
     return []
 
 
-def scrape_all(urls: List[str], return_structured: bool = False, delay: float = 1.0) -> List[Dict]:
+def scrape_all(urls: List[str], return_structured: bool = False, delay: float = 1.0, archive=None) -> List[Dict]:
     """
     Scrape multiple URLs and return the results
 
@@ -444,11 +565,12 @@ def scrape_all(urls: List[str], return_structured: bool = False, delay: float =
         urls: List of URLs to scrape
         return_structured: Whether to return structured data or just text
         delay: Delay between requests in seconds
+        archive: Optional CrawlArchiveWriter that keeps the HTML of every fetched page
 
     Returns:
         List of dictionaries with scraped data
     """
-    scraper = WebScraper(delay=delay)
+    scraper = WebScraper(delay=delay, archive=archive)
     return scraper.scrape_multiple_urls(urls, return_structured)
 
 
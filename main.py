@@ -1,30 +1,73 @@
+import os
+import uuid
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from starlette.middleware.cors import CORSMiddleware
 
-from add_all_documents import add_profile_data_croma
 from api.v1.chat import chat_router
-from api.v1.scrapper import scrape_webpage, scrape_router
+from api.v1.profiles import profile_router
+from api.v1.scrapper import scrape_router
+from databases.chat_history import ChatHistoryWriter
 from databases.chromaDB import ChromaDB
-from utils.logger import Logger
+from databases.mongoDB import MongoMotor
+from databases.snapshots import CollectionSnapshots
+from databases.tenants import TenantRegistry
+from utils.logger import Logger, request_id_var
+from utils.metrics import render_metrics
+from utils.profiler import RequestProfiler
+from utils.rate_limit import RateLimiter
+from utils.small_talk import SmallTalk
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await Logger.start_logger()
+    RateLimiter.load()
     try:
         await ChromaDB.connect()
     except Exception as e:
         print("Startup error:", e)  # ✅ Add this line for Docker logs
         raise e
 
+    try:
+        # bring tenants back from the last snapshot instead of re-scraping them, cold ones stay on disk
+        await TenantRegistry.start()
+        await CollectionSnapshots.on_startup(skip=TenantRegistry.cold_collections())
+        await TenantRegistry.discover()
+    except Exception as e:
+        await Logger.error_log(__name__,'lifespan',e)
+
+    if os.getenv('MONGO_DB_URI'):
+        try:
+            await MongoMotor.connect_to_mongo()
+            await ChatHistoryWriter.start()
+        except Exception as e:
+            # chat history is best effort, answering must not depend on it
+            await Logger.error_log(__name__,'lifespan',e)
+
+    try:
+        if SmallTalk.enabled:
+            await SmallTalk.load_prototypes(ChromaDB.embed_texts)
+    except Exception as e:
+        # pattern matching still works without the prototype embeddings
+        await Logger.error_log(__name__,'lifespan',e)
+
     yield  # FastAPI app runs...
     # On shutdown
     try:
-        for collec in await ChromaDB.list_collections():
-            await ChromaDB.delete_collection(collec.name)
+        await ChatHistoryWriter.stop()
+        await MongoMotor.close_mongo_connection()
+    except Exception as e:
+        await Logger.error_log(__name__,'lifespan',e)
+
+    try:
+        await TenantRegistry.stop()
+        # snapshot every collection, they are only dropped with WIPE_COLLECTIONS_ON_SHUTDOWN=true
+        await CollectionSnapshots.on_shutdown()
     except Exception as e:
         await Logger.error_log(__name__,'lifespan',e)
         print("Shutdown error:", e)  # ✅ Add this too
+    Logger.stop_logger()
 
 
 
@@ -36,10 +79,35 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+
+# installed only when enabled, so unprofiled deployments do not pay for an extra middleware
+if RequestProfiler.enabled:
+    app.middleware("http")(RequestProfiler.middleware)
+    app.include_router(profile_router,prefix='/api/v1')
+
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers['X-Request-ID'] = request_id
+    return response
+
+
 app.include_router(chat_router,prefix='/api/v1')
 app.include_router(scrape_router,prefix='/api/v1')
 
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+@app.get("/metrics")
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
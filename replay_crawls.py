@@ -0,0 +1,46 @@
+import argparse
+import asyncio
+import os
+
+from databases.chromaDB import ChromaDB
+from utils.logger import Logger
+
+
+async def replay_all(collection_names: list[str] = None, workers: int = 1, embed_rate: float = None) -> dict:
+    """
+    Rebuild collections from their latest archived crawl: the archived HTML
+    goes through the same parse/split/embed path as /scrape into a new
+    version of each collection, no page is fetched
+    """
+    from databases.collection_versions import CollectionVersions
+    from databases.tenants import TenantRegistry
+    from knowledge_base.crawl_archive import CrawlArchives
+
+    if embed_rate is not None:
+        CollectionVersions.embed_rate = embed_rate
+    await Logger.start_logger()
+    results = {}
+    try:
+        await ChromaDB.connect()
+        # the app's workers must not evict a tenant while it is rebuilt from here
+        TenantRegistry.load()
+        for collection_name in collection_names or CrawlArchives.list_collections():
+            try:
+                async with TenantRegistry.use(collection_name):
+                    progress = await CollectionVersions.reindex(collection_name, source='archive', workers=workers)
+                results[collection_name] = {'collection': progress['target'], 'chunks': progress['done']}
+            except Exception as e:
+                await Logger.error_log(__name__,'replay_all',e)
+    finally:
+        Logger.stop_logger()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Re-process archived crawls into their collections without re-fetching')
+    parser.add_argument('--collection', action='append', help='collection to replay, repeatable (default: every archived one)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='processes parsing the archived HTML')
+    parser.add_argument('--embed-rate', type=float, help='chunks embedded per second, 0 for no limit '
+                                                          '(default: REINDEX_EMBED_RATE)')
+    args = parser.parse_args()
+    print(asyncio.run(replay_all(args.collection, args.workers, args.embed_rate)))
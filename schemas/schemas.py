@@ -1,9 +1,18 @@
+from typing import Literal
+
 from pydantic import BaseModel, EmailStr
 
 
 class QueryData(BaseModel):
     query : str
     company_name:str
+    session_id: str | None = None
 
 class WebsiteRequest(BaseModel):
     website: str
+
+class ReindexRequest(BaseModel):
+    company_name: str
+    # 'stored' embeds the current chunks again, 'archive' re-processes the latest crawl archive
+    source: Literal['stored', 'archive'] = 'stored'
+    embedding_model: str | None = None
@@ -0,0 +1,124 @@
+"""
+In-memory stand-ins for the external services, so the tests need neither a
+database nor a model.
+"""
+import asyncio
+import copy
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pymongo.errors import BulkWriteError
+
+
+class InMemoryMongo:
+    """
+    Stand-in for MongoMotor.bulk_write: applies UpdateOne operations
+    ($setOnInsert, $set and $push with $each/$slice) to plain dicts and
+    records the size of every batch
+    """
+    def __init__(self):
+        self.collections: dict[str, list[dict]] = {}
+        self.batches: list[int] = []
+        self.fail_next = 0
+        # companies whose next upsert fails while the rest of the batch is applied
+        self.fail_companies: set[str] = set()
+
+    def find(self, collection_name: str, **query) -> dict | None:
+        for document in self.collections.get(collection_name, []):
+            if all(document.get(key) == value for key, value in query.items()):
+                return document
+        return None
+
+    async def bulk_write(self, collection_name: str, operations: list):
+        if self.fail_next:
+            # MongoMotor logs the error and returns None
+            self.fail_next -= 1
+            return None
+        self.batches.append(len(operations))
+        documents = self.collections.setdefault(collection_name, [])
+        errors = []
+        for index, operation in enumerate(operations):
+            query, update = operation._filter, operation._doc
+            if query.get('company') in self.fail_companies:
+                self.fail_companies.discard(query['company'])
+                errors.append({'index': index, 'code': 11000, 'errmsg': 'stand-in write error'})
+                continue
+            document = self.find(collection_name, **query)
+            if document is None:
+                if not operation._upsert:
+                    continue
+                document = dict(query, **copy.deepcopy(update.get('$setOnInsert', {})))
+                documents.append(document)
+            document.update(copy.deepcopy(update.get('$set', {})))
+            for field, value in update.get('$push', {}).items():
+                items = document.setdefault(field, [])
+                items.extend(copy.deepcopy(value['$each'] if isinstance(value, dict) else [value]))
+                if isinstance(value, dict) and '$slice' in value:
+                    document[field] = items[value['$slice']:] if value['$slice'] < 0 else items[:value['$slice']]
+        if errors:
+            # what MongoMotor.bulk_write returns for a partly applied unordered write
+            return BulkWriteError({'writeErrors': errors, 'writeConcernErrors': [],
+                                   'nUpserted': len(operations) - len(errors)})
+        return {'ok': 1, 'operations': len(operations)}
+
+
+class StreamingChatModel(BaseChatModel):
+    """
+    Stand-in for the chat model of build_llm: streams the given chunks one by
+    one and records how far it got, so a test can tell whether output was
+    forwarded before the model finished
+    """
+    chunks: list[str]
+    emitted: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return 'stand-in'
+
+    @property
+    def completed(self) -> bool:
+        return self.emitted == len(self.chunks)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self.emitted = len(self.chunks)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=''.join(self.chunks)))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for chunk in self.chunks:
+            await asyncio.sleep(0)
+            self.emitted += 1
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+
+class InMemoryCollection:
+    """
+    Stand-in for a Chroma collection: ids, documents and metadatas in insertion
+    order, with the get/count/upsert/delete calls the ingesters make. Every
+    get is recorded so a test can check how the collection was read.
+    """
+    def __init__(self, name: str = 'stand-in'):
+        self.name = name
+        self.records: dict[str, tuple[str, dict]] = {}
+        self.gets: list[dict] = []
+
+    async def count(self) -> int:
+        return len(self.records)
+
+    async def get(self, ids: list = None, limit: int = None, offset: int = 0, include: list = None, where=None):
+        self.gets.append({'ids': ids, 'limit': limit, 'offset': offset})
+        selected = [id_ for id_ in (ids if ids is not None else self.records) if id_ in self.records]
+        selected = selected[offset:offset + limit if limit is not None else None]
+        result = {'ids': selected}
+        for field, index in (('documents', 0), ('metadatas', 1)):
+            if field in (include or []):
+                result[field] = [self.records[id_][index] for id_ in selected]
+        return result
+
+    async def upsert(self, ids: list, documents: list, metadatas: list = None, embeddings=None) -> None:
+        for i, id_ in enumerate(ids):
+            self.records[id_] = (documents[i], (metadatas or [{}] * len(ids))[i])
+
+    async def delete(self, ids: list) -> None:
+        for id_ in ids:
+            self.records.pop(id_, None)
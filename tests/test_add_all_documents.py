@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from add_all_documents import FolderIngester, chunk_id
+from tests.stand_ins import InMemoryCollection
+
+
+def test_contains_only_matches_paths_inside_the_folder():
+    ingester = FolderIngester('knowledge_base', 'profile')
+    assert ingester.contains('knowledge_base/about.md')
+    assert ingester.contains('knowledge_base/team/people.txt')
+    assert ingester.contains('./knowledge_base//about.md')
+    # a sibling folder that shares the prefix belongs to another ingester
+    assert not ingester.contains('knowledge_base_old/about.md')
+    assert not ingester.contains('knowledge_base.md')
+
+
+def test_contains_with_a_trailing_separator():
+    ingester = FolderIngester('knowledge_base/', 'profile')
+    assert ingester.contains('knowledge_base/about.md')
+    assert not ingester.contains('knowledge_base2/about.md')
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    from databases.chromaDB import ChromaDB
+    from databases.collection_versions import CollectionVersions
+
+    collection = InMemoryCollection('profile')
+    writes = {'upserted': [], 'deleted': []}
+
+    async def resolve(alias):
+        return alias
+
+    async def get_collection(name):
+        return collection
+
+    async def upsert_documents(collection_name, documents, ids, metadatas=None, embeddings=None):
+        writes['upserted'].extend(ids)
+        await collection.upsert(ids=ids, documents=documents, metadatas=metadatas)
+
+    async def delete_documents(collection_name, ids):
+        writes['deleted'].extend(ids)
+        await collection.delete(ids=ids)
+
+    async def tune_collection(collection_name):
+        return 0
+
+    monkeypatch.setattr(CollectionVersions, 'resolve', resolve)
+    monkeypatch.setattr(ChromaDB, 'get_collection', get_collection)
+    monkeypatch.setattr(ChromaDB, 'upsert_documents', upsert_documents)
+    monkeypatch.setattr(ChromaDB, 'delete_documents', delete_documents)
+    monkeypatch.setattr(ChromaDB, 'tune_collection', tune_collection)
+    collection.writes = writes
+    return collection
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding='utf-8')
+
+
+def sources(collection):
+    return sorted({metadata['source'] for _, metadata in collection.records.values()})
+
+
+def test_sync_writes_only_new_chunks_and_deletes_stale_ones_in_the_folder(tmp_path, collection):
+    folder = tmp_path / 'knowledge_base'
+    write(folder / 'about.md', 'We build web shops.')
+    write(folder / 'team.md', 'Ada and Linus run the team.')
+    # a sibling folder ingested into the same collection, and a file removed from ours
+    sibling = str(tmp_path / 'knowledge_base_old' / 'legacy.md')
+    removed = str(folder / 'removed.md')
+    asyncio.run(collection.upsert(ids=['legacy', 'removed'], documents=['old', 'gone'],
+                                  metadatas=[{'source': sibling, 'chunk': 0}, {'source': removed, 'chunk': 0}]))
+    ingester = FolderIngester(str(folder), 'profile', batch_size=1)
+
+    stats = asyncio.run(ingester.sync())
+    assert stats == {'files': 2, 'chunks': 2, 'upserted': 2, 'deleted': 1}
+    assert collection.writes['deleted'] == ['removed']
+    assert sources(collection) == sorted([sibling, str(folder / 'about.md'), str(folder / 'team.md')])
+    # the stale scan reads the collection in pages, never all of it at once
+    scans = [get for get in collection.gets if get['ids'] is None]
+    assert scans and all(get['limit'] == 20 for get in scans)
+
+    # a second full pass finds everything in place
+    collection.writes.update(upserted=[], deleted=[])
+    assert asyncio.run(FolderIngester(str(folder), 'profile').sync())['upserted'] == 0
+    assert collection.writes == {'upserted': [], 'deleted': []}
+
+
+def test_sync_changes_touches_only_changed_files(tmp_path, collection):
+    folder = tmp_path / 'knowledge_base'
+    write(folder / 'about.md', 'We build web shops.')
+    write(folder / 'team.md', 'Ada and Linus run the team.')
+    ingester = FolderIngester(str(folder), 'profile')
+    asyncio.run(ingester.sync())
+    collection.writes.update(upserted=[], deleted=[])
+    old_about = ingester.file_ids[str(folder / 'about.md')]
+
+    write(folder / 'about.md', 'We build web shops and mobile apps.')
+    (folder / 'team.md').unlink()
+    write(folder / 'pricing.md', 'Projects start at 5k.')
+    stats = asyncio.run(ingester.sync_changes())
+
+    assert stats == {'changed_files': 2, 'removed_files': 1, 'upserted': 2, 'deleted': 2}
+    assert sorted(collection.writes['upserted']) == sorted([
+        chunk_id(str(folder / 'about.md'), 0, 'We build web shops and mobile apps.'),
+        chunk_id(str(folder / 'pricing.md'), 0, 'Projects start at 5k.')])
+    assert old_about[0] in collection.writes['deleted']
+    assert sources(collection) == sorted([str(folder / 'about.md'), str(folder / 'pricing.md')])
+
+    # nothing changed, nothing written
+    collection.writes.update(upserted=[], deleted=[])
+    assert asyncio.run(ingester.sync_changes())['upserted'] == 0
+    assert collection.writes == {'upserted': [], 'deleted': []}
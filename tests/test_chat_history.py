@@ -0,0 +1,101 @@
+import asyncio
+from collections import deque
+
+import pytest
+
+from databases.chat_history import ChatHistoryWriter
+from tests.stand_ins import InMemoryMongo
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    store = InMemoryMongo()
+    monkeypatch.setattr(ChatHistoryWriter, '_store', store)
+    monkeypatch.setattr(ChatHistoryWriter, '_buffer', deque())
+    monkeypatch.setattr(ChatHistoryWriter, '_stats',
+                        {'enqueued': 0, 'written': 0, 'flushes': 0, 'failed_flushes': 0, 'dropped': 0})
+    monkeypatch.setattr(ChatHistoryWriter, 'batch_size', 3)
+    monkeypatch.setattr(ChatHistoryWriter, 'flush_interval', 30)
+    monkeypatch.setattr(ChatHistoryWriter, 'max_messages', 4)
+    return store
+
+
+def messages(store, company_name):
+    return [message['query'] for message in store.find('q_n_a', company=company_name)['messages']]
+
+
+def test_flushes_full_batches_and_drains_on_stop(writer):
+    async def scenario():
+        await ChatHistoryWriter.start()
+        for i in range(7):
+            ChatHistoryWriter.enqueue('acme' if i % 2 else 'globex', f"q{i}", f"a{i}")
+        await asyncio.sleep(0.05)
+        # two full batches of 3 pairs went out without waiting for the interval
+        assert ChatHistoryWriter.stats()['written'] == 6
+        assert ChatHistoryWriter.stats()['buffered'] == 1
+        await ChatHistoryWriter.stop()
+
+    asyncio.run(scenario())
+    assert ChatHistoryWriter.stats()['written'] == 7
+    assert ChatHistoryWriter.stats()['flushes'] == 3
+    # one upsert per company and batch
+    assert writer.batches == [2, 2, 1]
+    assert messages(writer, 'acme') == ['q1', 'q3', 'q5']
+    assert messages(writer, 'globex') == ['q0', 'q2', 'q4', 'q6']
+
+
+def test_flushes_on_the_interval(writer, monkeypatch):
+    monkeypatch.setattr(ChatHistoryWriter, 'flush_interval', 0.05)
+
+    async def scenario():
+        await ChatHistoryWriter.start()
+        ChatHistoryWriter.enqueue('acme', 'hello', 'hi')
+        await asyncio.sleep(0.2)
+        written = ChatHistoryWriter.stats()['written']
+        await ChatHistoryWriter.stop()
+        return written
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_caps_the_messages_array(writer):
+    async def scenario():
+        for i in range(10):
+            ChatHistoryWriter.enqueue('acme', f"q{i}", f"a{i}")
+            await ChatHistoryWriter.flush()
+
+    asyncio.run(scenario())
+    assert messages(writer, 'acme') == ['q6', 'q7', 'q8', 'q9']
+
+
+def test_failed_write_is_retried_in_order(writer):
+    writer.fail_next = 1
+
+    async def scenario():
+        for i in range(3):
+            ChatHistoryWriter.enqueue('acme', f"q{i}", f"a{i}")
+        assert not await ChatHistoryWriter.flush()
+        assert await ChatHistoryWriter.flush()
+
+    asyncio.run(scenario())
+    assert ChatHistoryWriter.stats()['failed_flushes'] == 1
+    assert messages(writer, 'acme') == ['q0', 'q1', 'q2']
+
+
+def test_partial_failure_retries_only_the_failed_companies(writer):
+    writer.fail_companies = {'acme'}
+
+    async def scenario():
+        for company_name in ('acme', 'globex', 'acme'):
+            ChatHistoryWriter.enqueue(company_name, f"{company_name} question", 'answer')
+        # partly failed: globex is stored, both acme pairs wait for the retry
+        assert not await ChatHistoryWriter.flush()
+        assert ChatHistoryWriter.stats()['buffered'] == 2
+        assert await ChatHistoryWriter.flush()
+
+    asyncio.run(scenario())
+    # globex was stored by the first write and is not pushed again
+    assert messages(writer, 'globex') == ['globex question']
+    assert messages(writer, 'acme') == ['acme question', 'acme question']
+    assert ChatHistoryWriter.stats()['written'] == 3
+    assert writer.batches == [2, 1]
@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+import pytest
+from starlette.requests import Request
+
+from api.v1 import chat
+from databases.chat_history import ChatHistoryWriter
+from schemas.schemas import QueryData
+from utils.langchain import context_packer, retriver
+from utils.rate_limit import RateLimiter
+from tests.stand_ins import StreamingChatModel
+
+# the model writes the JSON answer the prompt asks for, an escape split across two chunks
+CHUNKS = ['{"resp', 'onse": "', 'We ship ', 'to 40 ', 'countries.\\', 'nAsk ', 'us!"', '}']
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    model = StreamingChatModel(chunks=CHUNKS)
+    # the tiktoken encodings are downloaded on first use, count with the offline estimate
+    monkeypatch.setattr(context_packer, 'get_tokenizer', lambda model=None: None)
+    monkeypatch.setattr(retriver, 'build_llm', lambda streaming=False: model)
+    return model
+
+
+async def collect(stream, llm) -> list[tuple[str, bool]]:
+    # every piece together with whether the model had already finished when it arrived
+    return [(piece, llm.completed) async for piece in stream]
+
+
+def test_answer_is_forwarded_while_the_model_generates(llm):
+    pieces = asyncio.run(collect(retriver.gpt_response_stream(context=[], company_name='acme',
+                                                              query='Where do you ship?'), llm))
+
+    assert ''.join(piece for piece, _ in pieces) == 'We ship to 40 countries.\nAsk us!'
+    assert len(pieces) > 1
+    assert not any(completed for _, completed in pieces[:-1])
+
+
+def test_stream_route_sends_events_before_completion(llm, monkeypatch):
+    enqueued = []
+
+    async def embed_texts(texts, model_name=None):
+        return [[0.0] * 4 for _ in texts]
+
+    async def query_chunks(alias, query_text, query_embedding, n_results):
+        return [{'context': 'Shipping to 40 countries', 'metadata': {'url': 'https://acme.test/shipping'}}]
+
+    monkeypatch.setattr(RateLimiter, 'enabled', False)
+    monkeypatch.setattr(chat.ChromaDB, 'embed_texts', embed_texts)
+    monkeypatch.setattr(chat.CollectionVersions, 'query_chunks', query_chunks)
+    monkeypatch.setattr(ChatHistoryWriter, 'is_running', classmethod(lambda cls: True))
+    monkeypatch.setattr(ChatHistoryWriter, 'enqueue', classmethod(lambda cls, *pair: enqueued.append(pair)))
+
+    async def scenario():
+        request = Request({'type': 'http', 'method': 'POST', 'path': '/api/v1/qns-ans/stream', 'headers': [],
+                           'client': ('10.0.0.1', 5000)})
+        response = await chat.chat_with_llm_stream(QueryData(query='Where do you ship?', company_name='acme'),
+                                                   request)
+        return await collect(response.body_iterator, llm)
+
+    events = asyncio.run(scenario())
+
+    deltas = [(json.loads(event.split('data: ', 1)[1]), completed) for event, completed in events
+              if not event.startswith('event: done')]
+    assert events[-1][0].startswith('event: done')
+    assert ''.join(data['delta'] for data, _ in deltas) == 'We ship to 40 countries.\nAsk us!'
+    # the first words reach the client while the model is still writing the rest
+    assert not deltas[0][1]
+    assert enqueued == [('acme', 'Where do you ship?', 'We ship to 40 countries.\nAsk us!')]
@@ -0,0 +1,25 @@
+import asyncio
+
+from databases.collection_versions import CollectionVersions
+from knowledge_base import crawl_archive, scrapper
+from utils.utility import chunk_id, chunk_ids
+
+
+def test_chunk_ids_number_chunks_per_source():
+    ids = chunk_ids(['a', 'b', 'c', 'd'], [{'url': 'https://acme.test/'}, {'url': 'https://acme.test/about'},
+                                           {'url': 'https://acme.test/'}, {'source': 'knowledge_base/x.md'}])
+    assert ids == [chunk_id('https://acme.test/', 0, 'a'), chunk_id('https://acme.test/about', 0, 'b'),
+                   chunk_id('https://acme.test/', 1, 'c'), chunk_id('knowledge_base/x.md', 0, 'd')]
+
+
+def test_archive_reindex_keeps_the_ingester_ids(tmp_path, monkeypatch):
+    pages = [{'url': 'https://acme.test/', 'text': 'Welcome to Acme.'},
+             {'url': 'https://acme.test/about', 'text': 'Ada and Linus run Acme.'}]
+    monkeypatch.setattr(crawl_archive.CrawlArchives, 'latest', classmethod(lambda cls, alias: str(tmp_path)))
+    monkeypatch.setattr(scrapper, 'replay_archive',
+                        lambda path, structured, workers: {'pages': list(pages), 'external_urls': []})
+
+    ids, documents, metadatas, _ = asyncio.run(CollectionVersions._archived_chunks('acme'))
+    assert ids == chunk_ids(documents, metadatas)
+    assert ids[0] == chunk_id('https://acme.test/', 0, 'Welcome to Acme.')
+    assert len(set(ids)) == len(ids)
@@ -0,0 +1,32 @@
+import pytest
+
+from databases.compact_vectors import CompactVectors
+
+
+@pytest.fixture
+def compact(monkeypatch):
+    monkeypatch.setattr(CompactVectors, 'enabled', True)
+    monkeypatch.setattr(CompactVectors, 'min_chunks', 1000)
+    monkeypatch.setattr(CompactVectors, 'dimension', 128)
+    return CompactVectors
+
+
+@pytest.mark.parametrize('space', ['l2', 'ip'])
+def test_only_cosine_collections_are_compacted(compact, monkeypatch, space):
+    monkeypatch.setattr(CompactVectors, 'space', 'cosine')
+    assert CompactVectors.collection_metadata(5000) == {'compact_dim': 128}
+    assert CompactVectors.collection_metadata(500) is None
+
+    # 1 - distance is no similarity there, the rescore fallback would rank and filter wrongly
+    monkeypatch.setattr(CompactVectors, 'space', space)
+    assert CompactVectors.collection_metadata(5000) is None
+
+
+def test_rescore_falls_back_to_the_cosine_distance(compact, tmp_path, monkeypatch):
+    monkeypatch.setattr(CompactVectors, 'directory', str(tmp_path))
+    monkeypatch.setattr(CompactVectors, '_stores', {})
+    results = {'ids': [['a', 'b']], 'distances': [[0.1, 0.5]], 'documents': [['near', 'far']],
+               'metadatas': [[{'url': 'a'}, {'url': 'b'}]]}
+    # neither id is in the side store, the reduced-space distances decide
+    chunks = CompactVectors.rescore('acme', [1.0, 0.0], results, n_results=2, min_similarity=0.7)
+    assert chunks == [{'context': 'near', 'metadata': {'url': 'a'}}]
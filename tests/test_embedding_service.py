@@ -0,0 +1,61 @@
+import asyncio
+import os
+import tempfile
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip('chromadb')
+
+from utils import embedding_service
+from utils.embedding_service import EmbeddingServer, RemoteEmbeddingFunction
+
+
+class LengthEmbeddingFunction:
+    """Stand-in for SentenceTransformerEmbeddingFunction: embeds a text as [len, 1]"""
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def __call__(self, texts):
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+@pytest.fixture
+def socket_path(monkeypatch):
+    monkeypatch.setattr(embedding_service, 'SentenceTransformerEmbeddingFunction', LengthEmbeddingFunction)
+    path = os.path.join(tempfile.mkdtemp(), 'embeddings.sock')
+    loop = asyncio.new_event_loop()
+    server = EmbeddingServer('model-a', max_wait_ms=1)
+    task = loop.create_task(server.serve(path))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    while not os.path.exists(path):
+        threading.Event().wait(0.01)
+    yield path
+
+    async def shutdown():
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run_coroutine_threadsafe(shutdown(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def test_serves_the_model_it_loaded(socket_path):
+    embed = RemoteEmbeddingFunction(socket_path, model_name='model-a')
+    vectors = embed(['ab', 'abcd'])
+    embed._close()
+    assert np.array_equal(np.asarray(vectors), [[2.0, 1.0], [4.0, 1.0]])
+
+
+def test_refuses_another_model(socket_path):
+    embed = RemoteEmbeddingFunction(socket_path, model_name='model-b')
+    with pytest.raises(RuntimeError, match='serves model-a, not model-b'):
+        embed(['ab'])
+    # a refused request does not break the connection
+    with pytest.raises(RuntimeError, match='serves model-a'):
+        embed(['abc'])
+    embed._close()
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from benchmarks.import_time import LAZY_PACKAGES, check, import_once, profile
+
+
+def test_heavy_packages_are_not_imported_at_startup():
+    probe, _ = import_once('main')
+    assert [name for name in LAZY_PACKAGES if name in probe['modules']] == []
+
+
+@pytest.mark.skipif(os.getenv('COLD_START_TIMING', 'false').lower() != 'true',
+                    reason='wall clock gate, set COLD_START_TIMING=true on a quiet machine')
+def test_import_main_meets_the_cold_start_target():
+    report = profile('main', runs=3, top=10)
+    assert check(report, float(os.getenv('COLD_START_MAX_SECONDS', 1.5))) == [], report
+
+
+def test_check_reports_slow_imports_and_eager_packages():
+    # the gate itself, against a report that misses both targets
+    report = {'median_seconds': 2.0, 'lazy_packages_imported': ['chromadb']}
+    assert check(report, 1.5) == ['median import time 2.0s is above 1.5s', 'imported at startup: chromadb']
+    assert check({'median_seconds': 0.5, 'lazy_packages_imported': []}, 1.5) == []
+
+
+def test_probe_sees_a_lazy_package_when_it_is_imported():
+    pytest.importorskip('bs4')
+    probe, _ = import_once('json, bs4')
+    assert 'bs4' in probe['modules'] and 'bs4' in LAZY_PACKAGES
@@ -0,0 +1,65 @@
+"""
+pytest-benchmark versions of benchmarks/micro_ingestion.py, over the same
+generated corpus. Save a baseline and compare against it with
+
+    python -m pytest tests/test_micro_ingestion.py --benchmark-autosave
+    python -m pytest tests/test_micro_ingestion.py --benchmark-compare --benchmark-compare-fail=median:10%
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from benchmarks.micro_ingestion import BASE_URL, load_corpus
+from knowledge_base.scrapper import URLExtractor, WebScraper
+from utils.utility import docs_splitting
+
+CORPUS = load_corpus()
+SIZES = list(CORPUS)
+FILTERS = {'internal_only': True, 'exclude_common_files': True}
+
+scraper, extractor = WebScraper(), URLExtractor()
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_extract_text_from_html(benchmark, size):
+    texts = benchmark(lambda: [scraper.extract_text_from_html(page) for page in CORPUS[size]])
+    assert all(texts)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_extract_structured_data(benchmark, size):
+    pages = benchmark(lambda: [scraper.extract_structured_data(page) for page in CORPUS[size]])
+    assert all(page['sections'] for page in pages)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_extract_urls_from_html(benchmark, size):
+    urls = benchmark(lambda: [extractor.extract_urls_from_html(page, BASE_URL) for page in CORPUS[size]])
+    assert all(urls)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_apply_filters(benchmark, size):
+    urls = [extractor.extract_urls_from_html(page, BASE_URL) for page in CORPUS[size]]
+    filtered = benchmark(lambda: [extractor._apply_filters(page_urls, FILTERS) for page_urls in urls])
+    # only links of the site itself are kept
+    assert all(link['is_internal'] for page_urls in filtered for link in page_urls)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_docs_splitting(benchmark, size):
+    web_data = [{'text': scraper.extract_text_from_html(page), 'url': f"{BASE_URL}page-{i}"}
+                for i, page in enumerate(CORPUS[size])]
+    # docs_splitting appends the external links entry to its input, so pass a fresh list
+    chunks = benchmark(lambda: asyncio.run(docs_splitting(list(web_data), [])))
+    assert len(chunks) >= len(web_data)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_docs_splitting_sections(benchmark, size):
+    structured = [{'data': scraper.extract_structured_data(page), 'url': f"{BASE_URL}page-{i}"}
+                  for i, page in enumerate(CORPUS[size])]
+    chunks = benchmark(lambda: asyncio.run(docs_splitting(list(structured), [])))
+    assert len(chunks) >= len(structured)
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from utils.rate_limit import Limit, MemoryBackend, RateLimiter, parse_limit
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    monkeypatch.setattr(RateLimiter, 'enabled', True)
+    monkeypatch.setattr(RateLimiter, '_backend', MemoryBackend())
+    monkeypatch.setattr(RateLimiter, '_limits', {})
+    monkeypatch.setattr(RateLimiter, '_usage', {})
+    monkeypatch.setenv('RATE_LIMIT_QNS_ANS_CLIENT', '1/h,2')
+    monkeypatch.setenv('RATE_LIMIT_QNS_ANS_TENANT', '1000/s')
+    return RateLimiter
+
+
+def test_parse_limit():
+    assert parse_limit('2/s,20') == Limit(2.0, 20.0)
+    assert parse_limit('30/m') == Limit(0.5, 30.0)
+    assert parse_limit('1/10m,2') == Limit(1 / 600, 2.0)
+
+
+@pytest.mark.parametrize('value', ['0/s', '0.0/m,5', '1/0s', '2/s,0', 'ten/s'])
+def test_parse_limit_refuses_limits_that_never_refill(value):
+    with pytest.raises(ValueError):
+        parse_limit(value)
+
+
+def test_clients_share_nothing_by_default(limiter, monkeypatch):
+    # behind a proxy every visitor arrives from the same address
+    monkeypatch.setattr(RateLimiter, 'per_client', False)
+
+    async def scenario():
+        return [await RateLimiter.check('qns_ans', 'acme', '10.0.0.1') for _ in range(5)]
+
+    assert asyncio.run(scenario()) == [0.0] * 5
+    assert 'client' not in RateLimiter.limits('qns_ans')
+
+
+def test_per_client_limit_when_opted_in(limiter, monkeypatch):
+    monkeypatch.setattr(RateLimiter, 'per_client', True)
+
+    async def scenario():
+        waits = [await RateLimiter.check('qns_ans', 'acme', '10.0.0.1') for _ in range(3)]
+        return waits, await RateLimiter.check('qns_ans', 'acme', '10.0.0.2')
+
+    waits, other_client = asyncio.run(scenario())
+    assert waits[:2] == [0.0, 0.0] and waits[2] > 0
+    assert other_client == 0.0
@@ -0,0 +1,28 @@
+import asyncio
+
+from utils.single_flight import SingleFlight
+
+
+def test_make_key_normalizes_only_the_query():
+    assert SingleFlight.make_key('acme', '  What do   you SELL? ') == ('acme', 'what do you sell')
+    # collection names are case sensitive, these are two tenants
+    assert SingleFlight.make_key('Acme', 'hi') != SingleFlight.make_key('acme', 'hi')
+    assert SingleFlight.make_key(' acme', 'hi') != SingleFlight.make_key('acme', 'hi')
+
+
+def test_duplicates_share_one_call():
+    calls = []
+
+    async def answer(company_name, query):
+        calls.append((company_name, query))
+        await asyncio.sleep(0.01)
+        return f"{company_name}: {query}"
+
+    async def scenario():
+        keys = [SingleFlight.make_key(company, query) for company, query in
+                [('acme', 'Pricing?'), ('acme', 'pricing'), ('Acme', 'pricing')]]
+        return await asyncio.gather(*[SingleFlight.do(key, answer, *key) for key in keys])
+
+    answers = asyncio.run(scenario())
+    assert answers == ['acme: pricing', 'acme: pricing', 'Acme: pricing']
+    assert calls == [('acme', 'pricing'), ('Acme', 'pricing')]
@@ -0,0 +1,60 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from utils.small_talk import SmallTalk
+
+
+@pytest.fixture
+def small_talk(monkeypatch):
+    monkeypatch.setattr(SmallTalk, 'enabled', True)
+    monkeypatch.setattr(SmallTalk, 'similarity', 0.8)
+    monkeypatch.setattr(SmallTalk, '_prototype_matrix', None)
+    monkeypatch.setattr(SmallTalk, '_prototype_intents', [])
+    return SmallTalk
+
+
+def test_match_pattern(small_talk):
+    assert SmallTalk.match_pattern('Hello there!') == 'greeting'
+    assert SmallTalk.match_pattern('thanks a lot') == 'thanks'
+    assert SmallTalk.match_pattern('pricing?') is None
+    assert SmallTalk.match_pattern('hi, what does the premium plan cost per month for a team') is None
+
+
+def test_disabled_matches_nothing(small_talk, monkeypatch):
+    SmallTalk._prototype_matrix = np.eye(2, dtype=np.float32)
+    SmallTalk._prototype_intents = ['greeting', 'thanks']
+    assert SmallTalk.match_embedding('hey', [1.0, 0.0]) == 'greeting'
+
+    monkeypatch.setattr(SmallTalk, 'enabled', False)
+    assert SmallTalk.match_pattern('hello') is None
+    assert SmallTalk.match_embedding('hey', [1.0, 0.0]) is None
+
+
+@pytest.fixture
+def embed_texts(small_talk):
+    """
+    Embeddings of the real EMBEDDING_MODEL, the threshold is only meaningful for it
+    """
+    pytest.importorskip('sentence_transformers')
+    from databases.chromaDB import ChromaDB
+
+    try:
+        ChromaDB.get_embedding_function()
+    except Exception as e:
+        pytest.skip(f"embedding model not available: {e}")
+    asyncio.run(SmallTalk.load_prototypes(ChromaDB.embed_texts))
+    return lambda text: asyncio.run(ChromaDB.embed_texts([text]))[0]
+
+
+@pytest.mark.parametrize('question', ['pricing?', 'do you ship abroad?', 'opening hours', 'contact email',
+                                      'refund policy'])
+def test_short_questions_pass_the_prototype_threshold(embed_texts, question):
+    assert SmallTalk.match_embedding(question, embed_texts(question)) is None
+
+
+@pytest.mark.parametrize('message, intent', [('hello there!', 'greeting'),
+                                             ('thanks for the help!', 'thanks')])
+def test_small_talk_reaches_the_prototype_threshold(embed_texts, message, intent):
+    assert SmallTalk.match_embedding(message, embed_texts(message)) == intent
@@ -0,0 +1,30 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# one worker: count a query and merge it into tenants.json, over and over
+WORKER = """
+import asyncio
+from databases.tenants import TenantRegistry
+
+async def main():
+    for _ in range({saves}):
+        TenantRegistry._count('acme', 'queries')
+        await TenantRegistry.save()
+
+asyncio.run(main())
+"""
+
+
+def test_concurrent_saves_keep_every_count(tmp_path):
+    workers, saves = 4, 40
+    env = {**os.environ, 'SNAPSHOT_DIR': str(tmp_path)}
+    processes = [subprocess.Popen([sys.executable, '-c', WORKER.format(saves=saves)], cwd=ROOT, env=env)
+                 for _ in range(workers)]
+    assert [process.wait(timeout=120) for process in processes] == [0] * workers
+
+    with open(tmp_path / 'tenants.json', encoding='utf-8') as f:
+        assert json.load(f)['acme']['queries'] == workers * saves
@@ -0,0 +1,105 @@
+import os
+import time
+from collections import OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+
+class AnswerCache:
+    """
+    Per company semantic cache of LLM answers keyed by the query embedding.
+
+    A lookup returns the stored answer of the most similar cached query when its
+    cosine similarity is above ANSWER_CACHE_SIMILARITY. Each company keeps at most
+    ANSWER_CACHE_SIZE entries (least recently used are evicted first) and entries
+    expire after ANSWER_CACHE_TTL seconds.
+    """
+    similarity = float(os.getenv('ANSWER_CACHE_SIMILARITY', 0.95))
+    max_entries = int(os.getenv('ANSWER_CACHE_SIZE', 256))
+    ttl = float(os.getenv('ANSWER_CACHE_TTL', 3600))
+    enabled = os.getenv('ANSWER_CACHE_ENABLED', 'true').lower() == 'true'
+
+    # company_name -> OrderedDict[query -> (unit embedding, answer, stored_at)]
+    _entries: dict[str, OrderedDict] = {}
+    _stats: dict[str, dict] = {}
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @classmethod
+    def _count(cls, company_name: str, key: str) -> None:
+        stats = cls._stats.setdefault(company_name, {'hits': 0, 'misses': 0, 'invalidations': 0})
+        stats[key] += 1
+
+    @classmethod
+    def get(cls, company_name: str, embedding) -> str | None:
+        """
+        Return the cached answer for the closest query of the company, or None on a miss
+        """
+        if not cls.enabled:
+            return None
+        entries = cls._entries.get(company_name)
+        if not entries:
+            cls._count(company_name, 'misses')
+            return None
+
+        now = time.monotonic()
+        for key in [k for k, (_, _, stored_at) in entries.items() if now - stored_at > cls.ttl]:
+            del entries[key]
+
+        best_key, best_score = None, -1.0
+        if entries:
+            keys = list(entries.keys())
+            matrix = np.stack([entries[k][0] for k in keys])
+            scores = matrix @ cls._normalize(embedding)
+            index = int(np.argmax(scores))
+            best_key, best_score = keys[index], float(scores[index])
+
+        if best_key is None or best_score < cls.similarity:
+            cls._count(company_name, 'misses')
+            return None
+
+        entries.move_to_end(best_key)
+        cls._count(company_name, 'hits')
+        return entries[best_key][1]
+
+    @classmethod
+    def put(cls, company_name: str, query: str, embedding, answer: str) -> None:
+        if not cls.enabled:
+            return
+        entries = cls._entries.setdefault(company_name, OrderedDict())
+        entries[query] = (cls._normalize(embedding), answer, time.monotonic())
+        entries.move_to_end(query)
+        while len(entries) > cls.max_entries:
+            entries.popitem(last=False)
+
+    @classmethod
+    def invalidate(cls, company_name: str) -> None:
+        """
+        Drop every cached answer of a company, e.g. after its collection was re-ingested
+        """
+        if cls._entries.pop(company_name, None) is not None:
+            cls._count(company_name, 'invalidations')
+
+    @classmethod
+    def stats(cls) -> dict:
+        companies = {}
+        for company_name, stats in cls._stats.items():
+            lookups = stats['hits'] + stats['misses']
+            companies[company_name] = {
+                **stats,
+                'entries': len(cls._entries.get(company_name, ())),
+                'hit_ratio': round(stats['hits'] / lookups, 4) if lookups else 0.0
+            }
+        return {
+            'hits': sum(s['hits'] for s in cls._stats.values()),
+            'misses': sum(s['misses'] for s in cls._stats.values()),
+            'companies': companies
+        }
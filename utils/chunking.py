@@ -0,0 +1,135 @@
+import os
+import re
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+from databases.chromaDB import EMBEDDING_MODEL
+
+
+load_dotenv()
+
+# all-mpnet-base-v2 truncates its input at 384 tokens, leave room for the heading line
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 256))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 32))
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+@lru_cache(maxsize=2)
+def get_embedding_tokenizer(model: str = EMBEDDING_MODEL):
+    """
+    Tokenizer of the embedding model, None when transformers or the model files
+    are not available
+    """
+    try:
+        from transformers import AutoTokenizer
+    except ImportError:
+        return None
+    try:
+        return AutoTokenizer.from_pretrained(model)
+    except (OSError, ValueError):
+        return None
+
+
+def count_embedding_tokens(text: str) -> int:
+    tokenizer = get_embedding_tokenizer()
+    if tokenizer is None:
+        # rough estimate, word pieces per word for English text
+        return max(1, int(len(text.split()) * 1.3))
+    return len(tokenizer.encode(text, add_special_tokens=False))
+
+
+def _pieces(text: str, max_tokens: int) -> list[tuple[str, int]]:
+    """
+    Sentences of text with their token counts, sentences longer than
+    max_tokens are cut into word windows
+    """
+    pieces = []
+    for sentence in _SENTENCE_END.split(text):
+        tokens = count_embedding_tokens(sentence)
+        if tokens <= max_tokens:
+            pieces.append((sentence, tokens))
+            continue
+        words = sentence.split()
+        step = max(1, len(words) * max_tokens // tokens)
+        for start in range(0, len(words), step):
+            window = ' '.join(words[start:start + step])
+            pieces.append((window, count_embedding_tokens(window)))
+    return pieces
+
+
+def split_section(text: str, max_tokens: int, overlap_tokens: int) -> list[str]:
+    """
+    Pack the sentences of one section into windows of at most max_tokens,
+    neighbouring windows share up to overlap_tokens of whole sentences
+    """
+    windows = []
+    current, size = [], 0
+    for sentence, tokens in _pieces(text, max_tokens):
+        if current and size + tokens > max_tokens:
+            windows.append(' '.join(piece for piece, _ in current))
+            # carry the last sentences over as overlap
+            carried, carried_size = [], 0
+            for piece in reversed(current):
+                if carried_size + piece[1] > overlap_tokens or carried_size + piece[1] + tokens > max_tokens:
+                    break
+                carried.insert(0, piece)
+                carried_size += piece[1]
+            current, size = carried, carried_size
+        current.append((sentence, tokens))
+        size += tokens
+    if current:
+        windows.append(' '.join(piece for piece, _ in current))
+    return windows
+
+
+def chunk_sections(sections: list[dict], max_tokens: int = CHUNK_MAX_TOKENS,
+                   overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> list[dict]:
+    """
+    Section-bounded chunks of one page.
+
+    Consecutive small sections are packed into one chunk while they fit in
+    max_tokens, a section larger than that is split at sentence boundaries.
+    A chunk never ends in the middle of a section unless the section itself is
+    too large. Every section starts with its heading path, so the chunk text
+    carries the context the heading gives.
+
+    Args:
+        sections: [{'headings': [...], 'text': str}] from WebScraper.extract_sections
+
+    Returns:
+        [{'text': chunk text, 'headings': 'h1 > h2 > ...' of the first section}]
+    """
+    chunks = []
+    packed, packed_size, packed_headings = [], 0, ''
+
+    def flush():
+        nonlocal packed, packed_size
+        if packed:
+            chunks.append({'text': '\n\n'.join(packed), 'headings': packed_headings})
+        packed, packed_size = [], 0
+
+    for section in sections:
+        headings = ' > '.join(section.get('headings') or [])
+        body = section.get('text') or ''
+        if not body.strip():
+            continue
+        text = f"{headings}\n{body}" if headings else body
+        tokens = count_embedding_tokens(text)
+
+        if tokens > max_tokens:
+            flush()
+            heading_tokens = count_embedding_tokens(headings) if headings else 0
+            for window in split_section(body, max(max_tokens - heading_tokens, overlap_tokens + 1), overlap_tokens):
+                chunks.append({'text': f"{headings}\n{window}" if headings else window, 'headings': headings})
+            continue
+
+        if packed and packed_size + tokens > max_tokens:
+            flush()
+        if not packed:
+            packed_headings = headings
+        packed.append(text)
+        packed_size += tokens
+    flush()
+    return chunks
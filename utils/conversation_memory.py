@@ -0,0 +1,155 @@
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from utils.langchain.context_packer import count_tokens
+from utils.langchain.retriver import summarize_conversation, condense_query
+from utils.logger import Logger
+
+
+load_dotenv()
+
+FOLLOW_UP_PATTERN = re.compile(r"\b(it|its|that|this|those|these|they|them|their|more|also|else|same|above|one|ones)\b",
+                               re.IGNORECASE)
+
+
+class ConversationMemory:
+    """
+    Session scoped chat history with a fixed token window.
+
+    Recent turns are kept verbatim up to SESSION_HISTORY_TOKENS; older turns are
+    folded into a rolling summary in the background so the prompt stays bounded
+    however long the chat runs. Sessions live in an in-process LRU
+    (SESSION_CACHE_SIZE, SESSION_TTL) and, when SESSION_STORE_MONGO is set and
+    Mongo is connected, are also saved to the SESSION_COLLECTION collection.
+    """
+    window_tokens = int(os.getenv('SESSION_HISTORY_TOKENS', 600))
+    max_sessions = int(os.getenv('SESSION_CACHE_SIZE', 10000))
+    ttl = float(os.getenv('SESSION_TTL', 1800))
+    llm_condense = os.getenv('SESSION_LLM_CONDENSE', 'false').lower() == 'true'
+    use_mongo = os.getenv('SESSION_STORE_MONGO', 'false').lower() == 'true'
+    collection_name = os.getenv('SESSION_COLLECTION', 'chat_sessions')
+
+    _sessions: OrderedDict = OrderedDict()
+    _summarizing: set = set()
+    _background: set = set()
+
+    @classmethod
+    def _mongo(cls):
+        if not cls.use_mongo:
+            return None
+        from databases.mongoDB import MongoMotor
+        return MongoMotor if MongoMotor.db is not None else None
+
+    @classmethod
+    def _spawn(cls, coro) -> None:
+        task = asyncio.create_task(coro)
+        cls._background.add(task)
+        task.add_done_callback(cls._background.discard)
+
+    @classmethod
+    async def get(cls, session_id: str, company_name: str) -> dict:
+        session = cls._sessions.get(session_id)
+        if session is not None and time.monotonic() - session['touched_at'] > cls.ttl:
+            session = None
+        if session is None and cls._mongo() is not None:
+            try:
+                stored = await cls._mongo().find_one(cls.collection_name, {'session_id': session_id},
+                                                     {'_id': 0, 'summary': 1, 'turns': 1, 'company_name': 1})
+                if stored:
+                    session = {'session_id': session_id, 'company_name': stored.get('company_name', company_name),
+                               'summary': stored.get('summary', ''), 'turns': stored.get('turns', [])}
+            except Exception as e:
+                await Logger.error_log(__name__, 'get', e)
+        if session is None or session.get('company_name') != company_name:
+            session = {'session_id': session_id, 'company_name': company_name, 'summary': '', 'turns': []}
+
+        session['touched_at'] = time.monotonic()
+        cls._sessions[session_id] = session
+        cls._sessions.move_to_end(session_id)
+        while len(cls._sessions) > cls.max_sessions:
+            cls._sessions.popitem(last=False)
+        return session
+
+    @staticmethod
+    def history_text(session: dict) -> str:
+        lines = []
+        if session.get('summary'):
+            lines.append(f"Summary: {session['summary']}")
+        for turn in session.get('turns', []):
+            lines.append(f"User: {turn['query']}")
+            lines.append(f"Assistant: {turn['response']}")
+        return "\n".join(lines)
+
+    @classmethod
+    async def standalone_query(cls, session: dict, query: str) -> str:
+        """
+        Query used for retrieval: follow-ups get the missing context of the previous question
+        """
+        if not session.get('turns'):
+            return query
+        if cls.llm_condense:
+            try:
+                return await condense_query(cls.history_text(session), query)
+            except Exception as e:
+                await Logger.error_log(__name__, 'standalone_query', e)
+        if len(query.split()) <= 4 or FOLLOW_UP_PATTERN.search(query):
+            return f"{session['turns'][-1]['query']} {query}"
+        return query
+
+    @classmethod
+    def add_turn(cls, session: dict, query: str, response: str) -> None:
+        session['turns'].append({'query': query, 'response': response})
+
+        overflow = []
+        while len(session['turns']) > 1 and \
+                sum(count_tokens(t['query']) + count_tokens(t['response']) for t in session['turns']) > cls.window_tokens:
+            overflow.append(session['turns'].pop(0))
+
+        if overflow:
+            cls._spawn(cls._summarize(session, overflow))
+        elif cls._mongo() is not None:
+            cls._spawn(cls._save(session))
+
+    @classmethod
+    async def _summarize(cls, session: dict, turns: list[dict]) -> None:
+        session_id = session['session_id']
+        # one summary at a time per session, later overflow is merged into a pending one
+        session.setdefault('pending', []).extend(turns)
+        if session_id in cls._summarizing:
+            return
+        cls._summarizing.add(session_id)
+        try:
+            while session['pending']:
+                pending, session['pending'] = session['pending'], []
+                try:
+                    session['summary'] = await summarize_conversation(session['summary'], pending)
+                except Exception as e:
+                    await Logger.error_log(__name__, '_summarize', e)
+                    # keep the questions at least, trimmed to the window
+                    asked = "; ".join(turn['query'] for turn in pending)
+                    session['summary'] = f"{session['summary']} Earlier the user asked: {asked}".strip()[-cls.window_tokens * 2:]
+            await cls._save(session)
+        finally:
+            cls._summarizing.discard(session_id)
+
+    @classmethod
+    async def _save(cls, session: dict) -> None:
+        mongo = cls._mongo()
+        if mongo is None:
+            return
+        try:
+            await mongo.update_one(cls.collection_name, {'session_id': session['session_id']},
+                                   {'session_id': session['session_id'], 'company_name': session['company_name'],
+                                    'summary': session['summary'], 'turns': session['turns']},
+                                   upsert=True)
+        except Exception as e:
+            await Logger.error_log(__name__, '_save', e)
+
+    @classmethod
+    def stats(cls) -> dict:
+        return {'sessions': len(cls._sessions), 'summarizing': len(cls._summarizing)}
@@ -0,0 +1,198 @@
+"""
+Shared embedding model server.
+
+Loads the sentence-transformers model once and serves embeddings over a Unix
+socket, so every uvicorn worker can use it through RemoteEmbeddingFunction
+instead of loading its own copy of torch and the model. Requests arriving from
+all workers are batched together (up to --max-batch texts or --max-wait-ms).
+
+    python -m utils.embedding_service --socket /tmp/hipster-embeddings.sock
+    EMBEDDING_SERVICE_SOCKET=/tmp/hipster-embeddings.sock uvicorn main:app --workers 8
+
+Wire format, both directions: 4 byte big endian header length, JSON header, then
+the payload. Requests carry {"model": "...", "texts": [...]} and no payload;
+responses carry {"shape": [n, dim]} followed by n * dim float32 values, or
+{"error": "..."}. The service only answers requests for the model it loaded.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+
+
+DEFAULT_MODEL = "sentence-transformers/all-mpnet-base-v2"
+_HEADER = struct.Struct('>I')
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('embedding service closed the connection')
+        data.extend(chunk)
+    return bytes(data)
+
+
+class RemoteEmbeddingFunction(SentenceTransformerEmbeddingFunction):
+    """
+    Drop-in replacement for SentenceTransformerEmbeddingFunction that sends the
+    texts to the shared embedding service. It reports the same name and config,
+    so collections look the same whichever embedding function created them.
+    """
+    def __init__(self, socket_path: str, model_name: str = DEFAULT_MODEL, timeout: float = 60):
+        # the parent __init__ would load the model, which is exactly what this avoids
+        self.model_name = model_name
+        self.device = 'cpu'
+        self.normalize_embeddings = False
+        self.kwargs = {}
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self) -> None:
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _request(self, texts: list[str]) -> np.ndarray:
+        # the service refuses other models, vectors of another model would not match the collection
+        header = json.dumps({'model': self.model_name, 'texts': texts}).encode('utf-8')
+        sock = self._connection()
+        sock.sendall(_HEADER.pack(len(header)) + header)
+        (length,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+        response = json.loads(_recv_exact(sock, length))
+        if 'error' in response:
+            raise RuntimeError(f"embedding service error: {response['error']}")
+        rows, dim = response['shape']
+        return np.frombuffer(_recv_exact(sock, rows * dim * 4), dtype=np.float32).reshape(rows, dim)
+
+    def __call__(self, input):
+        texts = list(input)
+        if not texts:
+            return []
+        try:
+            vectors = self._request(texts)
+        except (ConnectionError, OSError):
+            # stale connection (service restarted), retry once on a fresh one
+            self._close()
+            vectors = self._request(texts)
+        return [vector for vector in vectors]
+
+
+class EmbeddingServer:
+    def __init__(self, model_name: str, max_batch: int = 64, max_wait_ms: float = 5):
+        self.model_name = model_name
+        self.embedding_function = SentenceTransformerEmbeddingFunction(model_name=model_name)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue: asyncio.Queue = asyncio.Queue()
+        # one thread: torch already parallelises a batch internally
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.stats = {'requests': 0, 'texts': 0, 'batches': 0, 'rejected': 0}
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        return np.asarray(self.embedding_function(texts), dtype=np.float32)
+
+    async def batcher(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            size = len(items[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                items.append(item)
+                size += len(item[0])
+
+            texts = [text for item_texts, _ in items for text in item_texts]
+            try:
+                vectors = await loop.run_in_executor(self.executor, self._encode, texts)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.stats['batches'] += 1
+            offset = 0
+            for item_texts, future in items:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    (length,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                    request = json.loads(await reader.readexactly(length))
+                except asyncio.IncompleteReadError:
+                    break
+                if request.get('model') != self.model_name:
+                    self.stats['rejected'] += 1
+                    header = json.dumps({'error': f"service serves {self.model_name}, "
+                                                  f"not {request.get('model')}"}).encode('utf-8')
+                    writer.write(_HEADER.pack(len(header)) + header)
+                    await writer.drain()
+                    continue
+                texts = [str(text) for text in request.get('texts', [])]
+                self.stats['requests'] += 1
+                self.stats['texts'] += len(texts)
+                future = asyncio.get_running_loop().create_future()
+                await self.queue.put((texts, future))
+                try:
+                    vectors = await future
+                    header, payload = {'shape': list(vectors.shape)}, np.ascontiguousarray(vectors).tobytes()
+                except Exception as e:
+                    header, payload = {'error': str(e)}, b''
+                header = json.dumps(header).encode('utf-8')
+                writer.write(_HEADER.pack(len(header)) + header + payload)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path: str) -> None:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = await asyncio.start_unix_server(self.handle, path=socket_path)
+        os.chmod(socket_path, 0o660)
+        batcher = asyncio.create_task(self.batcher())
+        print(f"embedding service ready on {socket_path}", flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--socket', default=os.getenv('EMBEDDING_SERVICE_SOCKET', '/tmp/hipster-embeddings.sock'))
+    parser.add_argument('--model', default=os.getenv('EMBEDDING_MODEL', DEFAULT_MODEL))
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5)
+    args = parser.parse_args()
+    asyncio.run(EmbeddingServer(args.model, args.max_batch, args.max_wait_ms).serve(args.socket))
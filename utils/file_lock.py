@@ -0,0 +1,58 @@
+import asyncio
+import fcntl
+import os
+
+
+class FileLock:
+    """
+    flock(2) lock on a file, shared by the uvicorn workers of one host. The
+    kernel drops it when its process dies, so a crashed worker never leaves
+    a stale lock behind.
+
+    Locks belong to the open file: two FileLock objects on the same path
+    exclude each other even inside one process.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+        self.mode = None
+
+    def acquire(self, shared: bool = False) -> bool:
+        """
+        Take the lock without blocking, False when another holder prevents it.
+        A held lock can be converted, but flock converts by unlocking first,
+        so a failed conversion leaves nothing held.
+        """
+        if self._fd is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.release()
+            return False
+        self.mode = 'shared' if shared else 'exclusive'
+        return True
+
+    async def wait(self, shared: bool = False, poll: float = 0.05, timeout: float = None) -> bool:
+        """
+        Poll for the lock without blocking the event loop, False on timeout
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while not self.acquire(shared):
+            if deadline is not None and loop.time() >= deadline:
+                return False
+            await asyncio.sleep(poll)
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None:
+            # closing the file drops the lock
+            os.close(self._fd)
+            self._fd = None
+        self.mode = None
+
+    @property
+    def held(self) -> bool:
+        return self.mode is not None
@@ -0,0 +1,60 @@
+import uuid
+
+from databases.chromaDB import ChromaDB, collection_model
+from databases.collection_versions import CollectionVersions
+from databases.compact_vectors import CompactVectors
+from databases.page_index import PageIndex
+from databases.tenants import TenantRegistry
+from utils.answer_cache import AnswerCache
+from utils.metrics import track_stage, observe_stage, tenant_label, CHUNKS_INGESTED
+from utils.utility import docs_splitting
+
+
+async def ingest_pages(collection_name: str, pages: list, external_links: list) -> int:
+    """
+    Split, embed and store scraped pages in the active version of a
+    collection (a new v1 for a new company). Returns the number of chunks
+    written.
+    """
+    for page in pages:
+        if 'fetch_seconds' in page:
+            observe_stage('fetch', collection_name, page['fetch_seconds'])
+        if 'parse_seconds' in page:
+            observe_stage('parse', collection_name, page['parse_seconds'])
+    #1. convert text into docs using langchain
+    with track_stage('split', collection_name):
+        all_chunks = await docs_splitting(pages, external_links)
+    if not all_chunks:
+        raise ValueError(f"no chunks for {collection_name}")
+    # separate the docs, metadata and uuid
+    documents = [chunk.page_content for chunk in all_chunks]
+    metadatas = [chunk.metadata for chunk in all_chunks]
+
+    ids = [str(uuid.uuid4()) for _ in all_chunks]  # Or your own ID strategy
+
+    #2. create collection into the cromadb, large sites get compact vectors when enabled
+    await CollectionVersions.wait_for_reindex(collection_name)
+    # a cold tenant is loaded first, its collections must not be recreated empty
+    async with TenantRegistry.use(collection_name):
+        target = await CollectionVersions.collection_for_writes(
+            collection_name, expected_size=len(all_chunks),
+            metadata=CompactVectors.collection_metadata(len(all_chunks)))
+
+        with track_stage('embed', collection_name):
+            embeddings = await ChromaDB.embed_texts(documents, collection_model(await ChromaDB.get_collection(target)))
+
+        with track_stage('upsert', collection_name):
+            await ChromaDB.add_documents(collection_name=target,
+                                         ids=ids,
+                                         documents=documents,
+                                         metadatas=metadatas,
+                                         embeddings=embeddings)
+        # a re-scrape grows the collection, keep ef_search in step with its size
+        await ChromaDB.tune_collection(target)
+        with track_stage('page_index', collection_name):
+            await PageIndex.build(target, pages)
+    TenantRegistry.record_scrape(collection_name, len(documents))
+    CHUNKS_INGESTED.labels(tenant_label(collection_name)).inc(len(documents))
+    # answers cached for the old content are stale now
+    AnswerCache.invalidate(collection_name)
+    return len(documents)
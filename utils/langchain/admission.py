@@ -0,0 +1,158 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+
+class LLMOverloaded(Exception):
+    """Raised when an LLM call is shed instead of being queued"""
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """
+    True for provider rate limit / overload errors (HTTP 429 and 503)
+    """
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    return status in (429, 503) or type(error).__name__ in ('RateLimitError', 'APITimeoutError')
+
+
+class LLMAdmission:
+    """
+    Admission controller for LLM calls.
+
+    - the concurrency limit is adjusted with AIMD: it grows by 1 per success until the
+      first rate limit (slow start), then by 1 per limit worth of successes, and is
+      multiplied by LLM_AIMD_BACKOFF (at most once per LLM_AIMD_COOLDOWN seconds) on a rate limit error.
+      It only grows while the limit is actually being used
+    - callers above the limit wait in a FIFO queue of at most LLM_QUEUE_SIZE
+    - a caller is shed right away when the queue is full or when it can not be
+      admitted before its deadline, so it gets a fast degraded answer instead
+    """
+    min_limit = int(os.getenv('LLM_CONCURRENCY_MIN', 2))
+    max_limit = int(os.getenv('LLM_CONCURRENCY_MAX', 64))
+    max_queue = int(os.getenv('LLM_QUEUE_SIZE', 128))
+    queue_timeout = float(os.getenv('LLM_QUEUE_TIMEOUT', 0.5))
+    cooldown = float(os.getenv('LLM_AIMD_COOLDOWN', 0.5))
+    backoff = float(os.getenv('LLM_AIMD_BACKOFF', 0.5))
+
+    limit = float(os.getenv('LLM_CONCURRENCY_INITIAL', 8))
+    in_flight = 0
+    _waiters: deque = deque()
+    _last_decrease = 0.0
+    _slow_start = True
+    _avg_latency = 1.0
+    _stats = {'admitted': 0, 'queued': 0, 'shed_queue_full': 0, 'shed_deadline': 0,
+              'rate_limited': 0, 'errors': 0}
+
+    @classmethod
+    def configure(cls, **settings) -> None:
+        """
+        Override settings and reset the state (used by the load test)
+        """
+        for key, value in settings.items():
+            setattr(cls, key, value)
+        cls.in_flight = 0
+        cls._waiters = deque()
+        cls._last_decrease = 0.0
+        cls._slow_start = True
+        cls._stats = {key: 0 for key in cls._stats}
+
+    @classmethod
+    def _wake_waiters(cls) -> None:
+        now = time.monotonic()
+        while cls._waiters and cls.in_flight < int(cls.limit):
+            future, deadline = cls._waiters.popleft()
+            if future.done():
+                continue
+            if deadline <= now:
+                cls._stats['shed_deadline'] += 1
+                future.set_exception(LLMOverloaded('deadline passed while queued'))
+                continue
+            cls.in_flight += 1
+            future.set_result(True)
+
+    @classmethod
+    async def acquire(cls, timeout: float = None) -> None:
+        timeout = cls.queue_timeout if timeout is None else timeout
+        if cls.in_flight < int(cls.limit) and not cls._waiters:
+            cls.in_flight += 1
+            cls._stats['admitted'] += 1
+            return
+
+        if len(cls._waiters) >= cls.max_queue:
+            cls._stats['shed_queue_full'] += 1
+            raise LLMOverloaded('LLM queue is full')
+
+        # expected wait: the queue ahead of us drains `limit` calls per average latency
+        expected_wait = (len(cls._waiters) + 1) / max(int(cls.limit), 1) * cls._avg_latency
+        if expected_wait > timeout:
+            cls._stats['shed_deadline'] += 1
+            raise LLMOverloaded('LLM queue wait exceeds the deadline')
+
+        future = asyncio.get_running_loop().create_future()
+        cls._waiters.append((future, time.monotonic() + timeout))
+        cls._stats['queued'] += 1
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            cls._stats['shed_deadline'] += 1
+            raise LLMOverloaded('timed out waiting for an LLM slot')
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # the slot was granted right before the caller went away, give it back
+                cls.release(started_at=None)
+            raise
+        cls._stats['admitted'] += 1
+
+    @classmethod
+    def release(cls, started_at: float | None, error: Exception = None) -> None:
+        saturated = cls.in_flight >= int(cls.limit) or bool(cls._waiters)
+        cls.in_flight -= 1
+        now = time.monotonic()
+        if started_at is not None and error is None:
+            cls._avg_latency = 0.9 * cls._avg_latency + 0.1 * (now - started_at)
+            if saturated:
+                step = 1 if cls._slow_start else 1 / cls.limit
+                cls.limit = min(cls.max_limit, cls.limit + step)
+        elif error is not None:
+            if is_rate_limited(error):
+                cls._stats['rate_limited'] += 1
+                cls._slow_start = False
+                if now - cls._last_decrease >= cls.cooldown:
+                    cls.limit = max(cls.min_limit, cls.limit * cls.backoff)
+                    cls._last_decrease = now
+            else:
+                cls._stats['errors'] += 1
+        cls._wake_waiters()
+
+    @classmethod
+    @asynccontextmanager
+    async def slot(cls, timeout: float = None):
+        await cls.acquire(timeout)
+        started_at = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            cls.release(started_at, error=e)
+            raise
+        except BaseException:
+            cls.release(None)
+            raise
+        else:
+            cls.release(started_at)
+
+    @classmethod
+    def stats(cls) -> dict:
+        return {
+            **cls._stats,
+            'limit': round(cls.limit, 2),
+            'in_flight': cls.in_flight,
+            'queued_now': len(cls._waiters),
+            'avg_latency': round(cls._avg_latency, 3)
+        }
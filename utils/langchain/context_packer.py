@@ -0,0 +1,133 @@
+import os
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+CHAT_MODEL = "gpt-4.1-nano"
+
+
+@lru_cache(maxsize=4)
+def get_tokenizer(model: str = CHAT_MODEL):
+    """
+    Tokenizer of the chat model, falls back to the closest known encoding
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        try:
+            return tiktoken.get_encoding("o200k_base")
+        except ValueError:
+            return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = CHAT_MODEL) -> int:
+    tokenizer = get_tokenizer(model)
+    if tokenizer is None:
+        # rough estimate when tiktoken is not available
+        return max(1, len(text) // 4)
+    return len(tokenizer.encode(text, disallowed_special=()))
+
+
+def _overlap(left: str, right: str, max_overlap: int = 200) -> int:
+    """
+    Length of the longest suffix of left that is also a prefix of right
+    """
+    for size in range(min(len(left), len(right), max_overlap), 0, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def merge_adjacent_chunks(chunks: list[dict], min_overlap: int = 10) -> list[dict]:
+    """
+    Merge chunks of the same url whose text overlaps (neighbouring splitter windows).
+    The merged chunk keeps the best relevance rank of its parts.
+    """
+    merged = []
+    for rank, chunk in enumerate(chunks):
+        text = (chunk.get('context') or '').strip()
+        if not text:
+            continue
+        url = (chunk.get('metadata') or {}).get('url') or (chunk.get('metadata') or {}).get('source') or ''
+        for item in merged:
+            if item['url'] != url:
+                continue
+            if text in item['text']:
+                break
+            size = _overlap(item['text'], text)
+            if size >= min_overlap:
+                item['text'] = item['text'] + text[size:]
+                break
+            size = _overlap(text, item['text'])
+            if size >= min_overlap:
+                item['text'] = text + item['text'][size:]
+                break
+        else:
+            merged.append({'text': text, 'url': url, 'rank': rank})
+    return merged
+
+
+class ContextPacker:
+    """
+    Builds the context and metadata sections of the chatbot prompt from the
+    retrieved chunks within a token budget (CONTEXT_TOKEN_BUDGET).
+    """
+    token_budget = int(os.getenv('CONTEXT_TOKEN_BUDGET', 1200))
+    _stats = {'calls': 0, 'raw_tokens': 0, 'packed_tokens': 0}
+
+    @classmethod
+    def pack(cls, chunks: list[dict], token_budget: int = None) -> tuple[str, str]:
+        """
+        Args:
+            chunks: retrieved chunks ordered by relevance, as returned by ChromaDB.query_docs
+            token_budget: max tokens of the packed context, defaults to CONTEXT_TOKEN_BUDGET
+
+        Returns:
+            (context, metadata) strings for the prompt
+        """
+        token_budget = token_budget or cls.token_budget
+        chunks = chunks or []
+        merged = sorted(merge_adjacent_chunks(chunks), key=lambda item: item['rank'])
+
+        urls = []
+        sections = []
+        used = 0
+        for item in merged:
+            url_number = urls.index(item['url']) + 1 if item['url'] in urls else len(urls) + 1
+            section = f"[{url_number}] {item['text']}" if item['url'] else item['text']
+            tokens = count_tokens(section)
+            if used + tokens > token_budget:
+                if sections:
+                    continue
+                # always keep the most relevant chunk, trimmed to the budget
+                tokenizer = get_tokenizer()
+                if tokenizer is None:
+                    section = section[:token_budget * 4]
+                else:
+                    section = tokenizer.decode(tokenizer.encode(section, disallowed_special=())[:token_budget])
+                tokens = token_budget
+            if item['url'] and item['url'] not in urls:
+                urls.append(item['url'])
+            sections.append(section)
+            used += tokens
+
+        context = "\n\n".join(sections)
+        metadata = "\n".join(f"[{i}] {url}" for i, url in enumerate(urls, start=1))
+
+        cls._stats['calls'] += 1
+        cls._stats['raw_tokens'] += sum(count_tokens(str(chunk)) for chunk in chunks)
+        cls._stats['packed_tokens'] += count_tokens(context) + count_tokens(metadata)
+        return context, metadata
+
+    @classmethod
+    def stats(cls) -> dict:
+        stats = dict(cls._stats)
+        stats['saved_ratio'] = round(1 - stats['packed_tokens'] / stats['raw_tokens'], 4) if stats['raw_tokens'] else 0.0
+        return stats
@@ -1,23 +1,32 @@
 import json
 import os
+import re
+import time
 from json import JSONDecodeError
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import ChatOpenAI
-from icecream import ic
-from langchain.document_loaders import DirectoryLoader, TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from dotenv import load_dotenv
 
+from utils.langchain.admission import LLMAdmission, LLMOverloaded
+from utils.langchain.context_packer import ContextPacker, CHAT_MODEL, count_tokens
 from utils.logger import Logger
+from utils.metrics import track_stage, observe_stage, tenant_label, LLM_TOKENS
 
 
 load_dotenv()
 
+FALLBACK_MESSAGE = 'Sorry! Can you please try again later'
+BUSY_MESSAGE = "Sorry! We are getting a lot of questions right now, please try again in a moment"
+
+
 async def documents_chunking(path:str):
 # Load all .md and .txt files
     try:
+        # the community loaders are slow to import and only used here
+        from langchain.document_loaders import DirectoryLoader, TextLoader
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
         loader = DirectoryLoader(f"{path}/", glob="**/[!.]*" , loader_cls=TextLoader)
         docs = loader.load()
 
@@ -39,6 +48,7 @@ async def chatbot_prompt(company_name: str):
 You will be given:
 - Context: relevant information about the company’s services, products, and other details
 - Metadata: may contain URLs, references, or additional resources
+- Conversation: summary and latest turns of this chat, use it only to understand follow-up questions
 - Query: a message or question from a user about the company
 
 Response formatting guidelines:
@@ -60,7 +70,7 @@ Response formatting guidelines:
 4. If context does not contain the answer to any part of the query, politely mention that you do not have that specific information at the moment.
 
 Always return a valid JSON response in the following format:
-{{ "response": "<your formatted answer>" }}"""),
+{{{{ "response": "<your formatted answer>" }}}}"""),
         ("human",
          """Context:
 {context}
@@ -68,6 +78,9 @@ Always return a valid JSON response in the following format:
 Metadata:
 {metadata}
 
+Conversation:
+{history}
+
 Query:
 {query}""")
     ])
@@ -76,34 +89,188 @@ Query:
 
 
 
+def build_llm(streaming: bool = False):
+    """
+    Create the chat model used by the chatbot chain. Kept as a separate
+    function so a local stand-in LLM can be swapped in.
+    """
+    from langchain_openai import ChatOpenAI  # imported on the first LLM call, not at startup
+
+    return ChatOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        # any OpenAI compatible endpoint, e.g. the fake server used by the benchmarks
+        base_url=os.getenv("OPENAI_BASE_URL") or None,
+        model=CHAT_MODEL,
+        temperature=0.4,
+        max_tokens=700,
+        # the admission controller backs off on rate limits, extra retries only add load
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", 1)),
+        streaming=streaming,
+    )
+
+
+async def build_chain(company_name: str, streaming: bool = False):
+    # prepared prompt
+    prompt = await chatbot_prompt(company_name)
+
+    # Optional parser if you want plain string output
+    output_parser = StrOutputParser()
+    # Step 3: Compose the chain
+    return prompt | build_llm(streaming=streaming) | output_parser
+
+
+class ResponseFieldExtractor:
+    """
+    Incrementally pulls the value of the "response" field out of the JSON
+    document the model is producing, so it can be forwarded token by token.
+    """
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self, field: str = 'response'):
+        self.field = field
+        self.buffer = ''
+        self.pos = 0
+        self.in_value = False
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        """
+        Add a chunk of model output and return the newly decoded part of the field value
+        """
+        if self.done:
+            return ''
+        self.buffer += chunk
+        if not self.in_value:
+            match = re.search(r'"%s"\s*:\s*"' % re.escape(self.field), self.buffer)
+            if not match:
+                return ''
+            self.in_value = True
+            self.pos = match.end()
+
+        out = []
+        while self.pos < len(self.buffer):
+            char = self.buffer[self.pos]
+            if char == '"':
+                self.done = True
+                self.pos += 1
+                break
+            if char != '\\':
+                out.append(char)
+                self.pos += 1
+                continue
+            # escape sequence, wait for the rest of it if it was split across chunks
+            if self.pos + 1 >= len(self.buffer):
+                break
+            code = self.buffer[self.pos + 1]
+            if code == 'u':
+                if self.pos + 6 > len(self.buffer):
+                    break
+                out.append(chr(int(self.buffer[self.pos + 2:self.pos + 6], 16)))
+                self.pos += 6
+            else:
+                out.append(self._ESCAPES.get(code, code))
+                self.pos += 2
+        return ''.join(out)
+
+
 # Step 4: Call the chain in your async route or function
-async def gpt_response(context: list[str],company_name:str, query: str):
+async def gpt_response(context: list[dict],company_name:str, query: str, history: str = ''):
     try:
-        llm = ChatOpenAI(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            model="gpt-4.1-nano",
-            temperature=0.4,
-            max_tokens=700,
-            max_retries=2,
-        )
-        # prepared prompt
-        prompt = await chatbot_prompt(company_name)
-
-        # Optional parser if you want plain string output
-        output_parser = StrOutputParser()
-        # Step 3: Compose the chain
-        chain = prompt | llm | output_parser
-
-        result = await chain.ainvoke({"context": context, "query": query})
+        with track_stage('prompt_build', company_name):
+            chain = await build_chain(company_name)
+            packed_context, metadata = ContextPacker.pack(context)
+            inputs = {"context": packed_context, "metadata": metadata, "history": history or 'None', "query": query}
+
         try:
-            response = json.loads(result)
+            async with LLMAdmission.slot():
+                with track_stage('llm_invoke', company_name):
+                    result = await chain.ainvoke(inputs)
+        except LLMOverloaded as oe:
+            await Logger.info_log(f"LLM call shed: {oe}")
+            return {'response' : BUSY_MESSAGE, 'degraded' : True}
+        LLM_TOKENS.labels(tenant_label(company_name), 'input').inc(sum(count_tokens(value) for value in inputs.values()))
+        LLM_TOKENS.labels(tenant_label(company_name), 'output').inc(count_tokens(result))
+        try:
+            with track_stage('json_parse', company_name):
+                response = json.loads(result)
         except JSONDecodeError as je:
             await Logger.error_log(__name__,'gpt_response',je)
-            return {'response' : 'Sorry! Can you please try again later'}
+            return {'response' : FALLBACK_MESSAGE, 'degraded' : True}
         except Exception as e:
             await Logger.error_log(__name__,'gpt_response',e)
-            return {'response' : 'Sorry! Can you please try again later'}
+            return {'response' : FALLBACK_MESSAGE, 'degraded' : True}
         return response
     except Exception as e:
         await Logger.error_log(__name__, 'calling_gpt4o_instruct', e)
         return ''
+
+
+async def gpt_response_stream(context: list, company_name: str, query: str, history: str = ''):
+    """
+    Stream the answer with chain.astream, yielding pieces of the "response" field as they arrive
+    """
+    try:
+        with track_stage('prompt_build', company_name):
+            chain = await build_chain(company_name, streaming=True)
+            packed_context, metadata = ContextPacker.pack(context)
+        extractor = ResponseFieldExtractor()
+        raw = []
+        async with LLMAdmission.slot():
+            started = time.perf_counter()
+            first_token = True
+            async for chunk in chain.astream({"context": packed_context, "metadata": metadata,
+                                              "history": history or 'None', "query": query}):
+                raw.append(chunk)
+                delta = extractor.feed(chunk)
+                if delta:
+                    if first_token:
+                        # what the visitor waits for before text appears
+                        observe_stage('llm_first_token', company_name, time.perf_counter() - started)
+                        first_token = False
+                    yield delta
+                if extractor.done:
+                    break
+            observe_stage('llm_stream', company_name, time.perf_counter() - started)
+
+        if not extractor.in_value:
+            # model ignored the JSON format, fall back to whatever it produced
+            await Logger.error_log(__name__, 'gpt_response_stream', 'response field missing in model output')
+            yield ''.join(raw).strip() or FALLBACK_MESSAGE
+    except LLMOverloaded as oe:
+        await Logger.info_log(f"LLM call shed: {oe}")
+        yield BUSY_MESSAGE
+    except Exception as e:
+        await Logger.error_log(__name__, 'gpt_response_stream', e)
+        yield FALLBACK_MESSAGE
+
+
+async def summarize_conversation(summary: str, turns: list[dict]) -> str:
+    """
+    Fold older chat turns into the rolling conversation summary
+    """
+    prompt = ChatPromptTemplate.from_messages([
+        ("system",
+         "You maintain a short running summary of a chat between a website visitor and the company assistant. "
+         "Merge the new turns into the summary. Keep what the visitor asked about, names, products and open "
+         "questions. Use at most 80 words and plain text only."),
+        ("human", "Current summary:\n{summary}\n\nNew turns:\n{turns}")
+    ])
+    chain = prompt | build_llm() | StrOutputParser()
+    lines = "\n".join(f"User: {turn['query']}\nAssistant: {turn['response']}" for turn in turns)
+    async with LLMAdmission.slot():
+        return (await chain.ainvoke({"summary": summary or 'None', "turns": lines})).strip()
+
+
+async def condense_query(history: str, query: str) -> str:
+    """
+    Rewrite a follow-up question into a standalone query for retrieval
+    """
+    prompt = ChatPromptTemplate.from_messages([
+        ("system",
+         "Rewrite the visitor's last message as a standalone search query using the conversation for missing "
+         "references. Return only the query."),
+        ("human", "Conversation:\n{history}\n\nLast message: {query}")
+    ])
+    chain = prompt | build_llm() | StrOutputParser()
+    async with LLMAdmission.slot():
+        return (await chain.ainvoke({"history": history, "query": query})).strip() or query
@@ -1,41 +1,144 @@
 import asyncio
+import atexit
+import json
 import logging
 import os
-from datetime import datetime
+import queue
+import random
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 from dotenv import load_dotenv
 
 
+load_dotenv()
+
+# set per request by the request id middleware, picked up by every log record
+request_id_var: ContextVar[str] = ContextVar('request_id', default='-')
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line, formatted on the listener thread
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'request_id': getattr(record, 'request_id', '-'),
+            'msg': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['traceback'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _RequestQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # only attach the request id here, json formatting happens on the writer thread
+        record.request_id = request_id_var.get()
+        return record
+
+
 class Logger:
+    _logger = logging.getLogger('hipster')
+    _queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener: QueueListener | None = None
+    _lock = threading.Lock()
+
+    debug_enabled = os.getenv('LOG_LEVEL', 'INFO').upper() == 'DEBUG'
+    debug_sample_rate = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', 1.0))
+    debug_per_second = float(os.getenv('LOG_DEBUG_PER_SECOND', 5))
+    # key -> [tokens, last refill, suppressed since last emitted]
+    _debug_buckets: dict[str, list] = {}
+
     @staticmethod
     async def start_logger() -> None:
-        load_dotenv()
-        log_file_path = os.getenv('LOG_DIR') + datetime.now().strftime("%d-%m-%Y") + ".log"
-        log_format = "%(asctime)s.%(msecs)03d *** %(levelname)s : %(lineno)d *** %(message)s"
-        log_date_format = "%d-%m-%Y %H:%M:%S"
+        Logger._start()
 
+    @staticmethod
+    def _start() -> None:
         """ Function to Initiate the Logger """
-        if not os.path.exists(os.getenv('LOG_DIR')):
-            os.makedirs(os.getenv('LOG_DIR'), exist_ok=True)
+        with Logger._lock:
+            if Logger._listener is not None:
+                return
+            formatter = JsonFormatter()
+            handlers = []
 
-        logging.basicConfig(filename=log_file_path, format=log_format, level=logging.INFO,
-                            datefmt=log_date_format, force=True)
+            stream_handler = logging.StreamHandler(sys.stdout)
+            stream_handler.setFormatter(formatter)
+            handlers.append(stream_handler)
+
+            log_dir = os.getenv('LOG_DIR')
+            if log_dir:
+                os.makedirs(log_dir, exist_ok=True)
+                file_handler = logging.FileHandler(os.path.join(log_dir, datetime.now().strftime("%d-%m-%Y") + ".log"))
+                file_handler.setFormatter(formatter)
+                handlers.append(file_handler)
+
+            Logger._logger.handlers = [_RequestQueueHandler(Logger._queue)]
+            Logger._logger.setLevel(logging.DEBUG if Logger.debug_enabled else logging.INFO)
+            Logger._logger.propagate = False
+            Logger._listener = QueueListener(Logger._queue, *handlers, respect_handler_level=True)
+            Logger._listener.start()
+            atexit.register(Logger.stop_logger)
+
+    @staticmethod
+    def stop_logger() -> None:
+        """ Flush everything still queued and stop the writer thread """
+        with Logger._lock:
+            if Logger._listener is not None:
+                Logger._listener.stop()
+                Logger._listener = None
+
+    @staticmethod
+    def _emit(level: int, msg: str, fields: dict = None) -> None:
+        if Logger._listener is None:
+            Logger._start()
+        Logger._logger.log(level, msg, extra={'fields': fields})
 
     @staticmethod
     async def error_log(file_name: str, func_name: str, error) -> None:
         try:
+            fields = {'file': file_name, 'func': func_name}
             if not isinstance(error, str):
-                error = f"{error} | Line {error.__traceback__.tb_lineno}."
-
-            logging.error(f"{file_name} | {func_name} | Exception : {error}")
-            print(f"{datetime.now()} | {file_name} | {func_name} | Exception : {error}")
+                fields['error_type'] = type(error).__name__
+                if error.__traceback__ is not None:
+                    fields['line'] = error.__traceback__.tb_lineno
+            Logger._emit(logging.ERROR, f"Exception : {error}", fields)
         except Exception as error:
-            logging.error(f"{__name__} | errorLog | Exception : {error}")
-            print(f"{datetime.now()} | {__name__} | errorLog | Exception : {error}")
+            Logger._emit(logging.ERROR, f"errorLog | Exception : {error}", {'file': __name__})
+
+    @staticmethod
+    async def info_log(msg: str, **fields) -> None:
+        Logger._emit(logging.INFO, msg, fields)
 
     @staticmethod
-    async def info_log(msg: str) -> None:
-        logging.info(msg=msg)
-        print(f"{datetime.now()} | {msg}")
+    def debug_log(key: str, msg: str, **fields) -> None:
+        """
+        Sampled and rate limited (per key) debug output for high volume call sites.
+        Does nothing unless LOG_LEVEL=DEBUG.
+        """
+        if not Logger.debug_enabled:
+            return
+        if Logger.debug_sample_rate < 1 and random.random() >= Logger.debug_sample_rate:
+            return
+        now = time.monotonic()
+        bucket = Logger._debug_buckets.setdefault(key, [Logger.debug_per_second, now, 0])
+        bucket[0] = min(Logger.debug_per_second, bucket[0] + (now - bucket[1]) * Logger.debug_per_second)
+        bucket[1] = now
+        if bucket[0] < 1:
+            bucket[2] += 1
+            return
+        bucket[0] -= 1
+        if bucket[2]:
+            fields['suppressed'] = bucket[2]
+            bucket[2] = 0
+        Logger._emit(logging.DEBUG, msg, {'key': key, **fields})
 
 
 if __name__ == '__main__':
@@ -0,0 +1,111 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+from databases.tenants import TenantRegistry
+from utils.langchain.admission import LLMAdmission
+
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_LATENCY = Histogram(
+    'hipster_stage_seconds',
+    'Latency of each chat and ingestion pipeline stage',
+    ['stage', 'company_name'],
+    buckets=STAGE_BUCKETS
+)
+CHUNKS_RETURNED = Counter(
+    'hipster_chunks_returned_total',
+    'Chunks returned by ChromaDB.query_docs after the distance threshold',
+    ['company_name']
+)
+CHUNKS_INGESTED = Counter(
+    'hipster_chunks_ingested_total',
+    'Chunks upserted into a tenant collection',
+    ['company_name']
+)
+LLM_TOKENS = Counter(
+    'hipster_llm_tokens_total',
+    'Estimated LLM tokens by direction (input is the variable prompt part)',
+    ['company_name', 'direction']
+)
+CACHE_EVENTS = Counter(
+    'hipster_cache_events_total',
+    'Answer cache hits and misses, small talk and single-flight short circuits',
+    ['company_name', 'cache', 'result']
+)
+IN_FLIGHT = Gauge(
+    'hipster_in_flight_requests',
+    'Requests currently being handled per route',
+    ['route']
+)
+LLM_IN_FLIGHT = Gauge(
+    'hipster_llm_in_flight',
+    'LLM calls currently admitted by the admission controller'
+)
+LLM_CONCURRENCY_LIMIT = Gauge(
+    'hipster_llm_concurrency_limit',
+    'Current AIMD concurrency limit of the admission controller'
+)
+RATE_LIMITED = Counter(
+    'hipster_rate_limited_total',
+    'Requests answered with 429 by the token-bucket rate limiter',
+    ['route']
+)
+TENANTS = Gauge(
+    'hipster_tenants',
+    'Registered tenants by tier, hot in Chroma or cold in a snapshot',
+    ['tier']
+)
+
+# read at scrape time, nothing to update on the hot path
+LLM_IN_FLIGHT.set_function(lambda: LLMAdmission.in_flight)
+LLM_CONCURRENCY_LIMIT.set_function(lambda: LLMAdmission.limit)
+for _tier in ('hot', 'cold'):
+    TENANTS.labels(_tier).set_function(
+        lambda tier=_tier: sum(1 for entry in TenantRegistry._tenants.values() if entry['state'] == tier))
+
+
+def tenant_label(company_name: str) -> str:
+    """
+    company_name label value: registered tenants keep their name, any other
+    name a client sends is counted as 'other' so it can not add time series
+    """
+    if not company_name or company_name in TenantRegistry._tenants:
+        return company_name
+    return 'other'
+
+
+@contextmanager
+def track_stage(stage: str, company_name: str = ''):
+    """
+    Time a block into the stage latency histogram
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(stage, tenant_label(company_name)).observe(time.perf_counter() - started)
+
+
+def observe_stage(stage: str, company_name: str, seconds: float) -> None:
+    STAGE_LATENCY.labels(stage, tenant_label(company_name)).observe(seconds)
+
+
+@contextmanager
+def track_in_flight(route: str):
+    gauge = IN_FLIGHT.labels(route)
+    gauge.inc()
+    try:
+        yield
+    finally:
+        gauge.dec()
+
+
+def count_cache_event(company_name: str, cache: str, result: str) -> None:
+    CACHE_EVENTS.labels(tenant_label(company_name), cache, result).inc()
+
+
+def render_metrics() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
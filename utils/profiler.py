@@ -0,0 +1,224 @@
+import asyncio
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from dotenv import load_dotenv
+
+from utils.logger import Logger, request_id_var
+
+
+load_dotenv()
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples the stacks of every thread of the process each interval and
+    counts them in folded form ('thread;module:function;...'), the input
+    format of flamegraph.pl and speedscope
+    """
+    def __init__(self, interval: float):
+        super().__init__(name='request-profiler', daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+    def folded(self) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """
+    Opt-in profiles of single requests. A request under one of PROFILE_PATHS
+    is profiled when it carries an X-Profile header equal to PROFILE_TOKEN or,
+    with PROFILE_SAMPLE_RATE, at random. Without a PROFILE_TOKEN no client can
+    ask for a profile or read one.
+
+    PROFILE_MODE 'cprofile' traces every Python call on the event loop thread,
+    'sample' samples the stacks of all threads (to_thread work included) every
+    PROFILE_INTERVAL_MS at a lower cost. Either way the profile covers the
+    whole worker while the request runs, so only one request is profiled at a
+    time. Profiles and their request metadata are written to PROFILE_DIR and
+    only the PROFILE_KEEP slowest are kept.
+
+    The middleware and the /profiles routes are only installed with
+    PROFILE_ENABLED=true, other requests do not pay for it at all.
+    """
+    enabled = os.getenv('PROFILE_ENABLED', 'false').lower() == 'true'
+    mode = os.getenv('PROFILE_MODE', 'cprofile')
+    sample_rate = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    interval = float(os.getenv('PROFILE_INTERVAL_MS', 5)) / 1000
+    paths = tuple(path.strip() for path in os.getenv('PROFILE_PATHS', '/api/v1/').split(',') if path.strip())
+    token = os.getenv('PROFILE_TOKEN')
+    directory = os.getenv('PROFILE_DIR', 'profiles')
+    keep = max(1, int(os.getenv('PROFILE_KEEP', 100)))
+
+    _active = False
+    _stats = {'profiled': 0, 'skipped_busy': 0}
+
+    @classmethod
+    def extension(cls, mode: str) -> str:
+        return 'prof' if mode == 'cprofile' else 'folded'
+
+    @classmethod
+    def authorized(cls, value: str | None) -> bool:
+        # profiles show paths and queries of other clients, no token configured means nobody
+        return bool(cls.token) and value is not None and hmac.compare_digest(value.encode(), cls.token.encode())
+
+    @classmethod
+    def wanted(cls, request) -> str | None:
+        """
+        Why a request is profiled ('header' or 'sampled'), None when it is not
+        """
+        path = request.url.path
+        if not path.startswith(cls.paths) or path.startswith('/api/v1/profiles'):
+            return None
+        header = request.headers.get('x-profile')
+        if header is not None and cls.authorized(header):
+            return 'header'
+        if cls.sample_rate > 0 and random.random() < cls.sample_rate:
+            return 'sampled'
+        return None
+
+    @classmethod
+    async def middleware(cls, request, call_next):
+        trigger = cls.wanted(request)
+        if trigger is None:
+            return await call_next(request)
+        if cls._active:
+            cls._stats['skipped_busy'] += 1
+            return await call_next(request)
+
+        cls._active = True
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        metadata = {'id': profile_id, 'request_id': request_id_var.get(), 'method': request.method,
+                    'path': request.url.path, 'query': request.url.query, 'trigger': trigger, 'mode': cls.mode,
+                    'started_at': time.time()}
+        profiler = StackSampler(cls.interval) if cls.mode == 'sample' else cProfile.Profile()
+        started = time.perf_counter()
+        if cls.mode == 'sample':
+            profiler.start()
+        else:
+            profiler.enable()
+
+        async def finish(status: int) -> None:
+            if cls.mode == 'sample':
+                profiler.stop()
+            else:
+                profiler.disable()
+            cls._active = False
+            metadata.update(status=status, seconds=round(time.perf_counter() - started, 4))
+            try:
+                await asyncio.to_thread(cls.save, profiler, metadata)
+                cls._stats['profiled'] += 1
+            except Exception as e:
+                await Logger.error_log(__name__, 'middleware', e)
+
+        try:
+            response = await call_next(request)
+        except BaseException:
+            await finish(500)
+            raise
+        response.headers['X-Profile-ID'] = profile_id
+        body_iterator = response.body_iterator
+
+        async def body():
+            # a streamed answer is only done once its last chunk is sent
+            try:
+                async for chunk in body_iterator:
+                    yield chunk
+            finally:
+                await finish(response.status_code)
+
+        response.body_iterator = body()
+        return response
+
+    @classmethod
+    def save(cls, profiler, metadata: dict) -> None:
+        os.makedirs(cls.directory, exist_ok=True)
+        path = os.path.join(cls.directory, f"{metadata['id']}.{cls.extension(metadata['mode'])}")
+        if metadata['mode'] == 'sample':
+            metadata['samples'] = sum(profiler.stacks.values())
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(profiler.folded())
+        else:
+            profiler.dump_stats(path)
+        with open(os.path.join(cls.directory, f"{metadata['id']}.json"), 'w', encoding='utf-8') as f:
+            json.dump(metadata, f)
+        cls.prune()
+
+    @classmethod
+    def slowest(cls, limit: int = None) -> list[dict]:
+        """
+        Metadata of the stored profiles, slowest first
+        """
+        if not os.path.isdir(cls.directory):
+            return []
+        profiles = []
+        for name in os.listdir(cls.directory):
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(cls.directory, name), encoding='utf-8') as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        profiles.sort(key=lambda profile: profile.get('seconds', 0), reverse=True)
+        return profiles[:limit] if limit else profiles
+
+    @classmethod
+    def prune(cls) -> None:
+        for profile in cls.slowest()[cls.keep:]:
+            for extension in (cls.extension(profile['mode']), 'json'):
+                path = os.path.join(cls.directory, f"{profile['id']}.{extension}")
+                if os.path.exists(path):
+                    os.remove(path)
+
+    @classmethod
+    def path(cls, profile_id: str) -> str | None:
+        # ids come from the url, only names of stored profiles are accepted
+        for profile in cls.slowest():
+            if profile['id'] == profile_id:
+                return os.path.join(cls.directory, f"{profile_id}.{cls.extension(profile['mode'])}")
+        return None
+
+    @classmethod
+    def summary(cls, profile_id: str, limit: int = 40) -> str | None:
+        """
+        The top functions of a cProfile profile by cumulative time, as text
+        """
+        path = cls.path(profile_id)
+        if path is None or not path.endswith('.prof'):
+            return None
+        output = io.StringIO()
+        pstats.Stats(path, stream=output).sort_stats('cumulative').print_stats(limit)
+        return output.getvalue()
+
+    @classmethod
+    def stats(cls) -> dict:
+        return {'enabled': cls.enabled, 'mode': cls.mode, 'sample_rate': cls.sample_rate, **cls._stats}
@@ -0,0 +1,175 @@
+import importlib
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from dotenv import load_dotenv
+from fastapi.responses import JSONResponse
+
+
+load_dotenv()
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600}
+_LIMIT = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*/\s*(\d*)\s*([smh])\s*(?:,\s*(\d+(?:\.\d+)?))?\s*$')
+
+# route -> scope -> '<count>/<period>[,<burst>]', RATE_LIMIT_<ROUTE>_<SCOPE> overrides one value
+DEFAULT_LIMITS = {
+    'qns_ans': {'client': '2/s,20', 'tenant': '30/s,100'},
+    'scrape': {'client': '6/h,2', 'tenant': '4/h,2'},
+    'reindex': {'client': '6/h,2', 'tenant': '2/h,1'},
+}
+
+
+class Limit(NamedTuple):
+    rate: float  # tokens per second
+    burst: float
+
+
+def parse_limit(value: str) -> Limit:
+    """
+    '2/s,20' -> 2 per second with bursts of 20, '30/m' -> 30 per minute with
+    bursts of 30, '1/10m,2' -> one per ten minutes with bursts of 2
+    """
+    match = _LIMIT.match(value)
+    if not match:
+        raise ValueError(f"invalid rate limit: {value!r}")
+    count, multiple, unit, burst = match.groups()
+    seconds = int(multiple or 1) * PERIODS[unit]
+    if float(count) <= 0 or seconds <= 0 or (burst is not None and float(burst) <= 0):
+        # an empty bucket would never refill, turn a route off with RATE_LIMIT_ENABLED instead
+        raise ValueError(f"invalid rate limit: {value!r}, count, period and burst must be above 0")
+    return Limit(float(count) / seconds, float(burst or count))
+
+
+class MemoryBackend:
+    """
+    Token buckets of this process. Buckets are (tokens, updated at) and are
+    refilled lazily on access; the least recently used are dropped beyond
+    max_keys, a dropped bucket simply starts full again.
+    """
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict = OrderedDict()
+
+    async def take(self, key: tuple, limit: Limit, cost: float = 1) -> float:
+        """
+        Take cost tokens, returns 0 when allowed or the seconds until enough
+        tokens are back. A negative cost gives tokens back.
+        """
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        tokens = limit.burst if bucket is None else min(limit.burst, bucket[0] + (now - bucket[1]) * limit.rate)
+        if tokens >= cost:
+            self._buckets[key] = (min(limit.burst, tokens - cost), now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return 0.0
+        self._buckets[key] = (tokens, now)
+        return (cost - tokens) / limit.rate
+
+
+class RateLimiter:
+    """
+    Token-bucket admission for the expensive routes, keyed by company_name and
+    optionally by client IP. A request needs a token from its tenant bucket and,
+    with per-client limits on, from its client bucket, otherwise it is answered
+    with 429 and Retry-After right away.
+
+    Per-client limits are opt-in: behind a proxy every visitor has the proxy's
+    address, so they are only on with RATE_LIMIT_TRUST_FORWARDED=true (keyed on
+    X-Forwarded-For) or an explicit RATE_LIMIT_PER_CLIENT=true.
+
+    Limits come from DEFAULT_LIMITS and RATE_LIMIT_<ROUTE>_<SCOPE> (e.g.
+    RATE_LIMIT_QNS_ANS_CLIENT=5/s,20). Buckets live in this process by default;
+    RATE_LIMIT_BACKEND=module:Class plugs in a shared one with the same async
+    take(key, limit, cost) for multi-worker deployments.
+    """
+    enabled = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    # behind a proxy the client address is the first X-Forwarded-For entry
+    trust_forwarded = os.getenv('RATE_LIMIT_TRUST_FORWARDED', 'false').lower() == 'true'
+    per_client = os.getenv('RATE_LIMIT_PER_CLIENT', str(trust_forwarded)).lower() == 'true'
+
+    _backend = None
+    _limits: dict[str, dict[str, Limit]] = {}
+    # (route, company_name) -> [allowed, limited], company names are client input so the table is capped
+    _usage: dict[tuple, list] = {}
+    max_usage_keys = 10_000
+
+    @classmethod
+    def backend(cls):
+        if cls._backend is None:
+            path = os.getenv('RATE_LIMIT_BACKEND')
+            if path:
+                module, _, name = path.partition(':')
+                cls._backend = getattr(importlib.import_module(module), name)()
+            else:
+                cls._backend = MemoryBackend(int(os.getenv('RATE_LIMIT_MAX_KEYS', 100_000)))
+        return cls._backend
+
+    @classmethod
+    def load(cls) -> None:
+        """
+        Parse the limits of every route, so a bad RATE_LIMIT_* value stops the
+        startup instead of failing the first request of its route
+        """
+        for route in DEFAULT_LIMITS:
+            cls.limits(route)
+
+    @classmethod
+    def limits(cls, route: str) -> dict[str, Limit]:
+        if route not in cls._limits:
+            cls._limits[route] = {
+                scope: parse_limit(os.getenv(f"RATE_LIMIT_{route.upper()}_{scope.upper()}", value))
+                for scope, value in DEFAULT_LIMITS.get(route, {}).items()
+                if scope != 'client' or cls.per_client
+            }
+        return cls._limits[route]
+
+    @classmethod
+    def client_ip(cls, request) -> str:
+        if cls.trust_forwarded:
+            forwarded = request.headers.get('x-forwarded-for')
+            if forwarded:
+                return forwarded.split(',')[0].strip()
+        return request.client.host if request.client else '-'
+
+    @classmethod
+    async def check(cls, route: str, company_name: str, client_ip: str) -> float:
+        """
+        Take one token from the client and the tenant bucket of a route.
+        Returns 0 when the request may go on, else the Retry-After seconds.
+        """
+        if not cls.enabled:
+            return 0.0
+        limits = cls.limits(route)
+        backend = cls.backend()
+        usage = cls._usage.get((route, company_name))
+        if usage is None:
+            key = (route, company_name) if len(cls._usage) < cls.max_usage_keys else (route, '-')
+            usage = cls._usage.setdefault(key, [0, 0])
+
+        wait = await backend.take((route, 'client', client_ip), limits['client']) if 'client' in limits else 0.0
+        if not wait and 'tenant' in limits:
+            wait = await backend.take((route, 'tenant', company_name), limits['tenant'])
+            if wait and 'client' in limits:
+                # the client did not get through, it keeps its token
+                await backend.take((route, 'client', client_ip), limits['client'], cost=-1)
+        usage[1 if wait else 0] += 1
+        return wait
+
+    @classmethod
+    def stats(cls) -> dict:
+        tenants = {}
+        for (route, company_name), (allowed, limited) in cls._usage.items():
+            tenants.setdefault(company_name, {})[route] = {'allowed': allowed, 'limited': limited}
+        return {'enabled': cls.enabled, 'per_client': cls.per_client, 'tenants': tenants}
+
+
+def rate_limited(retry_after: float) -> JSONResponse:
+    return JSONResponse(status_code=429,
+                        content={'response': 'Too many requests, please try again later', 'status': False},
+                        headers={'Retry-After': str(max(1, math.ceil(retry_after)))})
@@ -0,0 +1,44 @@
+import asyncio
+import re
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the
+    work and every duplicate that arrives while it is in flight awaits the
+    same task instead of starting its own.
+    """
+    _inflight: dict[tuple, asyncio.Task] = {}
+    _stats = {'leaders': 0, 'coalesced': 0}
+
+    @staticmethod
+    def make_key(company_name: str, query: str) -> tuple:
+        """
+        Normalize the query so trivially different duplicates share a key. The
+        company name is kept as is, it names the collection and 'Acme' and
+        'acme' are different tenants.
+        """
+        query = re.sub(r'\s+', ' ', query.strip().lower()).rstrip('?!. ')
+        return company_name, query
+
+    @classmethod
+    def is_in_flight(cls, key: tuple) -> bool:
+        return key in cls._inflight
+
+    @classmethod
+    async def do(cls, key: tuple, func, *args, **kwargs):
+        task = cls._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            cls._inflight[key] = task
+            task.add_done_callback(lambda _: cls._inflight.pop(key, None))
+            cls._stats['leaders'] += 1
+        else:
+            cls._stats['coalesced'] += 1
+
+        # shield so one cancelled client does not cancel the shared work for the others
+        return await asyncio.shield(task)
+
+    @classmethod
+    def stats(cls) -> dict:
+        return {**cls._stats, 'in_flight': len(cls._inflight)}
@@ -0,0 +1,114 @@
+import json
+import os
+import random
+import re
+
+import numpy as np
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# intent -> patterns matched against the whole normalized message
+SMALL_TALK_PATTERNS = {
+    'greeting': r"(hi+|hello+|hey+|hiya|yo|greetings|howdy|good (morning|afternoon|evening|day))( there)?( (bot|team|all))?",
+    'thanks': r"(thanks?( you)?|thank u|thx|ty|much appreciated|appreciate it|cheers)( (so|very) much)?( a lot)?",
+    'goodbye': r"(bye+|goodbye|see (you|ya)( later| soon)?|take care|have a (good|nice|great) (day|one))",
+    'wellbeing': r"how are (you|u)( doing)?( today)?|how('?s| is) it going|what'?s up|sup",
+    'acknowledge': r"(ok(ay)?|k|cool|great|nice|awesome|got it|perfect|alright|sure)",
+}
+
+# small set of prototypes compared against the query embedding for what the patterns miss
+SMALL_TALK_PROTOTYPES = {
+    'greeting': ["hello there", "hi, good morning", "hey, anyone here?"],
+    'thanks': ["thank you so much", "thanks for the help", "that was helpful, thanks"],
+    'goodbye': ["goodbye, have a nice day", "bye, talk to you later"],
+    'wellbeing': ["how are you doing today?", "how is it going?"],
+}
+
+DEFAULT_TEMPLATES = {
+    'greeting': ["Hello! Welcome to {company_name}. How can I help you today?",
+                 "Hi there! I'm the {company_name} assistant. What would you like to know?"],
+    'thanks': ["You're welcome! Let me know if there is anything else I can help you with."],
+    'goodbye': ["Thanks for visiting {company_name}. Have a great day!"],
+    'wellbeing': ["I'm doing great, thanks for asking! How can I help you with {company_name} today?"],
+    'acknowledge': ["Glad to help! Is there anything else you would like to know about {company_name}?"],
+}
+
+
+class SmallTalk:
+    """
+    Local intent classifier that answers greetings and other small talk from
+    per company templates without touching Chroma or the LLM.
+
+    Per company templates can be given as JSON in SMALL_TALK_TEMPLATES, e.g.
+    {"acme": {"greeting": ["Hi! Welcome to Acme."]}}; missing intents use the defaults.
+    """
+    enabled = os.getenv('SMALL_TALK_ENABLED', 'true').lower() == 'true'
+    similarity = float(os.getenv('SMALL_TALK_SIMILARITY', 0.8))
+    max_words = int(os.getenv('SMALL_TALK_MAX_WORDS', 6))
+
+    _patterns = {intent: re.compile(rf"^(?:{pattern})$") for intent, pattern in SMALL_TALK_PATTERNS.items()}
+    _templates = json.loads(os.getenv('SMALL_TALK_TEMPLATES') or '{}')
+    _prototype_intents: list[str] = []
+    _prototype_matrix = None
+    _stats = {'total': 0, 'short_circuited': 0}
+
+    @staticmethod
+    def normalize(message: str) -> str:
+        message = re.sub(r"[^\w\s']", ' ', message.lower())
+        return re.sub(r'\s+', ' ', message).strip()
+
+    @classmethod
+    def match_pattern(cls, message: str) -> str | None:
+        if not cls.enabled:
+            return None
+        normalized = cls.normalize(message)
+        if not normalized or len(normalized.split()) > cls.max_words:
+            return None
+        for intent, pattern in cls._patterns.items():
+            if pattern.match(normalized):
+                return intent
+        return None
+
+    @classmethod
+    async def load_prototypes(cls, embed_texts) -> None:
+        """
+        Embed the prototypes once with the given async embedding function
+        """
+        intents, texts = [], []
+        for intent, prototypes in SMALL_TALK_PROTOTYPES.items():
+            intents.extend([intent] * len(prototypes))
+            texts.extend(prototypes)
+        matrix = np.asarray(await embed_texts(texts), dtype=np.float32)
+        cls._prototype_matrix = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+        cls._prototype_intents = intents
+
+    @classmethod
+    def match_embedding(cls, message: str, embedding) -> str | None:
+        if not cls.enabled or cls._prototype_matrix is None or len(cls.normalize(message).split()) > cls.max_words:
+            return None
+        vector = np.asarray(embedding, dtype=np.float32)
+        scores = cls._prototype_matrix @ (vector / (np.linalg.norm(vector) or 1.0))
+        index = int(np.argmax(scores))
+        return cls._prototype_intents[index] if scores[index] >= cls.similarity else None
+
+    @classmethod
+    def reply(cls, company_name: str, intent: str) -> str:
+        templates = cls._templates.get(company_name, {}).get(intent) or DEFAULT_TEMPLATES[intent]
+        return random.choice(templates).format(company_name=company_name)
+
+    @classmethod
+    def record(cls, short_circuited: bool) -> None:
+        cls._stats['total'] += 1
+        if short_circuited:
+            cls._stats['short_circuited'] += 1
+
+    @classmethod
+    def stats(cls) -> dict:
+        total = cls._stats['total']
+        return {
+            'enabled': cls.enabled,
+            **cls._stats,
+            'short_circuit_ratio': round(cls._stats['short_circuited'] / total, 4) if total else 0.0
+        }
@@ -1,17 +1,32 @@
-import re
+import asyncio
+import hashlib
 
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-
-from knowledge_base.scrapper import get_internal_urls, get_external_urls, scrape_all
 from utils.logger import Logger
 
 
-async def scrape_webpage(url:str):
+async def scrape_webpage(url:str, collection_name:str=None):
+    """
+    Scrape every internal page of a website. With a collection_name the raw
+    HTML is also written to a crawl archive (see knowledge_base/crawl_archive.py),
+    so the pages can be parsed and embedded again without fetching them.
+    """
     try:
+        # requests and BeautifulSoup are only needed once something is scraped
+        from knowledge_base.scrapper import get_internal_urls, get_external_urls, scrape_all
+        from knowledge_base.crawl_archive import CrawlArchives
+
         int_urls  = get_internal_urls(url)
         ext_urls = get_external_urls(url)
 
-        text = scrape_all(int_urls)
+        archive = CrawlArchives.writer(collection_name) if collection_name else None
+        # structured pages carry the heading sections docs_splitting chunks on
+        text = scrape_all(int_urls, return_structured=True, archive=archive)
+        if archive is not None:
+            manifest = archive.close(int_urls, ext_urls)
+            CrawlArchives.prune(collection_name)
+            await Logger.info_log('crawl archived', collection_name=collection_name, path=archive.path,
+                                  pages=manifest['pages'], raw_bytes=manifest['raw_bytes'],
+                                  archive_bytes=manifest['archive_bytes'])
         return text,ext_urls
     except Exception as e:
         await Logger.error_log(__name__,'scrape_webpage',e)
@@ -20,24 +35,66 @@ async def scrape_webpage(url:str):
 
 async def get_collection_name(website=None):
     try:
-        match = re.search(r"https?://www\.([a-zA-Z0-9-]+)\.com", website)
+        from databases.tenants import TenantRegistry
 
-        if match:
-            collection_name = match.group(1)
-        else:
-            collection_name = 'website'
-        return collection_name
+        # 'acme' for www.acme.com as before, the full host for every other domain
+        return TenantRegistry.collection_name(website)
     except Exception as e:
         await Logger.error_log(__name__,'get_collection_name',e)
         return 'website'
 
 
 
-async def docs_splitting(web_data:list,ext_links:list,chunk_size=450,chunk_overlap=20):
+def chunk_id(source: str, index: int, text: str) -> str:
+    # deterministic, so an unchanged chunk keeps its id and is never embedded twice
+    return hashlib.md5(f"{source}\n{index}\n{text}".encode('utf-8')).hexdigest()
+
+
+def chunk_ids(documents: list[str], metadatas: list[dict]) -> list[str]:
+    """
+    chunk_id of every chunk, numbered per source ('source' of folder files,
+    'url' of scraped pages) in order, the way FolderIngester numbers them
+    """
+    counters = {}
+    ids = []
+    for text, metadata in zip(documents, metadatas):
+        source = (metadata or {}).get('source') or (metadata or {}).get('url') or ''
+        index = counters.get(source, 0)
+        counters[source] = index + 1
+        ids.append(chunk_id(source, index, text))
+    return ids
+
+
+def _section_chunks(web_data: list, max_tokens: int = None) -> list:
+    from langchain_core.documents import Document
+    from utils.chunking import chunk_sections, CHUNK_MAX_TOKENS
+
+    documents = []
+    for web in web_data:
+        sections = (web.get('data') or {}).get('sections')
+        title = (web.get('data') or {}).get('title') or ''
+        for chunk in chunk_sections(sections, max_tokens or CHUNK_MAX_TOKENS):
+            metadata = {
+                'url' : web.get('url'),
+                'title' : title,
+                'headings' : chunk['headings']
+            }
+            documents.append(Document(page_content=chunk['text'], metadata=metadata))
+    return documents
+
+
+async def docs_splitting(web_data:list,ext_links:list,chunk_size=450,chunk_overlap=20,max_tokens=None):
     """
-    Function to create the text chunking with a specific chunk size
+    Function to create the text chunking with a specific chunk size.
+
+    Structured pages (scraped with return_structured=True) are chunked along
+    their heading sections, sized in embedding model tokens (max_tokens,
+    CHUNK_MAX_TOKENS by default) with the heading path in the metadata. Plain
+    text pages fall back to the character splitter (chunk_size/chunk_overlap).
     """
     try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
         all_chunks = []
         external_text = "If you'd like to explore more about this topic or learn further details about our company, you can visit the following links. They provide additional insights and trusted resources that may help answer your query more comprehensively."
         external_data = {
@@ -45,9 +102,19 @@ async def docs_splitting(web_data:list,ext_links:list,chunk_size=450,chunk_overl
             'url' : "; ".join(ext_links)
         }
         web_data.append(external_data)
+        structured = [web for web in web_data if (web.get('data') or {}).get('sections')]
+        if structured:
+            # tokenizing every sentence is CPU bound, keep it off the event loop
+            all_chunks.extend(await asyncio.to_thread(_section_chunks, structured, max_tokens))
+
         text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
         for web in web_data:
-            text = web.get('text')
+            if (web.get('data') or {}).get('sections'):
+                continue
+            text = web.get('text') or web.get('raw_text')
+            if not text:
+                # pages that failed to load
+                continue
             metadata = {
                 'url' : web.get('url')
             }
@@ -58,5 +125,3 @@ async def docs_splitting(web_data:list,ext_links:list,chunk_size=450,chunk_overl
     except Exception as e:
         await Logger.error_log(__name__,'docs_splitting',e)
         return []
-
-